@@ -0,0 +1,77 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Compares retrieving context for a backlog of emails one query at a time (retrieve_relevant_context in a
+loop: one embeddings request and one single-row FAISS search per email) with retrieve_relevant_context_batch
+(one embeddings request and one multi-row search), against a local stub embedding server.
+
+Usage: python bench/bench_batch_retrieval.py [--chunks 50000] [--queries 200] [--duplicates 0.2] [--latency 0.05]
+"""
+
+import os
+import random
+import faiss
+import argparse
+import tempfile
+import numpy as np
+
+from bench_utils import Timer, setup_paths
+from fakes.openai_stub import OpenAIStubServer
+
+setup_paths()
+
+from llm import provider
+from rag import semantic_search
+from rag.index_factory import build_index
+from rag.chunk_store import write_chunk_store
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--chunks", type=int, default=50000, help="synthetic knowledge base size")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension returned by the stub")
+    parser.add_argument("--queries", type=int, default=200, help="emails in the backlog")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of queries repeating an earlier one")
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed stub latency per request (seconds)")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    stub = OpenAIStubServer(dim=args.dim, latency=args.latency).start()
+    config = semantic_search.config # shared project configuration
+    config["api_endpoint"]["openai"] = stub.base_url
+    config["llm_provider"]["rate_limits"]["default"] = {"rpm": 10**6, "tpm": 10**9} # measure round trips, not client-side limits
+    config["llm_provider"]["rate_limits"].pop(config["embedding_model"]["openai"], None)
+    config["embedding_cache"]["enabled"] = False # every run pays for its embeddings
+    config["semantic_search"]["mode"] = "vector"
+
+    directory = tempfile.mkdtemp(prefix="mailmind-batch-retrieval-")
+    paths = config["path"]["faiss"]
+    paths.update(index_file=os.path.join(directory, "index.faiss"), chunk_file=os.path.join(directory, "chunks.bin"),
+                 lexical_file=os.path.join(directory, "lexical.bin"))
+
+    rng = np.random.default_rng(1)
+    ids = np.arange(args.chunks, dtype="int64")
+    faiss.write_index(build_index(rng.standard_normal((args.chunks, args.dim)).astype("float32"), ids), paths["index_file"])
+    write_chunk_store(paths["chunk_file"], {i: (f"Knowledge base chunk {i}.", {"filename": f"kb/{i % 100}.docx"}) for i in range(args.chunks)})
+
+    pick = random.Random(2)
+    queries = []
+    for i in range(args.queries):
+        repeat = queries and pick.random() < args.duplicates
+        queries.append(pick.choice(queries) if repeat else f"Where is my order #{i}? The ring arrived scratched.")
+
+    semantic_search.get_retriever().snapshot() # load the index outside the timings
+
+    print(f"{'method':>12} {'requests':>9} {'seconds':>8} {'ms/query':>9}")
+    for name, run in (("loop", lambda: [semantic_search.retrieve_relevant_context(query, args.top_k) for query in queries]),
+                      ("batch", lambda: semantic_search.retrieve_relevant_context_batch(queries, args.top_k))):
+        before = stub.requests
+        with Timer() as timer:
+            results = run()
+        assert len(results) == len(queries)
+        print(f"{name:>12} {stub.requests - before:>9} {timer.elapsed:>8.2f} {timer.elapsed / len(queries) * 1000:>9.2f}")
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
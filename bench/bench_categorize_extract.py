@@ -0,0 +1,60 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Compares LLM calls, tokens and latency per email between the two-call mode
+(categorize_email + extract_email_info) and the combined categorize_and_extract_email,
+against a local stub chat-completion provider.
+
+Usage: python bench/bench_categorize_extract.py [--emails 50] [--latency 0.2]
+"""
+
+import argparse
+import numpy as np
+
+from bench_utils import Timer, setup_paths
+from fakes.openai_stub import OpenAIStubServer
+
+setup_paths()
+
+from llm import provider, response_cache, categorize_email, extract_info, categorize_and_extract
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--emails", type=int, default=50, help="number of emails to triage")
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed stub latency per request (seconds)")
+    args = parser.parse_args()
+
+    stub = OpenAIStubServer(latency=args.latency).start()
+    provider.config["api_endpoint"]["openrouter"] = stub.base_url
+    provider.config["llm_provider"]["hedge_after"] = 0 # compare plain request latency
+    response_cache.config["llm_cache"]["enabled"] = False # every email must reach the provider
+
+    emails = [(f"Order #{1000 + i} - ring size", f"Hello,\nI ordered a gold ring (order TJ-{1000 + i}) and need size {6 + i % 4}.\n"
+               f"Can you change it before shipping?\n\nThanks,\nCustomer {i}") for i in range(args.emails)]
+
+    def two_calls(subject:str, body:str) -> None:
+        if categorize_email.categorize_email(subject, body).lower() != "other":
+            extract_info.extract_email_info(subject, body)
+
+    def one_call(subject:str, body:str) -> None:
+        categorize_and_extract.categorize_and_extract_email(subject, body)
+
+    print(f"{'mode':<10} {'calls/email':>11} {'prompt tok':>10} {'compl tok':>10} {'mean ms':>8} {'p95 ms':>8}")
+
+    for name, triage in (("two-call", two_calls), ("combined", one_call)):
+        calls, prompt, completion = stub.chat_requests, stub.prompt_tokens, stub.completion_tokens
+        latencies = []
+        for subject, body in emails:
+            with Timer() as timer:
+                triage(subject, body)
+            latencies.append(timer.elapsed * 1000)
+
+        n = len(emails)
+        print(f"{name:<10} {(stub.chat_requests - calls) / n:>11.1f} {(stub.prompt_tokens - prompt) / n:>10.0f} "
+              f"{(stub.completion_tokens - completion) / n:>10.0f} {np.mean(latencies):>8.0f} {np.percentile(latencies, 95):>8.0f}")
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
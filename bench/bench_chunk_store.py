@@ -0,0 +1,110 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Benchmarks opening the chunk metadata and reading top-k results: the previous indented JSON file
+(json.load of every chunk, then a vector id -> position dict) versus the memory-mapped chunk store in
+rag/chunk_store.py. Each reader runs in a fresh process so that resident memory is measured cleanly, split into
+private heap (RssAnon) and mapped file pages (RssFile; shared page cache the kernel can drop at any time).
+
+Usage: python bench/bench_chunk_store.py [--chunks 100000 200000] [--chunk-bytes 1000] [--queries 200] [--top-k 5]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+
+from bench_utils import ROOT, Timer, setup_paths
+
+setup_paths()
+
+from rag.chunk_store import write_chunk_store
+
+READER = r"""
+import sys, json, time, random
+sys.path.insert(0, "src")
+from rag.chunk_store import ChunkStore
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        fields = dict(line.split(":", 1) for line in f)
+    return [int(fields[name].split()[0]) / 1024 for name in ("RssAnon", "RssFile")]
+
+kind, path, chunks, queries, top_k = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+rng = random.Random(3)
+lookups = [[rng.randrange(chunks) for _ in range(top_k)] for _ in range(queries)]
+before = rss_mb()
+
+start = time.perf_counter()
+if kind == "json":
+    with open(path) as f:
+        data = json.load(f)
+    positions = {vector_id: position for position, vector_id in enumerate(data["ids"])}
+    read = lambda ids: [data["chunks"][positions[i]] for i in ids]
+else:
+    store = ChunkStore(path)
+    read = store.texts
+loaded = time.perf_counter() - start
+
+start = time.perf_counter()
+total = sum(len(text) for ids in lookups for text in read(ids))
+per_query = (time.perf_counter() - start) / queries
+
+after = rss_mb()
+print(f"{loaded} {per_query} {after[0] - before[0]} {after[1] - before[1]} {total}")
+"""
+
+def make_entries(chunks:int, chunk_bytes:int, seed:int=11) -> dict:
+    """
+    Synthetic chunks with realistic sentences and a few hundred source files.
+    """
+
+    rng = random.Random(seed)
+    words = ["gold", "ring", "warranty", "return", "policy", "shipping", "days", "customer", "order", "silver",
+             "necklace", "refund", "hallmarked", "size", "exchange", "store", "price", "delivery", "the", "within"]
+    entries = {}
+    for vector_id in range(chunks):
+        text = " ".join(rng.choice(words) for _ in range(chunk_bytes // 6))[:chunk_bytes]
+        entries[vector_id] = (text, {"filename": f"kb/document_{vector_id % 500}.docx"})
+    return entries
+
+def run_reader(kind:str, path:str, chunks:int, queries:int, top_k:int) -> tuple:
+    """
+    Returns (load seconds, seconds per top-k lookup, heap growth MB, mapped file growth MB) measured in a new interpreter.
+    """
+
+    output = subprocess.run([sys.executable, "-c", READER, kind, path, str(chunks), str(queries), str(top_k)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    return tuple(float(value) for value in output[:4])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100000, 200000], help="knowledge base sizes in chunks")
+    parser.add_argument("--chunk-bytes", type=int, default=1000, help="text bytes per chunk")
+    parser.add_argument("--queries", type=int, default=200, help="top-k lookups per reader")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'text MB':>8} {'format':>6} {'file MB':>8} {'load':>9} {'lookup':>9} {'heap MB':>8} {'mapped MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for chunks in args.chunks:
+            entries = make_entries(chunks, args.chunk_bytes)
+            ids = sorted(entries)
+            json_path, store_path = os.path.join(directory, "chunks.json"), os.path.join(directory, "chunks.bin")
+
+            with Timer() as write_json:
+                with open(json_path, "w") as f:
+                    json.dump({"ids": ids, "chunks": [entries[i][0] for i in ids], "meta": [entries[i][1] for i in ids]}, f, indent=2)
+            with Timer() as write_store:
+                write_chunk_store(store_path, entries)
+            del entries
+
+            text_mb = chunks * args.chunk_bytes / 2**20
+            for kind, path, writer in (("json", json_path, write_json), ("store", store_path, write_store)):
+                load, lookup, heap, mapped = run_reader(kind, path, chunks, args.queries, args.top_k)
+                print(f"{chunks:>8} {text_mb:>8.0f} {kind:>6} {os.path.getsize(path) / 2**20:>8.0f} "
+                      f"{load * 1000:>7.1f}ms {lookup * 1e6:>7.1f}us {heap:>8.1f} {mapped:>9.1f}   (write {writer.elapsed:.1f}s)")
@@ -0,0 +1,114 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Benchmarks CSV-to-chunk conversion on a synthetic product catalog: the previous row-by-row
+(df.iterrows) conversion versus the vectorized one in utils.utils, and whole-file versus block-streamed
+conversion (peak memory measured with tracemalloc). Also checks that both produce identical chunks.
+
+Usage: python bench/bench_csv_chunks.py [--rows 500000] [--baseline-rows 20000]
+"""
+
+import os
+import random
+import argparse
+import tempfile
+import tracemalloc
+import pandas as pd
+
+from io import StringIO
+from bench_utils import Timer, setup_paths
+
+setup_paths()
+
+from utils.utils import convert_csv_to_chunks, iter_csv_chunks
+
+def make_catalog(rows:int, seed:int=7) -> str:
+    """
+    Synthetic catalog with text, int, float, bool and sparse columns.
+    """
+
+    rng = random.Random(seed)
+    metals = ["18k gold", "22k gold", "silver", "platinum", "rose gold"]
+    products = ["ring", "necklace", "bangle", "earrings", "pendant", "bracelet"]
+    lines = ["sku,product name,metal,weight_g,price_usd,stock,discount,customizable,notes"]
+    for i in range(rows):
+        discount = f"{rng.choice([5, 10, 12.5, 15])}" if rng.random() < 0.3 else ""
+        notes = rng.choice(["", "", "", "hallmarked", '"handmade, limited"', " bestseller "])
+        lines.append(f"TJ-{i:07d},{rng.choice(products)} {i % 97},{rng.choice(metals)},{rng.uniform(1, 60):.2f},"
+                     f"{rng.randint(50, 20000)},{rng.randint(0, 500)},{discount},{rng.choice(['True', 'False'])},{notes}")
+    return "\n".join(lines) + "\n"
+
+def convert_with_iterrows(decoded_csv:str) -> list:
+    """
+    The previous implementation, kept here as the baseline.
+    """
+
+    df = pd.read_csv(StringIO(decoded_csv))
+    chunks = []
+    for _, row in df.iterrows():
+        chunks.append(".".join(f"{col.strip()}: {str(row[col]).strip()}" for col in df.columns if pd.notna(row[col])))
+    return chunks
+
+def peak_memory(fn) -> tuple:
+    """
+    Returns (result, peak traced MB) of fn().
+    """
+
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, peak
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--rows", type=int, default=500000, help="catalog rows")
+    parser.add_argument("--baseline-rows", type=int, default=20000, help="rows run through the slow iterrows baseline")
+    parser.add_argument("--block-rows", type=int, default=100000, help="rows per streamed block")
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.rows)
+    sample = "\n".join(catalog.split("\n", args.baseline_rows + 1)[:args.baseline_rows + 1]) + "\n"
+    print(f"catalog: {args.rows} rows, {len(catalog) / 2**20:.1f} MB")
+
+    with Timer() as baseline:
+        expected = convert_with_iterrows(sample)
+    assert convert_csv_to_chunks(sample) == expected, "vectorized output differs from iterrows output"
+    assert convert_csv_to_chunks(sample, block_rows=args.baseline_rows // 7) == expected, "streamed output differs"
+    widened = "a,b\n0,0\n0,0\n0,0\n0,\n1,x\n" # b: int in the first block, float then text later on
+    assert convert_csv_to_chunks(widened, block_rows=3) == convert_with_iterrows(widened), "streamed output differs after a dtype change"
+    print(f"identical output on {args.baseline_rows} rows (whole file and {args.baseline_rows // 7}-row blocks)\n")
+
+    with Timer() as vectorized:
+        chunks = convert_csv_to_chunks(catalog, block_rows=args.rows + 1)
+
+    per_row = baseline.elapsed / args.baseline_rows
+    print(f"{'method':<28} {'seconds':>8} {'rows/s':>10}")
+    print(f"{'iterrows (extrapolated)':<28} {per_row * args.rows:>8.1f} {1 / per_row:>10.0f}")
+    print(f"{'vectorized, whole file':<28} {vectorized.elapsed:>8.1f} {args.rows / vectorized.elapsed:>10.0f}")
+
+    # streaming from a file on disk, one block of rows at a time
+    path = os.path.join(tempfile.mkdtemp(prefix="mailmind-csv-"), "catalog.csv")
+    with open(path, "w") as f:
+        f.write(catalog)
+    del catalog
+
+    def stream() -> int:
+        return sum(len(block) for block in iter_csv_chunks(path, args.block_rows)) # sentences are consumed, not kept
+
+    with Timer() as streamed:
+        count = stream()
+    assert count == len(chunks)
+    print(f"{'vectorized, ' + str(args.block_rows) + '-row blocks':<28} {streamed.elapsed:>8.1f} {args.rows / streamed.elapsed:>10.0f}")
+
+    def whole() -> int:
+        return len(convert_csv_to_chunks(open(path).read(), block_rows=args.rows + 1))
+
+    _, whole_peak = peak_memory(whole) # tracemalloc slows allocation down; measured separately from the timings
+    _, streamed_peak = peak_memory(stream)
+    print(f"\npeak memory: whole file {whole_peak:.0f} MB, streamed blocks {streamed_peak:.0f} MB")
+    os.remove(path)
+
+if __name__ == "__main__":
+    main()
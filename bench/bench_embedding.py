@@ -0,0 +1,69 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Measures embedding throughput (chunks/sec) of the batched embedding pipeline
+(rag.embed_documents.embed_chunks_batched) against a local stub embedding server,
+then cold vs. warm runs through the on-disk embedding cache.
+
+Usage: python bench/bench_embedding.py [--chunks 5000] [--dim 256] [--latency 0.3] [--rate-limit-every 0]
+"""
+
+import argparse
+import tempfile
+
+from bench_utils import Timer, setup_paths
+from fakes.openai_stub import OpenAIStubServer
+
+setup_paths()
+
+from llm import provider
+from rag import embed_documents, embedding_cache
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--chunks", type=int, default=5000, help="number of synthetic chunks to embed")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension returned by the stub")
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed stub latency per request (seconds)")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every n-th request with HTTP 429")
+    args = parser.parse_args()
+
+    stub = OpenAIStubServer(dim=args.dim, latency=args.latency, rate_limit_every=args.rate_limit_every).start()
+    provider.config["api_endpoint"]["openai"] = stub.base_url
+    provider.config["llm_provider"]["backoff_base"] = 0.01 # the stub's 429s are instantaneous
+    provider.config["llm_provider"]["rate_limits"]["default"] = {"rpm": 10**6, "tpm": 10**9} # measure batching, not client-side limits
+    provider.config["llm_provider"]["rate_limits"].pop(embed_documents.config["embedding_model"]["openai"], None)
+
+    chunks = [f"Product {i}: 18k gold ring with {i % 7} diamonds, price {100 + i} USD.\n" * 4 for i in range(args.chunks)]
+
+    settings = [(1, 2048), (4, 256), (8, 128)] # (max_workers, batch_size)
+    print(f"{'workers':>8} {'batch':>6} {'requests':>9} {'seconds':>8} {'chunks/s':>10}")
+
+    for workers, batch_size in settings:
+        embed_documents.config["embedding"]["max_workers"] = workers
+        embed_documents.config["embedding"]["batch_size"] = batch_size
+        before = stub.requests
+
+        with Timer() as timer:
+            embeddings = embed_documents.embed_chunks_batched(chunks)
+
+        assert embeddings.shape == (len(chunks), stub.dim)
+        print(f"{workers:>8} {batch_size:>6} {stub.requests - before:>9} {timer.elapsed:>8.2f} {len(chunks) / timer.elapsed:>10.0f}")
+
+    # same corpus through the embedding cache, in a throwaway directory
+    embedding_cache.config["embedding_cache"]["enabled"] = True
+    embedding_cache.config["path"]["embedding_cache"]["dir"] = tempfile.mkdtemp(prefix="mailmind-embedding-cache-")
+    model = embed_documents.config["embedding_model"]["openai"]
+
+    print(f"\n{'cache':>8} {'requests':>16} {'seconds':>8} {'chunks/s':>10}")
+    for run in ("cold", "warm"):
+        before = stub.requests
+        with Timer() as timer:
+            embedding_cache.embed_with_cache(chunks, model, embed_documents.embed_chunks_batched)
+        print(f"{run:>8} {stub.requests - before:>16} {timer.elapsed:>8.2f} {len(chunks) / timer.elapsed:>10.0f}")
+    print(embedding_cache.get_embedding_cache(model).stats())
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
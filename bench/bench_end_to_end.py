@@ -0,0 +1,203 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Offline end-to-end benchmark and load test. Every external service is replaced by a local stand-in:
+a fake IMAP server with a synthetic mailbox (Gmail), the OpenAI-compatible stub (OpenRouter/OpenAI),
+moto (S3 and DynamoDB) and the SMTP sink (Gmail SMTP). Nothing leaves the machine and no credentials are needed.
+
+Scenarios, each reporting throughput and p50/p99 latency:
+- fetch:    fetch_unread_emails() over the whole mailbox (latency per pass, repeated --repeat times)
+- index:    build_faiss_index() from the knowledge base in the S3 bucket (latency per full rebuild)
+- retrieve: retrieve_relevant_context() for --queries distinct questions (latency per query)
+- mailmind: mailmind.run_once() on --emails unread emails (latency per email, from the traced JSON events)
+
+Results can be saved as a baseline and later runs compared against it:
+    python bench/bench_end_to_end.py --save baseline.json
+    python bench/bench_end_to_end.py --baseline baseline.json
+
+Requires the benchmark requirements: pip install -r environment/requirements-bench.txt (project requirements plus moto).
+
+Usage: python bench/bench_end_to_end.py [--emails 500] [--documents 40] [--queries 300] [--llm-latency 0.05] [--save FILE] [--baseline FILE]
+"""
+
+import os
+import json
+import random
+import argparse
+import tempfile
+import numpy as np
+
+from bench_utils import Timer, setup_paths
+from fakes.imap_server import FakeIMAPServer
+from fakes.openai_stub import OpenAIStubServer
+from fakes.smtp_sink import SMTPSink
+from fakes.synthetic import TOPICS, chat_responder, knowledge_base, synthetic_email
+
+setup_paths()
+
+# fake credentials for the local stand-ins; read by the project modules at import time
+for name, value in (("GMAIL_ADDRESS", "support@tvisijewels.example"), ("GMAIL_APP_PASSWORD", "bench"),
+                    ("AWS_ACCESS_KEY_ID", "bench"), ("AWS_SECRET_ACCESS_KEY", "bench")):
+    os.environ.setdefault(name, value)
+
+import boto3
+
+from moto import mock_aws
+from utils.utils import load_config
+
+def configure(config:dict, directory:str, imap:FakeIMAPServer, stub:OpenAIStubServer, smtp:SMTPSink) -> None:
+    """
+    Points every external endpoint at its local stand-in and every data file into 'directory'.
+    """
+
+    config["gmail"].update(imap_host="127.0.0.1", imap_port=imap.port, imap_ssl=False,
+                           smtp_host="127.0.0.1", smtp_port=smtp.port, smtp_ssl=False)
+    config["api_endpoint"]["openrouter"] = config["api_endpoint"]["openai"] = stub.base_url
+    config["llm_provider"]["rate_limits"] = {"default": {"rpm": 10**6, "tpm": 10**9}} # measure the pipeline, not client-side budgets
+
+    config["path"]["faiss"].update(index_file=os.path.join(directory, "rag", "index.faiss"), chunk_file=os.path.join(directory, "rag", "chunks.bin"),
+                                   lexical_file=os.path.join(directory, "rag", "lexical.bin"), manifest_file=os.path.join(directory, "rag", "manifest.json"))
+    config["path"]["embedding_cache"]["dir"] = os.path.join(directory, "embedding_cache")
+    config["path"]["llm_cache"]["file"] = os.path.join(directory, "llm_cache", "responses.sqlite")
+    config["path"]["reply_cache"]["file"] = os.path.join(directory, "llm_cache", "replies.sqlite")
+    config["path"]["pre_classifier"]["model_file"] = os.path.join(directory, "models", "pre_classifier.npz")
+    config["path"]["dynamodb"]["journal_file"] = os.path.join(directory, "logs", "dynamodb_journal.jsonl")
+    config["path"]["metrics"]["log_file"] = os.path.join(directory, "logs", "events.jsonl")
+    config["metrics"].update(json_logs=True, log_max_bytes=0) # per-email latencies are read back from the email_done events, so no rotation
+    os.makedirs(os.path.join(directory, "rag"), exist_ok=True)
+
+def summarize(name:str, count:int, seconds:float, latencies:list, unit:str) -> dict:
+    return {
+        "scenario": name,
+        "count": count,
+        "seconds": seconds,
+        "throughput": count / seconds if seconds else 0.0,
+        "unit": unit,
+        "p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p99": float(np.percentile(latencies, 99)) if latencies else 0.0
+    }
+
+def reset_unseen(imap:FakeIMAPServer) -> None:
+    with imap.mailbox.lock:
+        for message in imap.mailbox.messages:
+            message["flags"].clear()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--emails", type=int, default=500, help="unread emails in the synthetic mailbox")
+    parser.add_argument("--documents", type=int, default=40, help="knowledge base files in the S3 bucket")
+    parser.add_argument("--queries", type=int, default=300, help="retrieve_relevant_context() calls")
+    parser.add_argument("--repeat", type=int, default=5, help="passes of the fetch and index scenarios")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimension returned by the stub")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fixed stub latency per LLM request (seconds)")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="stub answers every n-th request with HTTP 429")
+    parser.add_argument("--imap-latency", type=float, default=0.005, help="fake IMAP latency per command (seconds)")
+    parser.add_argument("--scenarios", default="fetch,index,retrieve,mailmind", help="comma-separated subset to run")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --save")
+    args = parser.parse_args()
+    scenarios = set(args.scenarios.split(","))
+
+    rng = random.Random(7)
+    imap = FakeIMAPServer(latency=args.imap_latency).start()
+    for i in range(args.emails):
+        imap.mailbox.add(synthetic_email(i, rng))
+    stub = OpenAIStubServer(dim=args.dim, latency=args.llm_latency, rate_limit_every=args.rate_limit_every,
+                            completion_token_latency=0.002, chat_responder=chat_responder).start()
+    smtp = SMTPSink(connect_latency=0.05, login_latency=0.05, message_latency=0.005).start()
+
+    config = load_config() # shared project configuration
+    directory = tempfile.mkdtemp(prefix="mailmind-end-to-end-")
+    configure(config, directory, imap, stub, smtp)
+
+    results = []
+    with mock_aws():
+        # knowledge base bucket and email log table, as the project expects them
+        s3 = boto3.client("s3", region_name=config["aws"]["s3"]["bucket_region"])
+        s3.create_bucket(Bucket=config["aws"]["s3"]["bucket_name"], CreateBucketConfiguration={"LocationConstraint": config["aws"]["s3"]["bucket_region"]})
+        for key, body in knowledge_base(args.documents).items():
+            s3.put_object(Bucket=config["aws"]["s3"]["bucket_name"], Key=key, Body=body)
+        dynamodb = boto3.resource("dynamodb", region_name=config["aws"]["dynamodb"]["db_region"])
+        table = dynamodb.create_table(TableName=config["aws"]["dynamodb"]["table_name"], KeySchema=[{"AttributeName": "email_id", "KeyType": "HASH"}],
+                                      AttributeDefinitions=[{"AttributeName": "email_id", "AttributeType": "S"}], BillingMode="PAY_PER_REQUEST")
+
+        from utils.gmail_utils import fetch_unread_emails
+        from rag.embed_documents import build_faiss_index
+        from rag.semantic_search import get_retriever, retrieve_relevant_context
+
+        if "fetch" in scenarios:
+            latencies = []
+            for _ in range(args.repeat):
+                reset_unseen(imap)
+                with Timer() as timer:
+                    emails = fetch_unread_emails()
+                assert len(emails) == args.emails, f"fetched {len(emails)} of {args.emails} emails"
+                latencies.append(timer.elapsed)
+            results.append(summarize("fetch", args.emails * args.repeat, sum(latencies), latencies, "emails/s"))
+
+        # the other scenarios need the index; it is built at least once
+        latencies = []
+        for _ in range(args.repeat if "index" in scenarios else 1):
+            with Timer() as timer:
+                build_faiss_index() # re-embeds only what the embedding cache does not hold after the first pass
+            latencies.append(timer.elapsed)
+        chunks = get_retriever().snapshot()[1].ntotal
+        if "index" in scenarios:
+            results.append(summarize("index", chunks * len(latencies), sum(latencies), latencies, "chunks/s"))
+
+        if "retrieve" in scenarios:
+            latencies = []
+            with Timer() as total:
+                for i in range(args.queries):
+                    with Timer() as timer:
+                        retrieve_relevant_context(f"Question {i} about {TOPICS[i % len(TOPICS)]} for order TJ-{5000 + i}")
+                    latencies.append(timer.elapsed)
+            results.append(summarize("retrieve", args.queries, total.elapsed, latencies, "queries/s"))
+
+        if "mailmind" in scenarios:
+            import mailmind
+            from storage.dynamodb_handler import get_log_writer
+
+            reset_unseen(imap)
+            chat_requests, sent = stub.chat_requests, smtp.messages
+            with Timer() as timer:
+                mailmind.run_once()
+                get_log_writer().flush() # write-behind buffer: the run is only done once the logs are stored
+
+            with open(config["path"]["metrics"]["log_file"]) as f:
+                events = [json.loads(line) for line in f]
+            latencies = [event["seconds"] for event in events if event["event"] == "email_done"]
+            statuses = [event["status"] for event in events if event["event"] == "email_done"]
+            results.append(summarize("mailmind", len(latencies), timer.elapsed, latencies, "emails/s"))
+
+            logged = table.scan(Select="COUNT")["Count"]
+            print(f"mailmind: {statuses.count('replied')} replied, {statuses.count('skipped')} skipped, {statuses.count('failed')} failed; "
+                  f"{smtp.messages - sent} replies received by the SMTP sink, {logged} email logs in DynamoDB, "
+                  f"{stub.chat_requests - chat_requests} chat requests")
+
+    imap.stop()
+    stub.stop()
+    smtp.stop()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)}
+
+    print(f"{'scenario':>10} {'count':>7} {'seconds':>8} {'throughput':>18} {'p50 ms':>9} {'p99 ms':>9}" + ("   vs baseline (throughput, p99)" if baseline else ""))
+    for result in results:
+        line = (f"{result['scenario']:>10} {result['count']:>7} {result['seconds']:>8.2f} {result['throughput']:>8.1f} {result['unit']:<9} "
+                f"{result['p50'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f}")
+        before = baseline.get(result["scenario"])
+        if before and before["throughput"] and before["p99"]:
+            line += f"   {(result['throughput'] / before['throughput'] - 1) * 100:+6.1f}% {(result['p99'] / before['p99'] - 1) * 100:+6.1f}%"
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Benchmarks the local BM25 index on a synthetic product catalog: build time, index size, per-query latency
+and how often identifier queries (SKU codes as extracted from customer emails) hit the right chunk and take
+the lexical fast path, i.e. are answered without an embedding round trip.
+
+Usage: python bench/bench_lexical_search.py [--products 200000] [--queries 1000]
+"""
+
+import os
+import json
+import random
+import argparse
+import tempfile
+
+from bench_utils import Timer, setup_paths
+
+setup_paths()
+
+from rag.lexical_index import LexicalIndex, write_lexical_index
+
+def make_catalog(products:int, seed:int=5) -> dict:
+    """
+    One chunk per product plus generic policy text, as produced by the chunker for the CSV catalog.
+    """
+
+    rng = random.Random(seed)
+    metals = ["18k gold", "22k gold", "silver", "platinum", "rose gold"]
+    kinds = ["ring", "necklace", "bangle", "earrings", "pendant", "bracelet"]
+    entries = {}
+    for i in range(products):
+        text = (f"sku: TJ-{i:07d}.product name: {rng.choice(kinds)} {i % 97}.metal: {rng.choice(metals)}."
+                f"price_usd: {rng.randint(50, 20000)}.stock: {rng.randint(0, 500)}")
+        entries[i] = (text, {"filename": "catalog.csv"})
+    for j in range(products // 10):
+        entries[products + j] = ("Orders ship within 3 business days. Returns are accepted within 30 days of delivery "
+                                 f"for unworn items; section {j}.", {"filename": "policies.docx"})
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    entries = make_catalog(args.products)
+    rng = random.Random(9)
+    targets = [rng.randrange(args.products) for _ in range(args.queries)]
+    # queries look like the extracted_info JSON that generate_reply_mail() retrieves with
+    queries = [json.dumps({"customer_name": "Asha", "product_name": "ring", "sku": f"TJ-{i:07d}", "issue": "price and stock?"}, indent=2)
+               for i in targets]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lexical.bin")
+        with Timer() as build:
+            write_lexical_index(path, entries)
+
+        with Timer() as load:
+            index = LexicalIndex(path)
+
+        hits = fast = 0
+        with Timer() as search:
+            for target, query in zip(targets, queries):
+                _, ids, exact = index.search(query, args.top_k)
+                hits += target in ids.tolist()
+                fast += exact
+
+        # numbers alone (a year, a price, a section number) are not identifiers: such queries need hybrid search
+        for query in ("any update on my 2024 order?", "what does section 17 say?", "is 18k gold hallmarked?"):
+            assert not index.search(query, args.top_k)[2], f"{query!r} took the lexical fast path"
+
+        with Timer() as generic:
+            for _ in range(args.queries):
+                index.search("how many days do I have to return an item?", args.top_k)
+
+        print(f"chunks: {len(entries)}, build: {build.elapsed:.1f}s, file: {os.path.getsize(path) / 2**20:.0f} MB, load: {load.elapsed * 1000:.2f} ms")
+        print(f"identifier queries: {search.elapsed / args.queries * 1000:.2f} ms/query, hit@{args.top_k}: {hits / args.queries:.1%}, "
+              f"fast path (no embedding call): {fast / args.queries:.1%}")
+        print(f"generic queries: {generic.elapsed / args.queries * 1000:.2f} ms/query")
@@ -0,0 +1,104 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Measures email throughput of pipeline.email_pipeline.EmailPipeline with stubbed LLM, RAG,
+SMTP and DynamoDB stages (fixed latencies, no network), sequential vs. concurrent.
+
+Usage: python bench/bench_pipeline.py [--emails 100] [--senders 50] [--llm-latency 0.3]
+"""
+
+import io
+import time
+import random
+import argparse
+import threading
+
+from contextlib import redirect_stdout
+
+from bench_utils import Timer, setup_paths
+
+setup_paths()
+
+from pipeline.email_pipeline import EmailPipeline
+
+def synthetic_mailbox(count:int, senders:int) -> list:
+    """
+    Emails shaped like fetch_unread_emails() output; every 10th one is off-topic ("Other").
+    """
+
+    return [{
+        "email_msg_id": f"<{i}@bench.local>",
+        "from_name": f"Customer {i % senders}",
+        "from_email": f"customer{i % senders}@example.com",
+        "to": "support@example.com",
+        "date": "2025-01-01",
+        "time": "10:00:00",
+        "subject": "Job application" if i % 10 == 0 else f"Order #{1000 + i} ring size",
+        "body": f"Hello, question number {i} about my order.",
+        "seq": i
+    } for i in range(count)]
+
+def stub_stages(llm_latency:float, smtp_latency:float, db_latency:float, log:list) -> dict:
+    """
+    Stage callables that only sleep for a jittered latency, standing in for the real backends.
+    """
+
+    lock = threading.Lock()
+
+    def sleep(latency:float) -> None:
+        time.sleep(latency * random.uniform(0.7, 1.3))
+
+    def categorize(subject:str, body:str) -> str:
+        sleep(llm_latency)
+        return "Other" if subject == "Job application" else "Inquiry"
+
+    def extract(subject:str, body:str) -> dict:
+        sleep(llm_latency)
+        return {"order_id": subject.split("#")[-1].split()[0]}
+
+    def generate(category:str, extracted_info:dict) -> str:
+        sleep(llm_latency * 2 + 0.05) # retrieval plus a longer completion
+        return f"Dear customer, about order {extracted_info['order_id']}..."
+
+    def send(to_address:str, subject:str, body:str, original_msg_id:str) -> None:
+        sleep(smtp_latency)
+
+    def store(mail:dict) -> None:
+        sleep(db_latency)
+        with lock:
+            log.append((mail["from_email"], mail["seq"]))
+
+    return {"categorize": categorize, "extract": extract, "sync_index": lambda: None,
+            "generate": generate, "send": send, "log": store}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--emails", type=int, default=100, help="number of unread emails")
+    parser.add_argument("--senders", type=int, default=50, help="number of distinct senders")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per LLM call")
+    parser.add_argument("--smtp-latency", type=float, default=0.2, help="seconds per SMTP send")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="seconds per DynamoDB write")
+    args = parser.parse_args()
+
+    rows = []
+    for workers in (1, 8, 32):
+        log = []
+        stages = stub_stages(args.llm_latency, args.smtp_latency, args.db_latency, log)
+        limits = {stage: workers for stage in ("categorize", "extract", "generate", "send", "log")}
+        pipeline = EmailPipeline(stages, max_workers=workers, max_pending=workers * 4, stage_concurrency=limits)
+
+        with Timer() as timer, redirect_stdout(io.StringIO()): # silence per-email progress output
+            results = pipeline.run(synthetic_mailbox(args.emails, args.senders))
+
+        # per-sender ordering: sequence numbers logged for each sender must be increasing
+        ordered = all(a < b for sender in {s for s, _ in log}
+                      for a, b in zip([q for s, q in log if s == sender], [q for s, q in log if s == sender][1:]))
+        rows.append((workers, len(results), timer.elapsed, ordered))
+
+    print(f"{'workers':>8} {'emails':>7} {'seconds':>8} {'emails/s':>9} {'ordered':>8}")
+    for workers, count, elapsed, ordered in rows:
+        print(f"{workers:>8} {count:>7} {elapsed:>8.2f} {count / elapsed:>9.1f} {str(ordered):>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Replies to a stream of recurring inquiries (a few topics asked by many customers, each with their own name and
+order id) with and without the semantic reply cache, against a local stub LLM. Reports chat completion requests,
+prompt tokens and latency per reply.
+
+Usage: python bench/bench_reply_cache.py [--emails 200] [--topics 10] [--latency 0.05]
+"""
+
+import os
+import random
+import argparse
+import tempfile
+import numpy as np
+
+from bench_utils import Timer, setup_paths
+from fakes.openai_stub import OpenAIStubServer
+
+setup_paths()
+
+from llm import generate_response, reply_cache
+from rag.index_factory import build_index
+from rag.index_store import empty_manifest, save_index_state
+
+def check_adapt_reply() -> None:
+    """
+    A reused reply must not keep any part of the earlier customer's details, whatever their case.
+    """
+
+    earlier = {"customer_name": "Priya Shah", "order_id": "TJ-1042", "requested_action": "resize ring"}
+    new = {"customer_name": "Amit Rao", "order_id": "TJ-2077", "requested_action": "resize ring"}
+    assert reply_cache.adapt_reply("Dear Priya,\nyour ring is ready.", earlier, new) is None, "partial name reused"
+    assert reply_cache.adapt_reply("Dear PRIYA SHAH,\nyour ring is ready.", earlier, {"requested_action": "resize ring"}) is None
+    assert reply_cache.adapt_reply("Dear priya shah, order tj-1042 is ready.", earlier, new) == "Dear Amit Rao, order TJ-2077 is ready."
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=10, help="distinct questions the emails ask")
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed stub latency per request (seconds)")
+    args = parser.parse_args()
+
+    check_adapt_reply()
+
+    stub = OpenAIStubServer(dim=64, latency=args.latency, completion_token_latency=0.005).start()
+    stub.chat_responder = lambda request: "Dear customer, thank you for reaching out about your order.\nTvisi Jewels Team"
+    config = generate_response.config # shared project configuration
+    config["api_endpoint"]["openrouter"] = config["api_endpoint"]["openai"] = stub.base_url
+    config["llm_provider"]["rate_limits"]["default"] = {"rpm": 10**6, "tpm": 10**9}
+    config["llm_provider"]["rate_limits"].pop(config["chat_completion_model"]["openrouter"], None)
+    config["llm_provider"]["rate_limits"].pop(config["embedding_model"]["openai"], None)
+    config["llm_cache"]["enabled"] = False
+
+    directory = tempfile.mkdtemp(prefix="mailmind-reply-cache-")
+    config["path"]["faiss"].update(index_file=os.path.join(directory, "index.faiss"), chunk_file=os.path.join(directory, "chunks.bin"),
+                                   lexical_file=os.path.join(directory, "lexical.bin"), manifest_file=os.path.join(directory, "manifest.json"))
+    config["path"]["embedding_cache"]["dir"] = os.path.join(directory, "embedding_cache")
+    entries = {i: (f"Policy section {i}: shipping, returns and resizing terms.", {"filename": "policies.docx"}) for i in range(500)}
+    save_index_state(build_index(np.random.default_rng(0).standard_normal((500, 64)).astype("float32"), np.arange(500, dtype="int64")), entries, empty_manifest())
+
+    pick = random.Random(3)
+    emails = [{"customer_name": f"Customer {i}", "order_id": f"TJ-{i}", "requested_action": f"question about topic {pick.randrange(args.topics)}"}
+              for i in range(args.emails)]
+
+    print(f"{'reply cache':>12} {'chat requests':>14} {'prompt tokens':>14} {'ms/reply':>9}")
+    for enabled in (False, True):
+        config["reply_cache"]["enabled"] = enabled
+        config["path"]["reply_cache"]["file"] = os.path.join(directory, f"replies-{enabled}.sqlite")
+        reply_cache._cache = None
+        requests, tokens = stub.chat_requests, stub.prompt_tokens
+        with Timer() as timer:
+            for extracted_info in emails:
+                generate_response.generate_reply_mail("Inquiry", extracted_info)
+        print(f"{'on' if enabled else 'off':>12} {stub.chat_requests - requests:>14} {stub.prompt_tokens - tokens:>14} "
+              f"{timer.elapsed / len(emails) * 1000:>9.1f}")
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
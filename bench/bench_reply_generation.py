@@ -0,0 +1,79 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Measures reply generation (llm.generate_response.generate_reply_mail) against a local stub LLM with
+straggling requests: the previous behaviour (every retrieved chunk in the prompt, blocking completion
+without a deadline) versus the token-budgeted context with streamed generation under a hard deadline.
+Reports latency percentiles, template fallbacks and prompt tokens per reply.
+
+Usage: python bench/bench_reply_generation.py [--replies 60] [--slow-every 10] [--slow-latency 8] [--deadline 4]
+"""
+
+import os
+import argparse
+import tempfile
+import numpy as np
+
+from bench_utils import Timer, setup_paths
+from fakes.openai_stub import OpenAIStubServer
+
+setup_paths()
+
+from llm import generate_response
+from rag.index_factory import build_index
+from rag.index_store import empty_manifest, save_index_state
+
+def percentile(values:list, q:float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--replies", type=int, default=60)
+    parser.add_argument("--slow-every", type=int, default=10, help="every n-th request is a straggler")
+    parser.add_argument("--slow-latency", type=float, default=8.0, help="extra seconds for a straggler")
+    parser.add_argument("--deadline", type=float, default=4.0, help="generation.deadline_seconds for the streamed mode")
+    args = parser.parse_args()
+
+    stub = OpenAIStubServer(dim=64, latency=0.05, completion_token_latency=0.01, slow_every=args.slow_every, slow_latency=args.slow_latency).start()
+    config = generate_response.config # shared project configuration
+    config["api_endpoint"]["openrouter"] = config["api_endpoint"]["openai"] = stub.base_url
+    config["llm_provider"]["rate_limits"]["default"] = {"rpm": 10**6, "tpm": 10**9}
+    config["llm_provider"]["rate_limits"].pop(config["chat_completion_model"]["openrouter"], None)
+    config["llm_cache"]["enabled"] = False
+    config["reply_cache"]["enabled"] = False # every reply must be generated; bench_reply_cache.py measures reuse
+    config["semantic_search"]["mode"] = "lexical" # keep retrieval local; this measures generation
+
+    # long, overlapping knowledge base chunks: unbounded context makes for large prompts
+    directory = tempfile.mkdtemp(prefix="mailmind-reply-generation-")
+    config["path"]["faiss"].update(index_file=os.path.join(directory, "index.faiss"), chunk_file=os.path.join(directory, "chunks.bin"),
+                                   lexical_file=os.path.join(directory, "lexical.bin"), manifest_file=os.path.join(directory, "manifest.json"))
+    config["path"]["embedding_cache"]["dir"] = os.path.join(directory, "embedding_cache")
+    config["path"]["reply_cache"]["file"] = os.path.join(directory, "replies.sqlite")
+    policy = "Rings can be resized free of charge within 30 days of delivery; engraved items are final sale. "
+    entries = {i: ((policy * (4 + i % 6)) + f"Section {i}.", {"filename": "policies.docx"}) for i in range(200)}
+    save_index_state(build_index(np.random.default_rng(0).standard_normal((200, 64)).astype("float32"), np.arange(200, dtype="int64")), entries, empty_manifest())
+
+    modes = {
+        "unbounded": {"retrieve_top_k": 5, "context_max_tokens": 10**6, "streaming": False},
+        "budgeted+stream": {"retrieve_top_k": 8, "context_max_tokens": 1200, "streaming": True, "deadline_seconds": args.deadline},
+    }
+
+    print(f"{'mode':>16} {'p50 s':>7} {'p99 s':>7} {'max s':>7} {'templates':>10} {'prompt tok/reply':>17}")
+    for name, settings in modes.items():
+        config["generation"].update(settings)
+        latencies, templates = [], 0
+        before = stub.prompt_tokens
+        for i in range(args.replies):
+            with Timer() as timer:
+                reply = generate_response.generate_reply_mail("Inquiry", {"product": "ring", "requested_action": "resize ring", "order_id": f"TJ-{i}"})
+            latencies.append(timer.elapsed)
+            templates += reply == generate_response.template_reply("Inquiry")
+        print(f"{name:>16} {percentile(latencies, 50):>7.2f} {percentile(latencies, 99):>7.2f} {max(latencies):>7.2f} "
+              f"{templates:>10} {(stub.prompt_tokens - before) / args.replies:>17.0f}")
+
+    stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Compares sending replies with a new SMTP connection per message (the original behaviour)
+against the pooled utils.send_mail.SMTPSender, using a local SMTP sink with handshake latency.
+
+Usage: python bench/bench_smtp.py [--messages 100] [--connect-latency 0.15] [--login-latency 0.1]
+"""
+
+import smtplib
+import argparse
+
+from bench_utils import Timer, setup_paths
+from fakes.smtp_sink import SMTPSink
+
+setup_paths()
+
+from utils.send_mail import SMTPSender, build_reply
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--messages", type=int, default=100, help="number of replies to send")
+    parser.add_argument("--connect-latency", type=float, default=0.15, help="seconds of simulated TCP+TLS handshake")
+    parser.add_argument("--login-latency", type=float, default=0.1, help="seconds to answer AUTH")
+    args = parser.parse_args()
+
+    sink = SMTPSink(connect_latency=args.connect_latency, login_latency=args.login_latency).start()
+    replies = [build_reply(f"customer{i}@example.com", f"Order #{i}", "Dear customer,\n\nThank you.\n\nTvisi Jewels Team", f"<{i}@example.com>")
+               for i in range(args.messages)]
+
+    print(f"{'mode':<26} {'connections':>11} {'seconds':>8} {'msgs/s':>8}")
+
+    # baseline: connect + login for every reply
+    before = sink.connections
+    with Timer() as timer:
+        for msg in replies:
+            with smtplib.SMTP("127.0.0.1", sink.port) as smtp:
+                smtp.login("bench", "secret")
+                smtp.send_message(msg)
+    print(f"{'connection per message':<26} {sink.connections - before:>11} {timer.elapsed:>8.2f} {args.messages / timer.elapsed:>8.1f}")
+
+    for pool_size in (1, 4):
+        sender = SMTPSender("127.0.0.1", sink.port, False, "bench", "secret", pool_size=pool_size)
+
+        before = sink.connections
+        with Timer() as timer:
+            for msg in replies:
+                sender.send(msg)
+        print(f"{f'pool={pool_size} send()':<26} {sink.connections - before:>11} {timer.elapsed:>8.2f} {args.messages / timer.elapsed:>8.1f}")
+
+        before = sink.connections
+        with Timer() as timer:
+            errors = sender.send_many(replies)
+        assert not any(errors), errors
+        print(f"{f'pool={pool_size} send_many()':<26} {sink.connections - before:>11} {timer.elapsed:>8.2f} {args.messages / timer.elapsed:>8.1f}")
+
+        sender.close()
+
+    sink.stop()
+
+if __name__ == "__main__":
+    main()
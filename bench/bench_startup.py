@@ -0,0 +1,78 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Guards the startup path of src/mailmind.py: measures its import time with `python -X importtime` in fresh
+interpreters, lists the slowest imports, and fails (exit code 1) if a heavy dependency is imported before
+the first email reaches a stage or if the import exceeds the time budget.
+
+Usage: python bench/bench_startup.py [--runs 5] [--budget-ms 300]
+"""
+
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+
+from bench_utils import ROOT
+
+# must not be imported just to start up, build the pipeline and find an empty inbox
+HEAVY_MODULES = ("faiss", "numpy", "pandas", "boto3", "botocore", "docx", "openai", "httpx")
+
+# importing mailmind and building the default pipeline, as run_once() does once it has an email
+PROBE = f"""
+import sys
+import mailmind
+from pipeline.email_pipeline import EmailPipeline, default_stages
+EmailPipeline(default_stages())
+print("loaded=" + ",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))
+"""
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def measure() -> tuple:
+    """
+    Runs the probe in a fresh interpreter.
+
+    Returns:
+        - tuple: (mailmind cumulative import microseconds, {module: cumulative microseconds}, heavy modules loaded)
+    """
+
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src"))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+
+    modules = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+
+    heavy = [name for name in process.stdout.strip().splitlines()[-1].removeprefix("loaded=").split(",") if name]
+    return modules["mailmind"], modules, heavy
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[-1])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure (median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=300, help="maximum median import time of mailmind")
+    args = parser.parse_args()
+
+    measure() # warm the bytecode and OS file caches
+    runs = [measure() for _ in range(args.runs)]
+    total = statistics.median(run[0] for run in runs) / 1000
+    modules, heavy = runs[-1][1], runs[-1][2]
+
+    print("slowest imports (cumulative ms, last run):")
+    for name, micros in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {micros / 1000:>8.1f}  {name}")
+
+    print(f"\nimport mailmind: {total:.1f} ms median over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print(f"heavy modules loaded at startup: {', '.join(heavy) or 'none'}")
+
+    if heavy or total > args.budget_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Shared helpers for the benchmark scripts in this folder.
+Benchmarks are run from the repository root, e.g. `python bench/bench_embedding.py`.
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_paths() -> None:
+    """
+    Makes project modules importable the same way as when running `python src/mailmind.py`
+    (sources on sys.path, repository root as working directory for config paths).
+    """
+
+    src = os.path.join(ROOT, "src")
+    if src not in sys.path:
+        sys.path.insert(0, src)
+    os.chdir(ROOT)
+
+    # modules build API clients at import time; the stubs do not check keys
+    for name in ("OPENAI_API_KEY", "OPENROUTER_API_KEY"):
+        os.environ.setdefault(name, "stub-key")
+
+class Timer:
+    """
+    Context manager that measures wall-clock time in seconds.
+    """
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,300 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Minimal in-memory IMAP4rev1 server used by the benchmarks in place of Gmail.
+
+Supports the subset of the protocol MailMind uses: CAPABILITY, LOGIN, SELECT/EXAMINE, SEARCH,
+FETCH (RFC822, BODY[...]/BODY.PEEK[...], BODYSTRUCTURE, FLAGS, UID), STORE, their UID variants,
+IDLE/DONE, NOOP and LOGOUT. Plain TCP only; every mailbox name maps to the same single inbox.
+Every command can be delayed by a fixed latency, standing in for the round trip to a remote server.
+"""
+
+import re
+import time
+import email
+import threading
+import socketserver
+
+from email import policy
+from typing import List
+
+class Mailbox:
+    """
+    Thread-safe list of messages with UIDs and flags.
+    """
+
+    def __init__(self) -> None:
+        self.messages = [] # list of dicts {"uid", "flags", "raw"}
+        self.next_uid = 1
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def add(self, raw:bytes) -> None:
+        with self.changed:
+            self.messages.append({"uid": self.next_uid, "flags": set(), "raw": raw})
+            self.next_uid += 1
+            self.changed.notify_all() # wakes idling sessions
+
+    def unseen(self) -> int:
+        with self.lock:
+            return sum("\\Seen" not in message["flags"] for message in self.messages)
+
+def parse_sequence_set(spec:str, maximum:int) -> List[int]:
+    """
+    Expands an IMAP sequence set such as "1:3,7,9:*" into numbers (bounded by 'maximum' for '*').
+    """
+
+    numbers = []
+    for part in spec.split(","):
+        if ":" in part:
+            low, high = part.split(":")
+            low = maximum if low == "*" else int(low)
+            high = maximum if high == "*" else int(high)
+            numbers.extend(range(min(low, high), max(low, high) + 1))
+        else:
+            numbers.append(maximum if part == "*" else int(part))
+    return numbers
+
+def quote(value:str) -> str:
+    return "NIL" if value is None else '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def body_structure(part:email.message.Message) -> str:
+    """
+    Renders the BODYSTRUCTURE of a parsed message (RFC 3501, section 7.4.2), without extension data.
+    """
+
+    if part.is_multipart():
+        children = "".join(body_structure(child) for child in part.get_payload())
+        return f"({children} {quote(part.get_content_subtype().upper())})"
+
+    maintype, subtype = part.get_content_maintype().upper(), part.get_content_subtype().upper()
+    params = part.get_params()[1:] if part.get_params() else []
+    param_list = "(" + " ".join(f"{quote(k.upper())} {quote(v)}" for k, v in params) + ")" if params else "NIL"
+    payload = part.get_payload(decode=False)
+    payload = payload if isinstance(payload, str) else ""
+    encoding = quote((part.get("Content-Transfer-Encoding") or "7BIT").upper())
+    fields = f"{param_list} {quote(part.get('Content-ID'))} NIL {encoding} {len(payload.encode('utf-8'))}"
+
+    if maintype == "TEXT":
+        return f"({quote(maintype)} {quote(subtype)} {fields} {payload.count(chr(10))})"
+    return f"({quote(maintype)} {quote(subtype)} {fields})"
+
+def section_bytes(message:email.message.Message, raw:bytes, section:str) -> bytes:
+    """
+    Returns the bytes of a BODY[section] fetch: "", "HEADER", "TEXT" or a part number like "2.1".
+    """
+
+    header, _, text = raw.partition(b"\r\n\r\n")
+    if section == "":
+        return raw
+    if section == "HEADER":
+        return header + b"\r\n\r\n"
+    if section == "TEXT":
+        return text
+
+    part = message
+    for number in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(number) - 1]
+        elif number != "1":
+            return b""
+    payload = part.get_payload(decode=False)
+    return payload.encode("utf-8") if isinstance(payload, str) else b""
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    """
+    One client session.
+    """
+
+    def send(self, line:str) -> None:
+        self.wfile.write(line.encode("utf-8") + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        self.selected = False
+        self.send("* OK [CAPABILITY IMAP4rev1 IDLE] fake IMAP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode("utf-8").rstrip("\r\n").partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+
+            uid = command == "UID"
+            if uid:
+                command, _, args = args.partition(" ")
+                command = command.upper()
+
+            with server.mailbox.lock:
+                server.commands[command] = server.commands.get(command, 0) + 1
+            time.sleep(server.latency)
+
+            if command == "CAPABILITY":
+                self.send("* CAPABILITY IMAP4rev1 IDLE" if server.idle else "* CAPABILITY IMAP4rev1")
+                self.send(f"{tag} OK CAPABILITY completed")
+            elif command == "LOGIN":
+                self.send(f"{tag} OK LOGIN completed")
+            elif command in ("SELECT", "EXAMINE"):
+                self.selected = True
+                with server.mailbox.lock:
+                    count = len(server.mailbox.messages)
+                    next_uid = server.mailbox.next_uid
+                self.send(f"* {count} EXISTS")
+                self.send("* 0 RECENT")
+                self.send(f"* OK [UIDVALIDITY 1] UIDs valid")
+                self.send(f"* OK [UIDNEXT {next_uid}] Predicted next UID")
+                self.send(f"{tag} OK [READ-WRITE] {command} completed")
+            elif command == "SEARCH":
+                self.search(tag, args, uid)
+            elif command == "FETCH":
+                self.fetch(tag, args, uid)
+            elif command == "STORE":
+                self.store(tag, args, uid)
+            elif command == "NOOP":
+                self.send(f"{tag} OK NOOP completed")
+            elif command == "IDLE":
+                self.idle(tag)
+            elif command == "LOGOUT":
+                self.send("* BYE logging out")
+                self.send(f"{tag} OK LOGOUT completed")
+                return
+            else:
+                self.send(f"{tag} BAD unsupported command {command}")
+
+    def targets(self, spec:str, uid:bool) -> list:
+        """
+        Resolves a sequence set to [(sequence number, message)].
+        """
+
+        messages = self.server.mailbox.messages
+        if uid:
+            maximum = messages[-1]["uid"] if messages else 0
+            wanted = set(parse_sequence_set(spec, maximum))
+            return [(i + 1, m) for i, m in enumerate(messages) if m["uid"] in wanted]
+        wanted = parse_sequence_set(spec, len(messages))
+        return [(n, messages[n - 1]) for n in wanted if 1 <= n <= len(messages)]
+
+    def search(self, tag:str, args:str, uid:bool) -> None:
+        criteria = args.upper()
+        with self.server.mailbox.lock:
+            found = [(i + 1, m) for i, m in enumerate(self.server.mailbox.messages)
+                     if "UNSEEN" not in criteria or "\\Seen" not in m["flags"]]
+        numbers = [str(m["uid"] if uid else n) for n, m in found]
+        self.send("* SEARCH" + ("" if not numbers else " " + " ".join(numbers)))
+        self.send(f"{tag} OK SEARCH completed")
+
+    def fetch(self, tag:str, args:str, uid:bool) -> None:
+        spec, _, items = args.partition(" ")
+        items = items.strip("()").upper()
+        sections = re.findall(r"BODY(\.PEEK)?\[([^\]]*)\]", items)
+
+        with self.server.mailbox.lock:
+            targets = self.targets(spec, uid)
+            for number, message in targets:
+                parsed = email.message_from_bytes(message["raw"], policy=policy.compat32)
+                out = bytearray(f"* {number} FETCH (UID {message['uid']}".encode("utf-8"))
+
+                if re.search(r"\bFLAGS\b", items):
+                    out += f" FLAGS ({' '.join(sorted(message['flags']))})".encode("utf-8")
+                if "BODYSTRUCTURE" in items:
+                    out += b" BODYSTRUCTURE " + body_structure(parsed).encode("utf-8")
+                if "RFC822" in items and "RFC822." not in items:
+                    out += f" RFC822 {{{len(message['raw'])}}}\r\n".encode("utf-8") + message["raw"]
+                    message["flags"].add("\\Seen")
+                for peek, section in sections:
+                    data = section_bytes(parsed, message["raw"], section)
+                    out += f" BODY[{section}] {{{len(data)}}}\r\n".encode("utf-8") + data
+                    if not peek:
+                        message["flags"].add("\\Seen")
+
+                out += b")\r\n"
+                self.wfile.write(bytes(out))
+
+        self.send(f"{tag} OK FETCH completed")
+
+    def store(self, tag:str, args:str, uid:bool) -> None:
+        spec, _, rest = args.partition(" ")
+        mode, _, flags = rest.partition(" ")
+        flags = set(flags.strip("()").split())
+
+        with self.server.mailbox.lock:
+            for number, message in self.targets(spec, uid):
+                if mode.upper().startswith("+"):
+                    message["flags"] |= flags
+                elif mode.upper().startswith("-"):
+                    message["flags"] -= flags
+                else:
+                    message["flags"] = set(flags)
+                if ".SILENT" not in mode.upper():
+                    self.send(f"* {number} FETCH (FLAGS ({' '.join(sorted(message['flags']))}))")
+
+        self.send(f"{tag} OK STORE completed")
+
+    def idle(self, tag:str) -> None:
+        """
+        Announces new messages with "* n EXISTS" until the client sends DONE.
+        """
+
+        mailbox = self.server.mailbox
+        with mailbox.lock:
+            known = len(mailbox.messages)
+        self.send("+ idling")
+
+        done = threading.Event()
+
+        def notifier() -> None:
+            nonlocal known
+            with mailbox.changed:
+                while not done.is_set():
+                    mailbox.changed.wait(timeout=0.2)
+                    if len(mailbox.messages) > known and not done.is_set():
+                        known = len(mailbox.messages)
+                        try:
+                            self.send(f"* {known} EXISTS")
+                        except OSError:
+                            return
+
+        thread = threading.Thread(target=notifier, daemon=True)
+        thread.start()
+
+        line = self.rfile.readline() # "DONE"
+        done.set()
+        thread.join()
+        if line.strip().upper() == b"DONE":
+            self.send(f"{tag} OK IDLE terminated")
+
+class FakeIMAPServer(socketserver.ThreadingTCPServer):
+    """
+    Serves one shared mailbox on 127.0.0.1 from a background thread.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, idle:bool=True, latency:float=0.0) -> None:
+        """
+        Args:
+            - idle (bool): Advertise the IDLE capability.
+            - latency (float): Seconds added to every command (network round trip).
+        """
+
+        super().__init__(("127.0.0.1", 0), IMAPHandler)
+        self.mailbox = Mailbox()
+        self.idle = idle
+        self.latency = latency
+        self.commands = {} # command name -> count, for round-trip accounting
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeIMAPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
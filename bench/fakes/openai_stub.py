@@ -0,0 +1,217 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Local OpenAI-compatible HTTP server used by the benchmarks in place of OpenAI/OpenRouter.
+Returns deterministic embeddings and canned chat completions with configurable latency,
+token accounting and rate-limit behaviour.
+"""
+
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def count_tokens(text:str) -> int:
+    """
+    Same rough estimate the project uses (1 token = 4 characters on average).
+    """
+
+    return len(text) // 4 + 1
+
+REPLY_TEXT = ("Dear Customer,\n\nThank you for reaching out to us. We have checked the details of your request "
+              "and our team will get back to you with the requested information shortly. If you have any further "
+              "questions about our jewellery, customization options or your order, please let us know.\n\n"
+              "Warm regards,\nTvisi Jewels Team")
+
+def default_chat_responder(request:dict) -> str:
+    """
+    Picks a canned answer that matches what the calling prompt asks for.
+    """
+
+    system = " ".join(m["content"] for m in request["messages"] if m["role"] == "system").lower()
+    user = " ".join(m["content"] for m in request["messages"] if m["role"] == "user").lower()
+    relevant = not any(word in user for word in ("job application", "newsletter", "unsubscribe", "webinar"))
+    info = '{"product": "gold ring", "order_id": "TJ-1042", "requested_action": "ring size change"}'
+
+    if request.get("response_format") or "triage" in system: # combined categorize + extract
+        return '{"category": "%s", "extracted_info": %s}' % ("Inquiry" if relevant else "Other", info if relevant else "{}")
+    if "classifier" in system:
+        return "Inquiry" if relevant else "Other"
+    if "parser" in system:
+        return info
+    return REPLY_TEXT
+
+class OpenAIStubServer:
+    """
+    Serves POST /v1/embeddings and /v1/chat/completions (plain or streamed) on a background thread.
+    """
+
+    def __init__(self, dim:int=1536, latency:float=0.05, per_item_latency:float=0.0005, rate_limit_every:int=0,
+                 prompt_token_latency:float=0.0002, completion_token_latency:float=0.01, chat_responder=None,
+                 slow_every:int=0, slow_latency:float=2.0) -> None:
+        """
+        Args:
+            - dim (int): Dimension of returned embedding vectors.
+            - latency (float): Fixed seconds added to every request.
+            - per_item_latency (float): Extra seconds per embedding input text.
+            - rate_limit_every (int): Answer every n-th request with HTTP 429 (0 disables).
+            - prompt_token_latency (float): Chat: seconds per prompt token (prefill).
+            - completion_token_latency (float): Chat: seconds per generated token.
+            - chat_responder (Callable): request dict -> reply text; defaults to default_chat_responder.
+            - slow_every (int): Delay every n-th request by 'slow_latency' seconds to simulate stragglers (0 disables).
+            - slow_latency (float): Extra seconds for a straggler.
+        """
+
+        self.dim = dim
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.rate_limit_every = rate_limit_every
+        self.prompt_token_latency = prompt_token_latency
+        self.completion_token_latency = completion_token_latency
+        self.chat_responder = chat_responder or default_chat_responder
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.requests = 0
+        self.rate_limited = 0
+        self.chat_requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> "OpenAIStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def embed(self, text:str) -> list:
+        """
+        Deterministic pseudo-embedding derived from the text hash.
+        """
+
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, like the real API
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def handle(self) -> None:
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError): # client gave up, e.g. the losing copy of a hedged request
+                    pass
+
+            def _reply(self, status:int, payload:dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+                with stub._lock:
+                    stub.requests += 1
+                    limited = stub.rate_limit_every and stub.requests % stub.rate_limit_every == 0
+                    if limited:
+                        stub.rate_limited += 1
+                    slow = stub.slow_every and stub.requests % stub.slow_every == 0
+
+                if slow:
+                    time.sleep(stub.slow_latency)
+
+                if limited:
+                    self._reply(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}})
+                    return
+
+                if self.path.endswith("/embeddings"):
+                    inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+                    time.sleep(stub.latency + stub.per_item_latency * len(inputs))
+                    tokens = sum(len(text) // 4 + 1 for text in inputs)
+                    self._reply(200, {
+                        "object": "list",
+                        "model": request["model"],
+                        "data": [{"object": "embedding", "index": i, "embedding": stub.embed(text)} for i, text in enumerate(inputs)],
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+                    })
+                elif self.path.endswith("/chat/completions"):
+                    self._chat(request)
+                else:
+                    self._reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def _chat(self, request:dict) -> None:
+                content = stub.chat_responder(request)
+                prompt_tokens = sum(count_tokens(m["content"]) for m in request["messages"])
+                completion_tokens = min(count_tokens(content), request.get("max_tokens") or 10**6)
+
+                with stub._lock:
+                    stub.chat_requests += 1
+                    stub.prompt_tokens += prompt_tokens
+                    stub.completion_tokens += completion_tokens
+
+                if request.get("stream"):
+                    self._stream(request, content, prompt_tokens)
+                    return
+
+                time.sleep(stub.latency + prompt_tokens * stub.prompt_token_latency + completion_tokens * stub.completion_token_latency)
+                self._reply(200, {
+                    "id": f"chatcmpl-stub-{stub.chat_requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens}
+                })
+
+            def _stream(self, request:dict, content:str, prompt_tokens:int) -> None:
+                """
+                Server-sent events, one word per chunk, paced by completion_token_latency (chunked transfer encoding).
+                """
+
+                time.sleep(stub.latency + prompt_tokens * stub.prompt_token_latency) # time to first token
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def send(data:str) -> None:
+                    event = f"data: {data}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+                    self.wfile.flush()
+
+                words = content.split(" ")
+                for i, word in enumerate(words[:request.get("max_tokens") or None]):
+                    delta = word if i == 0 else " " + word
+                    send(json.dumps({"id": "chatcmpl-stub-stream", "object": "chat.completion.chunk", "created": int(time.time()),
+                                     "model": request["model"], "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}))
+                    time.sleep(stub.completion_token_latency * count_tokens(delta))
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
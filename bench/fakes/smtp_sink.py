@@ -0,0 +1,102 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Local SMTP sink used by the benchmarks in place of Gmail's SMTP server.
+Accepts any login and message, counts them, and can add latency to connection setup
+(standing in for the TCP + TLS handshake) and to AUTH, like a remote server would.
+"""
+
+import time
+import threading
+import socketserver
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    One SMTP session (EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT).
+    """
+
+    def reply(self, line:str) -> None:
+        self.wfile.write(line.encode("utf-8") + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        time.sleep(server.connect_latency)
+        with server.lock:
+            server.connections += 1
+        self.reply("220 sink.local ESMTP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-sink.local\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 35882577\r\n")
+            elif verb == "AUTH":
+                time.sleep(server.login_latency)
+                if command.upper().startswith("AUTH LOGIN"): # two base64 prompts: user, password
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 2.7.0 Accepted")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    size += len(data)
+                time.sleep(server.message_latency)
+                with server.lock:
+                    server.messages += 1
+                    server.bytes_received += size
+                self.reply("250 OK queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Plain-TCP SMTP server on 127.0.0.1 running on a background thread.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_latency:float=0.15, login_latency:float=0.1, message_latency:float=0.01) -> None:
+        """
+        Args:
+            - connect_latency (float): Seconds before the greeting (handshake cost).
+            - login_latency (float): Seconds to answer AUTH.
+            - message_latency (float): Seconds to accept each message after DATA.
+        """
+
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connect_latency = connect_latency
+        self.login_latency = login_latency
+        self.message_latency = message_latency
+        self.connections = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SMTPSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
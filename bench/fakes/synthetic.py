@@ -0,0 +1,119 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Synthetic data for the end-to-end benchmarks: raw RFC 822 customer emails for the fake IMAP server, knowledge
+base documents (.docx policies and .csv price lists) for the S3 bucket, and a chat responder for the OpenAI
+stub whose extracted information follows the email's topic and order id, so caches see a realistic mix of
+repeated and new questions.
+"""
+
+import io
+import re
+import random
+
+from docx import Document
+from email import policy
+from email.message import EmailMessage
+from email.utils import format_datetime, make_msgid
+from datetime import datetime, timedelta, timezone
+from fakes.openai_stub import REPLY_TEXT
+
+TOPICS = [
+    "ring resizing", "return policy", "shipping to Canada", "engraving options", "gold purity certificate",
+    "delivery delay", "custom engagement ring", "platinum band price", "earring backs replacement", "gift wrapping",
+    "necklace clasp repair", "order cancellation", "payment by bank transfer", "lab-grown diamonds", "bracelet sizing",
+    "warranty claim", "care instructions for silver", "bulk order for a wedding", "store opening hours", "exchange for a different size"
+]
+
+NEWSLETTER_SUBJECTS = ["Your weekly digest", "Exclusive offer: 50% off today", "Webinar invite: grow your marketing"]
+
+def synthetic_email(i:int, rng:random.Random, senders:int=200) -> bytes:
+    """
+    Builds one raw email. About 15% are newsletters (List-Unsubscribe), 20% carry an HTML alternative and
+    10% a PDF attachment; the rest are plain text customer questions about one of TOPICS.
+
+    Args:
+        - i (int): Sequence number (used for ids).
+        - rng (random.Random): Source of randomness, for reproducible mailboxes.
+        - senders (int): Distinct customer addresses.
+
+    Returns:
+        - bytes: RFC 822 message with CRLF line endings.
+    """
+
+    msg = EmailMessage()
+    msg["Message-ID"] = make_msgid(idstring=str(i), domain="bench.local")
+    msg["To"] = "support@tvisijewels.example"
+    msg["Date"] = format_datetime(datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i))
+
+    if rng.random() < 0.15:
+        msg["From"] = "Jewellery Trends <news@trends.example>"
+        msg["Subject"] = rng.choice(NEWSLETTER_SUBJECTS)
+        msg["List-Unsubscribe"] = "<mailto:unsubscribe@trends.example>"
+        msg.set_content("This week's newsletter: new collections, webinars and offers.\n" * 5)
+        return msg.as_bytes(policy=policy.SMTP) # CRLF line endings, as on the wire
+
+    customer = i % senders
+    topic = rng.choice(TOPICS)
+    msg["From"] = f"Customer {customer} <customer{customer}@example.com>"
+    msg["Subject"] = f"Question about {topic}"
+    body = (f"Hello,\n\nI have a question about {topic} for my order TJ-{1000 + i}. "
+            f"Could you let me know the details?\n\nThanks,\nCustomer {customer}\n")
+    msg.set_content(body)
+
+    if rng.random() < 0.2:
+        msg.add_alternative(f"<html><body><p>{body}</p></body></html>", subtype="html")
+    if rng.random() < 0.1:
+        msg.add_attachment(rng.randbytes(20000), maintype="application", subtype="pdf", filename="invoice.pdf")
+    return msg.as_bytes(policy=policy.SMTP)
+
+def knowledge_base(documents:int, rows:int=200) -> dict:
+    """
+    Builds knowledge base files: alternating .docx policy documents and .csv price lists.
+
+    Args:
+        - documents (int): Number of files.
+        - rows (int): Rows per price list.
+
+    Returns:
+        - dict: S3 key -> file content (bytes).
+    """
+
+    files = {}
+    for i in range(documents):
+        if i % 2 == 0:
+            document = Document()
+            for j, topic in enumerate(TOPICS):
+                document.add_heading(f"{topic.capitalize()} (policy {i}.{j})", level=2)
+                document.add_paragraph(f"Tvisi Jewels policy on {topic}: requests are handled within {2 + j % 5} business days. "
+                                       f"Contact support with your order id. Section {i}.{j} applies to all collections. " * 3)
+            buffer = io.BytesIO()
+            document.save(buffer)
+            files[f"policies/policy_{i}.docx"] = buffer.getvalue()
+        else:
+            lines = ["sku,product,metal,price_inr"]
+            lines.extend(f"TJ{i:03d}{j:04d},{TOPICS[j % len(TOPICS)].split()[0]} item {j},{'gold' if j % 2 else 'silver'},{1000 + 37 * j}" for j in range(rows))
+            files[f"catalogue/prices_{i}.csv"] = "\n".join(lines).encode("utf-8")
+    return files
+
+def chat_responder(request:dict) -> str:
+    """
+    OpenAI stub responder: classifies newsletters as "Other", extracts the email's topic and order id,
+    and answers reply prompts with a canned reply.
+    """
+
+    system = " ".join(m["content"] for m in request["messages"] if m["role"] == "system").lower()
+    user = " ".join(m["content"] for m in request["messages"] if m["role"] == "user")
+    relevant = "newsletter" not in user.lower() and "webinar" not in user.lower()
+    topic = next((topic for topic in TOPICS if topic.lower() in user.lower()), "general question")
+    order = re.search(r"TJ-\d+", user)
+    info = '{"customer_name": "Customer", "order_id": "%s", "requested_action": "%s"}' % (order.group(0) if order else "", topic)
+
+    if request.get("response_format") or "triage" in system:
+        return '{"category": "%s", "extracted_info": %s}' % ("Inquiry" if relevant else "Other", info if relevant else "{}")
+    if "classifier" in system:
+        return "Inquiry" if relevant else "Other"
+    if "parser" in system:
+        return info
+    return REPLY_TEXT
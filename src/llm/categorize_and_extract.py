@@ -0,0 +1,150 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Uses OpenAI (via OpenRouter) to classify a customer email and extract its key-value information
+in a single JSON-schema-constrained chat completion, instead of one call for each task.
+"""
+
+import re
+import openai
+
+from utils.utils import load_config, parse_llm_json
+from llm.provider import get_provider
+from llm.response_cache import cached_completion
+
+config = load_config() # load project configuration
+
+CATEGORIES = ("Inquiry", "Order Request", "Feedback", "Other")
+
+# JSON schema the response must follow; extracted_info keys depend on the email, so it stays open
+RESPONSE_SCHEMA = {
+    "name": "email_triage",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "category": {"type": "string", "enum": list(CATEGORIES)},
+            "extracted_info": {"type": "object"}
+        },
+        "required": ["category", "extracted_info"]
+    }
+}
+
+def normalize_category(value:str) -> str:
+    """
+    Maps a model-produced category onto one of CATEGORIES ("1. inquiry" -> "Inquiry").
+
+    Args:
+        - value (str): Raw category text.
+
+    Returns:
+        - str: Canonical category; "Other" if it cannot be matched.
+    """
+
+    cleaned = re.sub(r"^[\s\d.)*-]+", "", str(value or "")).strip().strip('"*.').lower()
+    for category in CATEGORIES:
+        if cleaned == category.lower():
+            return category
+    for category in CATEGORIES: # e.g. "Category: Order Request"
+        if category.lower() in cleaned:
+            return category
+    return "Other"
+
+def clean_extracted_info(value:object) -> dict:
+    """
+    Keeps extracted information in the shape extract_email_info() returns: a flat-ish dict
+    with lowercase snake_case keys and no empty values.
+
+    Args:
+        - value (object): Raw "extracted_info" from the model.
+
+    Returns:
+        - dict: Cleaned key-value pairs.
+    """
+
+    if isinstance(value, str): # sometimes returned as an embedded JSON string
+        try:
+            value = parse_llm_json(value)
+        except ValueError:
+            return {}
+    if not isinstance(value, dict):
+        return {}
+
+    cleaned = {}
+    for key, item in value.items():
+        if item in (None, "", [], {}):
+            continue
+        cleaned[re.sub(r"[^0-9a-z]+", "_", str(key).strip().lower()).strip("_")] = item
+    return cleaned
+
+def categorize_and_extract_email(subject:str, body:str) -> dict:
+    """
+    Classifies a customer email and extracts its relevant information with one LLM call.
+
+    Args:
+        - subject (str): Email subject
+        - body (str): Email body
+
+    Returns:
+        - dict: {"category": one of CATEGORIES, "extracted_info": dict}; extracted_info is always
+          empty for "Other" emails.
+    """
+
+    system_prompt = """
+You are an intelligent email triage assistant for the customer support system of a jewellery manufacturing company i.e. Tvisi Jewels Private Limited.
+
+Step 1: classify the email into exactly one category:
+- "Inquiry", "Order Request" or "Feedback" if the content is related to jewellery, jewellery manufacturing, order issues, product feedback, or customer inquiries about jewellery.
+- "Other" if the email is not relevant to jewellery or your business domain (e.g. job applications, unrelated offers).
+
+Step 2: unless the category is "Other", extract all key-value pairs of relevant information from the email:
+- The keys should reflect actual topics mentioned in the email (e.g. "product", "order_date", "customization_requested", "requested_action", and etc.)
+- Do not invent or guess missing information.
+- If the customer's name, customer's id, order id, and anything relevant is found in signature, extract it.
+- Use lowercase snake_case for all keys.
+- Do not include irrelevant fields or empty values.
+
+Respond with only a JSON object: {"category": "<category>", "extracted_info": {<key-value pairs>}}
+"""
+    user_prompt = f"""
+Subject: {subject}
+Body: {body}
+"""
+
+    request = {
+        "model": config["chat_completion_model"]["openrouter"],
+        "messages": [
+            {"role":"system", "content":system_prompt},
+            {"role":"user", "content":user_prompt}
+        ],
+        "temperature": 0.0, # classification and extraction must be consistent
+        "max_tokens": 300
+    }
+
+    def triage() -> dict:
+        try:
+            response = get_provider("openrouter").chat(response_format={"type": "json_schema", "json_schema": RESPONSE_SCHEMA}, **request)
+        except openai.BadRequestError: # provider/model without JSON-schema support: plain JSON mode
+            response = get_provider("openrouter").chat(response_format={"type": "json_object"}, **request)
+
+        content = response.choices[0].message.content.strip() # strip() removes leading and trailing whitespaces from a string
+        result = parse_llm_json(content) # validate, repairing fences, prose and trailing commas
+        if not isinstance(result, dict):
+            raise ValueError(f"Expected a JSON object, got {type(result).__name__}")
+        return result
+
+    # keyed on the exact prompt: quoted history and signature carry the names and ids that are extracted,
+    # so two short replies ("any update?") to different threads must not share a result
+    cache_prompt = f"{system_prompt}\n{user_prompt}"
+
+    try:
+        result = cached_completion("categorize_and_extract_email", request["model"], request["temperature"], cache_prompt, triage)
+
+    except Exception as e:
+        print(f"Error categorizing/extracting email: {e}")
+        return {"category": "Other", "extracted_info": {}}
+
+    category = normalize_category(result.get("category"))
+    extracted_info = {} if category == "Other" else clean_extracted_info(result.get("extracted_info"))
+
+    return {"category": category, "extracted_info": extracted_info}
@@ -6,21 +6,12 @@ Uses OpenAI's GPT to classify a customer email into one of four categories:
 Inquiry, Complaint, Suggestions/Feedback, or Other.
 """
 
-import os
-
-from openai import OpenAI
-from dotenv import load_dotenv
 from utils.utils import load_config
+from llm.provider import get_provider
+from llm.response_cache import cached_completion, normalize_email_body, normalize_subject
 
-load_dotenv() # load environment variables from .env file
 config = load_config() # load project configuration
 
-# load OpenAI API key from environment
-client = OpenAI(
-    base_url=config["api_endpoint"]["openrouter"], # without this OpenAI SDK sends requests to a default server i.e. https://api.openai.com/v1; but given is the defualt server for OpenRouter
-    api_key=os.getenv("OPENROUTER_API_KEY" if config["flags"]["credentials_from_env"] else "<api_key>")
-    )
-
 def categorize_email(subject:str, body:str) -> str:
     """
     Categorizes a customer email into: Inquiry, Complaint, Suggestions/Feedback, or Other.
@@ -52,8 +43,10 @@ Respond with ONLY the category name even do not mention category index for examp
 Subject: {subject}
 Body: {body}
 """
-    try:
-        response = client.chat.completions.create(model=config["chat_completion_model"]["openrouter"],
+    model = config["chat_completion_model"]["openrouter"]
+
+    def classify() -> str:
+        response = get_provider("openrouter").chat(model=model,
         messages=[
             {"role":"system", "content":context}, # task instructions
             {"role":"user", "content":prompt} # content on which task should be performed with given instruction
@@ -63,7 +56,13 @@ Body: {body}
         
         max_tokens=10) # max no. of tokens the model is allowed to generate in response. (1 token = 4 characters on average)
 
-        category = response.choices[0].message.content.strip() # strip() removes leading and trailing whitespaces from a string
+        return response.choices[0].message.content.strip() # strip() removes leading and trailing whitespaces from a string
+
+    # quoted history and signatures do not change the category, so they are left out of the cache key
+    cache_prompt = f"{context}\nSubject: {normalize_subject(subject)}\nBody: {normalize_email_body(body)}"
+
+    try:
+        category = cached_completion("categorize_email", model, 0.0, cache_prompt, classify)
         return category
 
     except Exception as e:
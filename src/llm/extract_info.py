@@ -5,22 +5,12 @@ github: @yagnikposhiya
 Uses OpenAI (via OpenRouter) to extract relevant information fields dynamically from a customer email.
 """
 
-import os
-import json
+from utils.utils import load_config, parse_llm_json
+from llm.provider import get_provider
+from llm.response_cache import cached_completion
 
-from openai import OpenAI
-from dotenv import load_dotenv
-from utils.utils import load_config
-
-load_dotenv() # load environment variables from .env file
 config = load_config() # load project configuration
 
-# intialize OpenAI client via OpenRouter
-client = OpenAI(
-    base_url=config["api_endpoint"]["openrouter"], # default server for OpenRouter API
-    api_key=os.getenv("OPENROUTER_API_KEY" if config["flags"]["credentials_from_env"] else "<api_key>")
-)
-
 def extract_email_info(subject:str, body:str) -> dict:
     """
     Extracts dynamic key-value fields from a customer email using LLM.
@@ -57,10 +47,12 @@ Body: {body}
         {"role":"user", "content":user_prompt}
     ]
 
-    try:
+    model = config["chat_completion_model"]["openrouter"]
+
+    def extract() -> dict:
         # send request to OpenRouter API
-        response = client.chat.completions.create(
-            model=config["chat_completion_model"]["openrouter"],
+        response = get_provider("openrouter").chat(
+            model=model,
             messages=messages,
             temperature=0.0,
             max_tokens=300
@@ -69,8 +61,18 @@ Body: {body}
         # extract JSON content from LLM's response
         content = response.choices[0].message.content.strip() # strip() removes leading and trailing whitespaces from a string
 
-        # parse valid json (safe guards)
-        return json.loads(content)
+        # parse json, repairing code fences, surrounding prose and trailing commas (safe guards)
+        extracted = parse_llm_json(content)
+        if not isinstance(extracted, dict):
+            raise ValueError(f"Expected a JSON object, got {type(extracted).__name__}")
+        return extracted
+
+    # keyed on the exact prompt: quoted history and signature carry the names and ids that are extracted,
+    # so two short replies ("any update?") to different threads must not share a result
+    cache_prompt = f"{system_prompt}\n{user_prompt}"
+
+    try:
+        return cached_completion("extract_email_info", model, 0.0, cache_prompt, extract)
     
     except Exception as e:
         print(f"Error extracting email info: {e}")
@@ -5,24 +5,77 @@ github: @yagnikposhiya
 Generates a professional customer support reply email using OpenAI GPT model
 based on the categorized email type, extracted customer info, and
 RAG-retrieved documents from company knowledge base.
+
+The retrieved context is trimmed to a token budget, and the reply is streamed under a hard per-email
+deadline; when the deadline passes, a template reply for the email's category is used instead.
+Replies to near-duplicate inquiries are reused from the semantic reply cache (llm/reply_cache.py).
 """
 
-import os
 import json
+import time
+import threading
+import contextvars
 
-from typing import Dict
-from openai import OpenAI
-from dotenv import load_dotenv
+from typing import Any, Callable, Dict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from utils.utils import load_config
-from rag.semantic_search import retrieve_relevant_context
+from llm.provider import get_provider
+from llm.reply_cache import lookup_reply
+from rag.context_builder import assemble_context
+from rag.semantic_search import retrieve_relevant_context_batch
+from llm.response_cache import cached_completion
 
-load_dotenv() # load environment variable from .env file
 config = load_config() # load project configuration
 
-client = OpenAI(
-    base_url=config["api_endpoint"]["openrouter"],
-    api_key=os.getenv("OPENROUTER_API_KEY") if config["flags"]["credentials_from_env"] else "<api_key>"
-)
+SIGN_OFF = "Tvisi Jewels Team" # last line of every reply; generation can stop once it appears
+
+def template_reply(category:str) -> str:
+    """
+    Args:
+        - category (str): Email category.
+
+    Returns:
+        - str: Pre-written reply for the category (generation.fallback_templates), or the default one.
+    """
+
+    templates = config["generation"]["fallback_templates"]
+    return templates.get(category, templates["default"]).strip()
+
+_preparation = None
+_preparation_lock = threading.Lock()
+
+def before_deadline(deadline:float, step:Callable, *args) -> Any:
+    """
+    Runs a step that has no deadline of its own (reply cache lookup, retrieval: embedding calls with retries)
+    on a helper thread and waits for it until 'deadline'. A step that misses it finishes in the background,
+    so its embeddings still end up in the caches.
+
+    Args:
+        - deadline (float): time.monotonic() value by which the step must be done.
+        - step (Callable): Function to run, called with *args in the caller's context (trace id).
+
+    Returns:
+        - Any: What the step returned; its exceptions are raised here.
+
+    Raises:
+        - TimeoutError: If the deadline passes first.
+    """
+
+    global _preparation
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"no time left for {step.__name__}")
+
+    with _preparation_lock:
+        if _preparation is None:
+            _preparation = ThreadPoolExecutor(max_workers=config["generation"]["preparation_workers"], thread_name_prefix="reply-preparation")
+
+    future = _preparation.submit(contextvars.copy_context().run, step, *args)
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeout:
+        raise TimeoutError(f"{step.__name__} did not finish before the deadline") from None
 
 def generate_reply_mail(category:str, extracted_info: dict) -> str:
     """
@@ -37,9 +90,24 @@ def generate_reply_mail(category:str, extracted_info: dict) -> str:
         - str: Generated reply content to be sent to the customer.
     """
 
-    # retrieve relevant context chunks from RAG
-    context_chunks = retrieve_relevant_context(json.dumps(extracted_info, indent=2))
-    context = "\n".join(context_chunks)
+    settings = config["generation"]
+    deadline = time.monotonic() + settings["deadline_seconds"] # covers the cache lookup and retrieval, not only generation
+
+    try:
+        # a near-duplicate inquiry of the same category already answered from the same knowledge base chunks
+        lookup = before_deadline(deadline, lookup_reply, category, extracted_info)
+        if lookup is not None and lookup.reply is not None:
+            print(f"Reusing a cached {category} reply")
+            return lookup.reply
+
+        # retrieve relevant context chunks from RAG, then keep the best ones that fit the token budget
+        results = before_deadline(deadline, retrieve_relevant_context_batch, [json.dumps(extracted_info, indent=2)], settings["retrieve_top_k"])[0]
+
+    except TimeoutError as e:
+        print(f"Reply preparation exceeded {settings['deadline_seconds']}s ({e}); sending the {category} template")
+        return template_reply(category)
+
+    context = "\n".join(assemble_context(results, settings["context_max_tokens"]))
 
     # construct the prompt
     prompt = f"""
@@ -59,23 +127,38 @@ Using the information above:
 - Include relevant details like order status, product name, or resolution steps if available.
 - Maintain a polite and reassuring tone.
 
-Do not write email subject. And write "Tvisi Jewels Team" only at the end of the email.
+Do not write email subject. And write "{SIGN_OFF}" only at the end of the email.
 
 Respond with only the email content. Do not mention that you are an AI. Write as if you are a real customer support representative of Tvisi Jewels.
 """
     
-    try:
+    model = config["chat_completion_model"]["openrouter"]
+    temperature = 0.7
+
+    def generate() -> str:
+        request = {"model": model, "messages": [{"role":"user", "content":prompt}], "temperature": temperature, "max_tokens": settings["max_tokens"]}
+
+        if settings["streaming"]: # accumulate the reply as it is generated; stop at the sign-off or the deadline
+            return get_provider("openrouter").chat_stream(deadline, until=SIGN_OFF, **request).strip()
+
         # generate reply using LLM
-        response = client.chat.completions.create(
-            model=config["chat_completion_model"]["openrouter"],
-            messages=[{"role":"user", "content":prompt}],
-            temperature=0.7,
-            max_tokens=300
-        )
+        response = get_provider("openrouter").chat(**request)
 
         # extract and return clean reply
         return response.choices[0].message.content.strip()
 
+    try:
+        # sampled output: only cached when llm_cache.cache_nondeterministic is enabled
+        reply = cached_completion("generate_reply_mail", model, temperature, prompt, generate)
+
+    except TimeoutError as e:
+        print(f"Reply generation exceeded {settings['deadline_seconds']}s ({e}); sending the {category} template")
+        return template_reply(category)
+
     except Exception as e:
         print(f"Error generating reply: {e}")
-        return "We are currently experiencing technical difficulties. Please expect a response shortly."
+        return template_reply(category)
+
+    if lookup is not None and reply: # template replies above are never cached
+        lookup.save(reply, results)
+    return reply
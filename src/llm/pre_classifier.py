@@ -0,0 +1,346 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Local pre-classifier in front of the LLM email classifier.
+
+Newsletters, notifications and other automated mail are recognized from their headers (List-Unsubscribe,
+Auto-Submitted, bulk Precedence, no-reply senders); everything else is scored by a hashed n-gram logistic
+regression model trained on the categories the LLM assigned in the DynamoDB email logs. Only confident
+"Other" decisions skip the LLM; ambiguous mail is escalated. A small sample of skipped mail is still sent
+to the LLM to measure how often both agree.
+
+Train (or retrain) the model with: python src/mailmind.py --train-pre-classifier
+"""
+
+import os
+import re
+import zlib
+import random
+import threading
+import numpy as np
+
+from typing import Any, Iterable, List, Tuple
+from utils.utils import load_config
+
+config = load_config() # load project configuration
+
+WORD = re.compile(r"\w+")
+NO_REPLY_SENDER = re.compile(r"^(no[-_.]?reply|do[-_.]?not[-_.]?reply|mailer[-_.]?daemon|postmaster|bounces?|notifications?)\b")
+BULK_PRECEDENCE = ("bulk", "list", "junk")
+
+def header_rule(mail:dict) -> Any:
+    """
+    Checks the headers that mark automated or bulk mail.
+
+    Args:
+        - mail (dict): Email as yielded by iter_unread_emails(), including its "headers".
+
+    Returns:
+        - str | None: Name of the matching rule, or None when no rule applies.
+    """
+
+    headers = {name.lower(): (value or "").strip().lower() for name, value in (mail.get("headers") or {}).items()}
+
+    if headers.get("auto-submitted", "no") != "no": # RFC 3834: auto-replied, auto-generated, ...
+        return "auto-submitted"
+    if headers.get("precedence") in BULK_PRECEDENCE:
+        return "bulk-precedence"
+    if headers.get("list-unsubscribe") or headers.get("list-id"): # RFC 2369 / 2919 mailing lists and newsletters
+        return "mailing-list"
+    if headers.get("x-auto-response-suppress"): # Exchange out-of-office and system messages
+        return "auto-response"
+    if NO_REPLY_SENDER.match((mail.get("from_email") or "").split("@")[0].lower()):
+        return "no-reply-sender"
+    return None
+
+def featurize(subject:str, body:str, sender:str, bits:int) -> Any:
+    """
+    Hashes word unigrams and bigrams of the subject and body (plus the sender's domain) into 2**bits buckets.
+
+    Args:
+        - subject (str): Email subject.
+        - body (str): Email body; only the first 'pre_classifier.max_body_chars' characters are used.
+        - sender (str): Sender address.
+        - bits (int): Feature space size as a power of two.
+
+    Returns:
+        - np.ndarray: Distinct active feature indices (binary features).
+    """
+
+    mask = (1 << bits) - 1
+    features = {zlib.crc32(b"d:" + sender.rpartition("@")[2].lower().encode("utf-8")) & mask}
+    for prefix, text in ((b"s:", subject or ""), (b"b:", (body or "")[:config["pre_classifier"]["max_body_chars"]])):
+        words = [word.encode("utf-8") for word in WORD.findall(text.lower())]
+        for i, word in enumerate(words):
+            features.add(zlib.crc32(prefix + word) & mask)
+            if i: # crc32 is stable across processes, unlike hash()
+                features.add(zlib.crc32(prefix + words[i - 1] + b" " + word) & mask)
+    return np.fromiter(features, dtype="int64", count=len(features))
+
+class LinearModel:
+    """
+    Logistic regression over hashed binary features, predicting P(category == "Other").
+    """
+
+    def __init__(self, weights:Any, bias:float, bits:int) -> None:
+        """
+        Args:
+            - weights (np.ndarray): float32 weight per feature bucket.
+            - bias (float): Intercept.
+            - bits (int): Feature space size as a power of two.
+        """
+
+        self.weights = weights
+        self.bias = bias
+        self.bits = bits
+
+    def probability(self, features:Any) -> float:
+        """
+        Args:
+            - features (np.ndarray): Active feature indices from featurize().
+
+        Returns:
+            - float: Probability that the email is "Other".
+        """
+
+        scale = 1.0 / np.sqrt(max(len(features), 1)) # L2-normalized binary features
+        return float(1.0 / (1.0 + np.exp(-(self.weights[features].sum() * scale + self.bias))))
+
+    @classmethod
+    def train(cls, features:List[Any], labels:List[bool], bits:int, epochs:int, learning_rate:float, seed:int=0) -> "LinearModel":
+        """
+        Fits the model with stochastic gradient descent on the log loss.
+
+        Args:
+            - features (List[np.ndarray]): Active feature indices per email.
+            - labels (List[bool]): Whether each email is "Other".
+            - bits (int): Feature space size as a power of two.
+            - epochs (int): Passes over the data.
+            - learning_rate (float): Initial step size; decays linearly to 10% over the epochs.
+
+        Returns:
+            - LinearModel: Trained model.
+        """
+
+        model = cls(np.zeros(1 << bits, dtype="float32"), 0.0, bits)
+        order = list(range(len(features)))
+        rng = random.Random(seed)
+        steps, step = epochs * len(order), 0
+
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for i in order:
+                rate = learning_rate * (1.0 - 0.9 * step / steps)
+                gradient = model.probability(features[i]) - float(labels[i])
+                model.weights[features[i]] -= rate * gradient / np.sqrt(max(len(features[i]), 1))
+                model.bias -= rate * gradient
+                step += 1
+        return model
+
+    def save(self, path:str) -> None:
+        """
+        Args:
+            - path (str): Destination .npz file; replaced atomically.
+        """
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, bits=self.bits)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path:str) -> "LinearModel":
+        """
+        Args:
+            - path (str): File written by save().
+
+        Returns:
+            - LinearModel: Loaded model.
+        """
+
+        with np.load(path) as data:
+            return cls(data["weights"], float(data["bias"]), int(data["bits"]))
+
+class PreClassification:
+    """
+    A confident local decision. When 'audit' is set the caller still asks the LLM and reports its answer
+    with confirm(), so that agreement can be measured.
+    """
+
+    def __init__(self, classifier:"PreClassifier", category:str, reason:str, audit:bool) -> None:
+        self.classifier = classifier
+        self.category = category
+        self.reason = reason # "rule:<name>" or "model:<probability>"
+        self.audit = audit
+
+    def confirm(self, llm_category:str) -> None:
+        """
+        Args:
+            - llm_category (str): Category the LLM assigned to the same email.
+        """
+
+        self.classifier.record_audit(self, llm_category)
+
+class PreClassifier:
+    """
+    Header rules plus an optional trained model, with skip and agreement counters.
+    """
+
+    def __init__(self, model_file:str) -> None:
+        """
+        Args:
+            - model_file (str): Path of the trained model; without it only the header rules apply.
+        """
+
+        self.model_file = model_file
+        self._model = None # loaded on first use; False when no model has been trained
+        self._lock = threading.Lock()
+        self._counts = {"emails": 0, "rule_skips": 0, "model_skips": 0, "escalated": 0, "audited": 0, "agreed": 0}
+
+    def model(self) -> Any:
+        """
+        Returns:
+            - LinearModel | None: Trained model, or None when the model file does not exist.
+        """
+
+        with self._lock:
+            if self._model is None:
+                self._model = LinearModel.load(self.model_file) if os.path.exists(self.model_file) else False
+            return self._model or None
+
+    def _count(self, name:str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def classify(self, mail:dict) -> Any:
+        """
+        Args:
+            - mail (dict): Email as yielded by iter_unread_emails().
+
+        Returns:
+            - PreClassification | None: Confident "Other" decision, or None to escalate to the LLM.
+        """
+
+        settings = config["pre_classifier"]
+        self._count("emails")
+
+        reason = header_rule(mail)
+        if reason is not None:
+            reason = f"rule:{reason}"
+            self._count("rule_skips")
+        else:
+            model = self.model()
+            if model is not None:
+                features = featurize(mail.get("subject", ""), mail.get("body", ""), mail.get("from_email") or "", model.bits)
+                probability = model.probability(features)
+                if probability >= settings["threshold"]:
+                    reason = f"model:{probability:.3f}"
+                    self._count("model_skips")
+
+        if reason is None:
+            self._count("escalated")
+            return None
+        return PreClassification(self, "Other", reason, audit=random.random() < settings["audit_rate"])
+
+    def record_audit(self, verdict:PreClassification, llm_category:str) -> None:
+        """
+        Records whether the LLM agreed with an audited local decision.
+        """
+
+        with self._lock:
+            self._counts["audited"] += 1
+            self._counts["agreed"] += llm_category.strip().lower() == verdict.category.lower()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            - dict: Counters plus skip_rate (share of emails answered locally) and agreement (share of audited
+              local decisions the LLM agreed with; None before the first audit).
+        """
+
+        with self._lock:
+            counts = dict(self._counts)
+        skips = counts["rule_skips"] + counts["model_skips"]
+        counts["skip_rate"] = skips / counts["emails"] if counts["emails"] else 0.0
+        counts["agreement"] = counts["agreed"] / counts["audited"] if counts["audited"] else None
+        return counts
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_pre_classifier() -> PreClassifier:
+    """
+    Returns:
+        - PreClassifier: Process-wide pre-classifier bound to the configured model file.
+    """
+
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = PreClassifier(config["path"]["pre_classifier"]["model_file"])
+        return _classifier
+
+def pre_classify(mail:dict) -> Any:
+    """
+    Pipeline stage: decides obvious "Other" mail locally, in microseconds and without any network call.
+
+    Args:
+        - mail (dict): Email as yielded by iter_unread_emails().
+
+    Returns:
+        - PreClassification | None: Confident decision, or None when the LLM has to classify the email.
+    """
+
+    return get_pre_classifier().classify(mail)
+
+def train_from_logs(items:Iterable[dict]) -> Tuple[LinearModel, dict]:
+    """
+    Trains the model on logged emails the LLM classified, holding out 20% to report how the configured
+    threshold would perform.
+
+    Args:
+        - items (Iterable[dict]): Email log items with "subject", "body", "from_email", "category" and
+          optionally "classified_by" (items decided locally are ignored, so the model never learns from itself).
+
+    Returns:
+        - Tuple[LinearModel, dict]: (model trained on all examples, hold-out report).
+    """
+
+    settings = config["pre_classifier"]
+    bits = settings["hash_bits"]
+
+    examples = [item for item in items if item.get("category") and item.get("classified_by", "llm") == "llm"]
+    if len(examples) < settings["min_training_examples"]:
+        raise ValueError(f"{len(examples)} labelled emails found; at least {settings['min_training_examples']} are needed")
+
+    random.Random(1).shuffle(examples)
+    features = [featurize(item.get("subject", ""), item.get("body", ""), item.get("from_email", ""), bits) for item in examples]
+    labels = [item["category"].strip().lower() == "other" for item in examples]
+
+    split = len(examples) * 4 // 5
+    holdout = LinearModel.train(features[:split], labels[:split], bits, settings["epochs"], settings["learning_rate"])
+    skipped = [label for x, label in zip(features[split:], labels[split:]) if holdout.probability(x) >= settings["threshold"]]
+    report = {
+        "examples": len(examples),
+        "other_share": sum(labels) / len(labels),
+        "holdout_skip_rate": len(skipped) / (len(examples) - split),
+        "holdout_agreement": sum(skipped) / len(skipped) if skipped else None # share of skips the LLM also called "Other"
+    }
+
+    return LinearModel.train(features, labels, bits, settings["epochs"], settings["learning_rate"]), report
+
+def train_pre_classifier() -> dict:
+    """
+    Trains the model from the DynamoDB email logs and saves it to 'path.pre_classifier.model_file'.
+    A running process picks the new model up on its next start.
+
+    Returns:
+        - dict: Hold-out report (see train_from_logs()).
+    """
+
+    from storage.dynamodb_handler import scan_email_logs # boto3 is only needed for training
+
+    model, report = train_from_logs(scan_email_logs(["subject", "body", "from_email", "category", "classified_by"]))
+    model.save(config["path"]["pre_classifier"]["model_file"])
+    return report
@@ -0,0 +1,537 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Shared client layer for every chat completion and embedding request (OpenRouter and OpenAI).
+
+One Provider per API endpoint owns a pooled keep-alive HTTP client with timeouts, waits on per-model
+token buckets so requests stay within the configured RPM/TPM limits, retries rate limits and server
+errors with jittered exponential backoff (honouring Retry-After), hedges slow idempotent requests with
+a duplicate, and records per-model latency and token metrics. Every completed request is also logged as an
+"llm_call" event (tokens, estimated cost, attempts) under the trace id of the email it belongs to.
+"""
+
+import os
+import time
+import httpx
+import random
+import openai
+import threading
+
+from openai import OpenAI
+from collections import deque
+from dotenv import load_dotenv
+from typing import Any, Callable, List
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.utils import load_config
+from utils.metrics import llm_cost, log_event
+
+load_dotenv() # load environment variables from .env file
+config = load_config() # load project configuration
+
+API_KEY_VARIABLES = {"openrouter": "OPENROUTER_API_KEY", "openai": "OPENAI_API_KEY"} # provider -> environment variable
+
+# errors worth another attempt; everything else (bad request, auth, ...) is raised immediately
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+def estimate_tokens(text:str) -> int:
+    """
+    Args:
+        - text (str): Input text.
+
+    Returns:
+        - int: Estimated token count (1 token = 4 characters on average).
+    """
+
+    return len(text) // 4 + 1
+
+def marker_line_end(text:str, marker:str, start:int=0) -> Any:
+    """
+    Finds a marker that stands on a line of its own which has been completed by a line break, so a marker
+    mentioned inside a sentence, or a line that merely starts with it, does not count.
+
+    Args:
+        - text (str): Text generated so far.
+        - marker (str): Marker line (e.g. the sign-off).
+        - start (int): Offset of the newly added text; line breaks before it were already checked.
+
+    Returns:
+        - int | None: Offset just past the marker, or None when no such line has been completed yet.
+    """
+
+    newline = text.find("\n", start)
+    while newline != -1:
+        line_start = text.rfind("\n", 0, newline) + 1
+        line = text[line_start:newline]
+        if line.strip() == marker:
+            return line_start + line.index(marker) + len(marker)
+        newline = text.find("\n", newline + 1)
+    return None
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at 'per_minute' units per minute.
+    """
+
+    def __init__(self, per_minute:float) -> None:
+        """
+        Args:
+            - per_minute (float): Refill rate and capacity (a full minute of budget can be spent at once).
+        """
+
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount:float) -> float:
+        """
+        Takes 'amount' units if available.
+
+        Args:
+            - amount (float): Units to take; clamped to capacity so oversized requests can still run.
+
+        Returns:
+            - float: 0 on success, otherwise seconds until enough units will be available.
+        """
+
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def refund(self, amount:float) -> None:
+        """
+        Returns units reserved by an estimate that turned out too high (or by a request that was never sent).
+        """
+
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits of one model.
+    """
+
+    def __init__(self, rpm:float, tpm:float) -> None:
+        """
+        Args:
+            - rpm (float): Requests per minute.
+            - tpm (float): Tokens (prompt + completion) per minute.
+        """
+
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def try_acquire(self, tokens:int) -> float:
+        """
+        Args:
+            - tokens (int): Estimated tokens of the request.
+
+        Returns:
+            - float: 0 if the request may be sent now, otherwise seconds to wait before trying again.
+        """
+
+        wait_requests = self.requests.try_acquire(1)
+        if wait_requests:
+            return wait_requests
+
+        wait_tokens = self.tokens.try_acquire(tokens)
+        if wait_tokens:
+            self.requests.refund(1)
+        return wait_tokens
+
+    def acquire(self, tokens:int) -> None:
+        """
+        Blocks until the request fits within both limits.
+
+        Args:
+            - tokens (int): Estimated tokens of the request.
+        """
+
+        while True:
+            delay = self.try_acquire(tokens)
+            if not delay:
+                return
+            time.sleep(min(delay, 1.0) * (1 + 0.1 * random.random())) # jitter so waiting threads do not wake together
+
+class ModelMetrics:
+    """
+    Counters and a sliding latency window for one (kind, model) pair.
+    """
+
+    def __init__(self, window:int=1000) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window) # seconds per successful attempt
+
+    def percentile(self, q:float) -> float:
+        """
+        Args:
+            - q (float): Percentile in [0, 100].
+
+        Returns:
+            - float: Latency percentile in seconds (0 without samples).
+        """
+
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50": self.percentile(50),
+            "latency_p95": self.percentile(95),
+            "latency_p99": self.percentile(99)
+        }
+
+class Provider:
+    """
+    Pooled, rate-limited, retrying client for one OpenAI-compatible endpoint.
+    """
+
+    def __init__(self, name:str, base_url:str, api_key:str, settings:dict) -> None:
+        """
+        Args:
+            - name (str): Provider name, e.g. "openrouter" or "openai".
+            - base_url (str): API endpoint.
+            - api_key (str): API key for the endpoint.
+            - settings (dict): The 'llm_provider' section of config.yaml.
+        """
+
+        self.name = name
+        self.settings = settings
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=settings["max_connections"], max_keepalive_connections=settings["max_keepalive_connections"]),
+            timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"])
+        )
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client, max_retries=0) # retries are done here
+        self._pool = ThreadPoolExecutor(max_workers=settings["max_connections"], thread_name_prefix=f"{name}-request")
+        self._limiters = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model:str) -> RateLimiter:
+        """
+        Args:
+            - model (str): Model name.
+
+        Returns:
+            - RateLimiter: Shared limiter for the model ('rate_limits.default' when not listed).
+        """
+
+        with self._lock:
+            if model not in self._limiters:
+                limits = self.settings["rate_limits"].get(model) or self.settings["rate_limits"]["default"]
+                self._limiters[model] = RateLimiter(limits["rpm"], limits["tpm"])
+            return self._limiters[model]
+
+    def _model_metrics(self, kind:str, model:str) -> ModelMetrics:
+        with self._lock:
+            return self._metrics.setdefault((kind, model), ModelMetrics())
+
+    def metrics(self) -> dict:
+        """
+        Returns:
+            - dict: "<kind>:<model>" -> counters and latency percentiles (seconds).
+        """
+
+        with self._lock:
+            return {f"{kind}:{model}": metrics.snapshot() for (kind, model), metrics in self._metrics.items()}
+
+    def _hedge_delay(self, metrics:ModelMetrics) -> float:
+        """
+        Seconds to wait for the first attempt before sending a duplicate: the observed tail latency once
+        there are enough samples, never less than 'hedge_after'.
+        """
+
+        if len(metrics.latencies) < 20:
+            return self.settings["hedge_after"]
+        return max(self.settings["hedge_after"], metrics.percentile(self.settings["hedge_percentile"]))
+
+    def _attempt(self, request:Callable[[], Any], metrics:ModelMetrics) -> Any:
+        start = time.perf_counter()
+        response = request()
+        with self._lock:
+            metrics.latencies.append(time.perf_counter() - start)
+        return response
+
+    def _hedged(self, request:Callable[[], Any], limiter:RateLimiter, tokens:int, metrics:ModelMetrics) -> Any:
+        """
+        Sends the request; if it has not answered within the hedge delay (and the rate limit has room),
+        sends a duplicate and returns whichever answer arrives first.
+        """
+
+        first = self._pool.submit(self._attempt, request, metrics)
+        done, _ = wait([first], timeout=self._hedge_delay(metrics))
+        if done or limiter.try_acquire(tokens):
+            return first.result()
+
+        second = self._pool.submit(self._attempt, request, metrics)
+        with self._lock:
+            metrics.hedges += 1
+
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is not None and pending: # one failed early; the other may still succeed
+            winner = pending.pop()
+
+        response = winner.result() # the slower request finishes in the background and is discarded
+        if winner is second:
+            with self._lock:
+                metrics.hedge_wins += 1
+        return response
+
+    def _retry_delay(self, error:Exception, attempt:int) -> float:
+        """
+        Seconds to wait before the next attempt: the server's Retry-After when given, else jittered exponential backoff.
+        """
+
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.settings["backoff_max"])
+        except ValueError: # HTTP-date form; fall back to backoff
+            pass
+        return min(self.settings["backoff_base"] * (2 ** attempt), self.settings["backoff_max"]) * (0.5 + random.random())
+
+    def call(self, kind:str, model:str, tokens:int, request:Callable[[], Any], hedge:bool=False) -> Any:
+        """
+        Runs one API request under the model's rate limit with retries and optional hedging.
+
+        Args:
+            - kind (str): "chat" or "embedding" (metrics label).
+            - model (str): Model name (rate limit and metrics key).
+            - tokens (int): Estimated prompt + completion tokens.
+            - request (Callable[[], Any]): Performs the request with self.client.
+            - hedge (bool): Whether the request is idempotent and may be sent twice.
+
+        Returns:
+            - Any: SDK response object.
+        """
+
+        limiter = self.limiter(model)
+        metrics = self._model_metrics(kind, model)
+        max_retries = self.settings["max_retries"]
+        start = time.perf_counter()
+
+        with self._lock:
+            metrics.calls += 1
+
+        for attempt in range(max_retries + 1):
+            limiter.acquire(tokens)
+            try:
+                if hedge and self.settings["hedge_after"] > 0:
+                    response = self._hedged(request, limiter, tokens, metrics)
+                else:
+                    response = self._attempt(request, metrics)
+                break
+
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    with self._lock:
+                        metrics.errors += 1
+                    raise
+                delay = self._retry_delay(e, attempt)
+                with self._lock:
+                    metrics.retries += 1
+                print(f"{self.name} {kind} request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+            except Exception:
+                with self._lock:
+                    metrics.errors += 1
+                raise
+
+        usage = getattr(response, "usage", None)
+        prompt_tokens = completion_tokens = 0
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens or 0, getattr(usage, "completion_tokens", 0) or 0
+            limiter.tokens.refund(max(0, tokens - prompt_tokens - completion_tokens)) # give back what the estimate over-reserved
+            with self._lock:
+                metrics.prompt_tokens += prompt_tokens
+                metrics.completion_tokens += completion_tokens
+
+        log_event("llm_call", provider=self.name, kind=kind, model=model, attempts=attempt + 1, seconds=round(time.perf_counter() - start, 6),
+                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=llm_cost(model, prompt_tokens, completion_tokens))
+        return response
+
+    def chat(self, hedge:Any=None, **request) -> Any:
+        """
+        Creates a chat completion.
+
+        Args:
+            - hedge (bool | None): Allow a duplicate request for tail latency; by default only deterministic
+              (temperature 0) requests are hedged.
+            - **request: Arguments of client.chat.completions.create().
+
+        Returns:
+            - ChatCompletion: SDK response.
+        """
+
+        if hedge is None:
+            hedge = request.get("temperature", 1.0) == 0
+        tokens = sum(estimate_tokens(message["content"]) for message in request["messages"]) + (request.get("max_tokens") or 0)
+        return self.call("chat", request["model"], tokens, lambda: self.client.chat.completions.create(**request), hedge=hedge)
+
+    def chat_stream(self, deadline:float, until:str=None, **request) -> str:
+        """
+        Creates a streamed chat completion and accumulates it, giving up at a hard deadline: a watchdog closes
+        the stream when the deadline passes, so neither a slow first token nor a stalled stream can outlive it.
+        Rate-limit waits and retries happen only while time remains.
+
+        Args:
+            - deadline (float): time.monotonic() value by which the reply must be complete.
+            - until (str): Optional marker (e.g. the sign-off); once it has been generated on a line of its own and
+              that line is complete, the stream is closed and the text up to and including it is returned without
+              waiting for the rest.
+            - **request: Arguments of client.chat.completions.create() (without 'stream').
+
+        Returns:
+            - str: Generated text.
+
+        Raises:
+            - TimeoutError: If the deadline passes before the reply is complete.
+        """
+
+        model = request["model"]
+        limiter = self.limiter(model)
+        metrics = self._model_metrics("chat", model)
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in request["messages"])
+        tokens = prompt_tokens + (request.get("max_tokens") or 0)
+
+        with self._lock:
+            metrics.calls += 1
+
+        for attempt in range(self.settings["max_retries"] + 1):
+            while True: # rate limit, but never wait past the deadline
+                delay = limiter.try_acquire(tokens)
+                if not delay:
+                    break
+                if time.monotonic() + delay >= deadline:
+                    with self._lock:
+                        metrics.errors += 1
+                    raise TimeoutError(f"{self.name} rate limit for {model} leaves no time before the deadline")
+                time.sleep(min(delay, 1.0))
+
+            start = time.perf_counter()
+            text = ""
+            try:
+                stream = self.client.chat.completions.create(stream=True, timeout=max(deadline - time.monotonic(), 0.001), **request)
+                watchdog = threading.Timer(max(deadline - time.monotonic(), 0.0), stream.close) # interrupts a blocked read
+                watchdog.start()
+                try:
+                    for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            text += delta
+                            end = marker_line_end(text, until, len(text) - len(delta)) if until else None
+                            if end is not None:
+                                text = text[:end] # early send: the rest is not needed
+                                break
+                finally:
+                    watchdog.cancel()
+                    stream.close() # stops the server-side generation we no longer read
+
+                if time.monotonic() >= deadline and not (until and text.rstrip().endswith("\n" + until)):
+                    raise TimeoutError("stream closed at the deadline") # the watchdog ended the stream early
+
+                completion_tokens = estimate_tokens(text)
+                with self._lock:
+                    metrics.latencies.append(time.perf_counter() - start)
+                    metrics.prompt_tokens += prompt_tokens
+                    metrics.completion_tokens += completion_tokens
+                limiter.tokens.refund(max(0, tokens - prompt_tokens - completion_tokens)) # give back unused completion budget
+                log_event("llm_call", provider=self.name, kind="chat", model=model, attempts=attempt + 1, stream=True,
+                          seconds=round(time.perf_counter() - start, 6), prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                          cost_usd=llm_cost(model, prompt_tokens, completion_tokens))
+                return text
+
+            except Exception as e:
+                retryable = isinstance(e, RETRYABLE_ERRORS)
+                delay = self._retry_delay(e, attempt) if retryable else 0.0
+                out_of_time = time.monotonic() + delay >= deadline
+                if out_of_time or not retryable or attempt == self.settings["max_retries"]:
+                    with self._lock:
+                        metrics.errors += 1
+                    if out_of_time: # whatever broke the stream (timeout, watchdog), the deadline is what failed
+                        raise TimeoutError(f"{self.name} chat stream for {model} exceeded its deadline") from e
+                    raise
+                with self._lock:
+                    metrics.retries += 1
+                print(f"{self.name} chat stream failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed(self, model:str, inputs:List[str], hedge:bool=False) -> Any:
+        """
+        Creates embeddings.
+
+        Args:
+            - model (str): Embedding model name.
+            - inputs (List[str]): Texts to embed.
+            - hedge (bool): Allow a duplicate request for tail latency (worth it for single query embeddings).
+
+        Returns:
+            - CreateEmbeddingResponse: SDK response.
+        """
+
+        tokens = sum(estimate_tokens(text) for text in inputs)
+        return self.call("embedding", model, tokens, lambda: self.client.embeddings.create(model=model, input=inputs), hedge=hedge)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.http_client.close()
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(name:str) -> Provider:
+    """
+    Returns the process-wide provider for an API endpoint listed under 'api_endpoint' in config.yaml.
+
+    Args:
+        - name (str): "openrouter" (chat completions) or "openai" (embeddings).
+
+    Returns:
+        - Provider: Shared provider.
+    """
+
+    with _providers_lock:
+        if name not in _providers:
+            api_key = os.getenv(API_KEY_VARIABLES[name]) if config["flags"]["credentials_from_env"] else "<api_key>"
+            _providers[name] = Provider(name, config["api_endpoint"][name], api_key, config["llm_provider"])
+        return _providers[name]
+
+def provider_metrics() -> dict:
+    """
+    Returns:
+        - dict: Provider name -> per-model metrics, for every provider created so far.
+    """
+
+    with _providers_lock:
+        providers = dict(_providers)
+    return {name: provider.metrics() for name, provider in providers.items()}
@@ -0,0 +1,376 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Semantic cache of generated replies, for recurring inquiries ("what is your return policy", "do you ship to X")
+that are answered with essentially the same email.
+
+Each reply is stored with the embedding of the email's extracted information (without personal fields such as
+names and order ids), its category, every extracted value and the knowledge base chunks retrieved for it. A new
+email of the same category whose embedding is within 'reply_cache.similarity_threshold' (cosine) reuses the reply,
+with the personal fields of the earlier email replaced by its own. A reply that still mentions any word of an earlier
+personal value, or any other extracted value of the earlier email (a name, tracking number or address under a key
+the config does not list) which the new email does not share, is not reused. Entries live in SQLite; the vectors
+are searched with one small in-memory FAISS index per category.
+
+A reply is only reused while the text of every chunk it was built from is unchanged: each chunk is kept as
+(vector id, content hash), because vector ids start again from 0 when the index is rebuilt from scratch.
+"""
+
+import os
+import re
+import json
+import time
+import faiss
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+from typing import Any, List, Tuple
+from utils.utils import load_config
+from rag.semantic_search import embed_query, get_retriever
+
+config = load_config() # load project configuration
+
+def flatten_info(value:Any, path:str="") -> dict:
+    """
+    Args:
+        - value (Any): Extracted information, or a value nested in it.
+        - path (str): Key path of 'value' ("address.city", "items.0.sku").
+
+    Returns:
+        - dict: Key path -> value as text, for every non-empty scalar (booleans left out).
+    """
+
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {} if value in (None, "") or isinstance(value, bool) else {path: str(value)}
+
+    flat = {}
+    for key, item in items:
+        flat.update(flatten_info(item, f"{path}.{key}" if path else str(key)))
+    return flat
+
+def is_personal(path:str) -> bool:
+    """
+    Returns:
+        - bool: Whether a key path lies under one of 'reply_cache.personal_fields'.
+    """
+
+    return any(key in config["reply_cache"]["personal_fields"] for key in path.split("."))
+
+def cache_query(extracted_info:dict) -> Tuple[str, dict]:
+    """
+    Splits extracted information into the text that is embedded and the values that are checked in a reused reply.
+
+    Args:
+        - extracted_info (dict): Structured data extracted from the customer's email.
+
+    Returns:
+        - Tuple[str, dict]: (JSON of the non-personal fields with sorted keys, key path -> value as text for all fields).
+    """
+
+    personal = set(config["reply_cache"]["personal_fields"])
+    query = {key: value for key, value in extracted_info.items() if key not in personal and value not in (None, "", [], {})}
+    return (json.dumps(query, sort_keys=True, ensure_ascii=False) if query else ""), flatten_info(extracted_info)
+
+def adapt_reply(reply:str, cached_fields:dict, fields:dict) -> Any:
+    """
+    Replaces the personal details of the email a reply was written for with those of the new email.
+
+    Args:
+        - reply (str): Cached reply.
+        - cached_fields (dict): Extracted values (key path -> text) of the email the reply was generated for.
+        - fields (dict): Extracted values of the new email.
+
+    Returns:
+        - str | None: Adapted reply, or None when it mentions a value of the earlier email that the new email does
+          not share and that cannot be replaced (a non-personal field, or a personal one the new email lacks), or
+          still mentions part of a replaced personal value ("Dear Priya" for "Priya Shah"). Matching ignores case.
+    """
+
+    replaced = {}
+    for key, old in cached_fields.items():
+        pattern = re.compile(r"(?<!\w)" + re.escape(old) + r"(?!\w)", re.IGNORECASE)
+        if fields.get(key) == old:
+            continue
+        if is_personal(key):
+            replaced[key] = pattern
+        elif pattern.search(reply): # e.g. the "tracking_number" of the earlier customer
+            return None
+
+    for key, pattern in replaced.items():
+        if key in fields:
+            reply = pattern.sub(lambda _: fields[key], reply)
+
+    # any word of an earlier personal value left over (first name, surname, order number) that the new value lacks
+    words = set(re.findall(r"\w+", reply.casefold()))
+    for key in replaced:
+        leftover = set(re.findall(r"\w+", cached_fields[key].casefold())) - set(re.findall(r"\w+", fields.get(key, "").casefold()))
+        if any(len(word) > 1 and word in words for word in leftover):
+            return None
+    return reply
+
+def chunk_digest(text:str) -> str:
+    """
+    Returns:
+        - str: SHA-256 of a knowledge base chunk's text (as in the index manifest).
+    """
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunks_unchanged(store:Any, chunks:list) -> bool:
+    """
+    Args:
+        - store (ChunkStore | None): Current chunk store.
+        - chunks (list): [vector id, content hash] of the chunks a reply was built from.
+
+    Returns:
+        - bool: Whether every chunk is still indexed under its id with the same text.
+    """
+
+    if not chunks:
+        return True
+    if store is None or not all(isinstance(chunk, list) and len(chunk) == 2 for chunk in chunks): # no index, or an entry of an older format
+        return False
+
+    texts = store.texts(np.array([chunk_id for chunk_id, _ in chunks], dtype="int64")) # unknown ids are skipped
+    return len(texts) == len(chunks) and all(chunk_digest(text) == digest for text, (_, digest) in zip(texts, chunks))
+
+class ReplyCache:
+    """
+    Persistent reply cache bounded by age (TTL) and number of entries, searched by embedding similarity.
+    """
+
+    def __init__(self, path:str, model:str, threshold:float, ttl:float, max_entries:int) -> None:
+        """
+        Args:
+            - path (str): SQLite file holding the cached replies and their embeddings.
+            - model (str): Embedding model name; entries embedded with another model are ignored.
+            - threshold (float): Minimum cosine similarity for a cached reply to be reused.
+            - ttl (float): Seconds after which a cached reply is no longer used.
+            - max_entries (int): Maximum number of replies kept before LRU eviction.
+        """
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.model = model
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0 # entries dropped because their knowledge base chunks were re-indexed
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS replies (id INTEGER PRIMARY KEY, model TEXT NOT NULL, category TEXT NOT NULL, "
+            "query TEXT NOT NULL, vector BLOB NOT NULL, chunk_ids TEXT NOT NULL, fields TEXT NOT NULL, reply TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS replies_last_used ON replies (last_used)")
+        self._db.commit()
+
+        # one exact inner-product index per category over normalized vectors, keyed by row id
+        self._indexes = {}
+        for row_id, category, vector in self._db.execute("SELECT id, category, vector FROM replies WHERE model = ?", (model,)):
+            self._index(category, len(vector) // 4).add_with_ids(np.frombuffer(vector, dtype="float32").reshape(1, -1), np.array([row_id], dtype="int64"))
+
+    def _index(self, category:str, dim:int) -> Any:
+        if category not in self._indexes:
+            self._indexes[category] = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        return self._indexes[category]
+
+    def _delete(self, rows:List[Tuple[int, str]]) -> None:
+        """
+        Removes entries from SQLite and their vectors from the category indexes. Caller holds the lock.
+        """
+
+        for row_id, category in rows:
+            self._db.execute("DELETE FROM replies WHERE id = ?", (row_id,))
+            if category in self._indexes:
+                self._indexes[category].remove_ids(np.array([row_id], dtype="int64"))
+
+    def get(self, category:str, vector:np.ndarray, fields:dict, store:Any, candidates:int=4) -> Any:
+        """
+        Args:
+            - category (str): Email category; only replies of the same category are reused.
+            - vector (np.ndarray): L2-normalized query embedding, shape (1, dim).
+            - fields (dict): Extracted values of the new email (see cache_query()).
+            - store (ChunkStore | None): Current chunk store, to check that a reply's chunks are unchanged.
+            - candidates (int): Nearest cached replies considered.
+
+        Returns:
+            - str | None: Adapted cached reply, or None on a miss.
+        """
+
+        now = time.time()
+        with self._lock:
+            index = self._indexes.get(category)
+            if index is None or index.ntotal == 0 or index.d != vector.shape[1]:
+                self.misses += 1
+                return None
+
+            scores, ids = index.search(vector, min(candidates, index.ntotal))
+            for score, row_id in zip(scores[0], ids[0]):
+                if row_id == -1 or score < self.threshold:
+                    break
+
+                row_id = int(row_id)
+                chunks, cached_fields, reply, created = self._db.execute(
+                    "SELECT chunk_ids, fields, reply, created FROM replies WHERE id = ?", (row_id,)
+                ).fetchone()
+
+                if created <= now - self.ttl:
+                    self._delete([(row_id, category)])
+                    continue
+                if not chunks_unchanged(store, json.loads(chunks)):
+                    self._delete([(row_id, category)])
+                    self.stale += 1
+                    continue
+
+                adapted = adapt_reply(reply, json.loads(cached_fields), fields)
+                if adapted is None: # mentions details of the earlier email
+                    continue
+
+                self._db.execute("UPDATE replies SET last_used = ? WHERE id = ?", (now, row_id))
+                self._db.commit()
+                self.hits += 1
+                return adapted
+
+            self._db.commit() # expired or stale entries removed above
+            self.misses += 1
+            return None
+
+    def put(self, category:str, query:str, vector:np.ndarray, chunks:List[list], fields:dict, reply:str) -> None:
+        """
+        Stores a generated reply, dropping expired entries and evicting the least recently used ones beyond max_entries.
+
+        Args:
+            - category (str): Email category.
+            - query (str): Embedded text (kept for inspection).
+            - vector (np.ndarray): L2-normalized query embedding, shape (1, dim).
+            - chunks (List[list]): [vector id, content hash] of the knowledge base chunks retrieved for the reply.
+            - fields (dict): Extracted values of the email the reply was written for.
+            - reply (str): Generated reply.
+        """
+
+        now = time.time()
+        vector = np.ascontiguousarray(vector, dtype="float32").reshape(1, -1)
+        with self._lock:
+            row_id = self._db.execute(
+                "INSERT INTO replies (model, category, query, vector, chunk_ids, fields, reply, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.model, category, query, vector.tobytes(), json.dumps(sorted(chunks)), json.dumps(fields), reply, now, now)
+            ).lastrowid
+            self._index(category, vector.shape[1]).add_with_ids(vector, np.array([row_id], dtype="int64"))
+
+            expired = self._db.execute("SELECT id, category FROM replies WHERE created <= ?", (now - self.ttl,)).fetchall()
+            self._delete(expired)
+
+            excess = self._db.execute("SELECT COUNT(*) FROM replies").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._delete(self._db.execute("SELECT id, category FROM replies ORDER BY last_used LIMIT ?", (excess,)).fetchall())
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            - dict: Hit/miss counters, stale (invalidated) entries and current size of the cache.
+        """
+
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM replies").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries
+        }
+
+class ReplyLookup:
+    """
+    Result of looking up an email in the reply cache. On a miss, save() stores the reply generated instead.
+    """
+
+    def __init__(self, cache:ReplyCache, category:str, query:str, vector:np.ndarray, fields:dict, reply:Any) -> None:
+        self.cache = cache
+        self.category = category
+        self.query = query
+        self.vector = vector
+        self.fields = fields
+        self.reply = reply # cached reply adapted to this email, or None on a miss
+
+    def save(self, reply:str, results:List[dict]) -> None:
+        """
+        Args:
+            - reply (str): Reply generated for this email.
+            - results (List[dict]): Knowledge base chunks retrieved for it ({"chunk", "chunk_id", ...}).
+        """
+
+        chunks = {result["chunk_id"]: chunk_digest(result["chunk"]) for result in results}
+        self.cache.put(self.category, self.query, self.vector, [[chunk_id, digest] for chunk_id, digest in chunks.items()], self.fields, reply)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_reply_cache() -> Any:
+    """
+    Returns:
+        - ReplyCache | None: Process-wide reply cache, or None when it is disabled in config.yaml.
+    """
+
+    global _cache
+
+    settings = config["reply_cache"]
+    if not settings["enabled"]:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReplyCache(config["path"]["reply_cache"]["file"], config["embedding_model"]["openai"],
+                                settings["similarity_threshold"], settings["ttl_seconds"], settings["max_entries"])
+        return _cache
+
+def lookup_reply(category:str, extracted_info:dict) -> Any:
+    """
+    Looks up a reusable reply for an email. Costs one (cached) query embedding and a local search.
+
+    Args:
+        - category (str): Email category.
+        - extracted_info (dict): Structured data extracted from the customer's email.
+
+    Returns:
+        - ReplyLookup | None: Lookup result (with .reply set on a hit), or None when the cache is disabled,
+          the category is not cached or the email has nothing to match on.
+    """
+
+    cache = get_reply_cache()
+    if cache is None or category not in config["reply_cache"]["categories"] or not isinstance(extracted_info, dict):
+        return None
+
+    query, fields = cache_query(extracted_info)
+    if not query: # only personal details: nothing to compare
+        return None
+
+    try:
+        vector = embed_query(query)
+        faiss.normalize_L2(vector)
+    except Exception as e:
+        print(f"Reply cache lookup skipped: {e}")
+        return None
+
+    try:
+        store = get_retriever().snapshot()[2]
+    except (FileNotFoundError, RuntimeError): # no knowledge base index yet
+        store = None
+
+    return ReplyLookup(cache, category, query, vector, fields, cache.get(category, vector, fields, store))
@@ -0,0 +1,299 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Persistent cache of LLM results shared by categorization, extraction and reply generation.
+
+Results are stored in SQLite, keyed by sha256(function, model, temperature, prompt), and expire after a
+TTL; beyond max_entries the least recently used results are evicted. For categorization, email bodies are
+normalized before they are hashed (quoted replies, signatures and whitespace removed), so repeated or bulk-sent
+copies of a message share one entry; calls that extract customer details are keyed on the exact prompt.
+Concurrent calls for the same key are coalesced into a single request.
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from typing import Any, Callable, Tuple
+from utils.utils import load_config, normalize_text
+
+config = load_config() # load project configuration
+
+# first line of a quoted earlier message; everything from here on is history, not the new message
+QUOTE_HEADER = re.compile(
+    r"^(On\b[^\n]*(?:\n[^\n]*)?\bwrote:"           # gmail / apple mail: "On Mon, 1 Jan 2024, John <john@x.com> wrote:"
+    r"|-{2,}\s*(Original|Forwarded) Message\s*-{2,}" # outlook / gmail forwards
+    r"|From:[^\n]*\n(Sent|Date):[^\n]*"            # outlook reply header block
+    r")\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# first line of a signature block; a whole line such as "Thanks," (not "Thank you for ...")
+SIGNATURE = re.compile(
+    r"^(--\s?|_{5,}|Sent from my\b.*|Get Outlook for\b.*"
+    r"|(best|kind|warm)?\s*regards|thanks( and regards)?|thank you|cheers|sincerely|yours (truly|sincerely))[,.!]?\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+SIGNATURE_MAX_LINES = 6 # a sign-off only starts the signature this close to the end of the message
+
+def normalize_subject(subject:str) -> str:
+    """
+    Args:
+        - subject (str): Email subject.
+
+    Returns:
+        - str: Subject without "Re:"/"Fwd:" prefixes, whitespace-collapsed and case-folded.
+    """
+
+    subject = re.sub(r"^\s*((re|fwd?|aw|sv)\s*(\[\d+\])?\s*:\s*)+", "", subject or "", flags=re.IGNORECASE)
+    return normalize_text(subject).casefold()
+
+def signature_start(lines:list) -> int:
+    """
+    Finds the signature block at the end of a message: a sign-off line ("Thanks,", "Regards", "--", ...)
+    among the last SIGNATURE_MAX_LINES lines, followed only by short lines that do not read as sentences
+    (name, title, phone). A sign-off on the first line or in the middle of the text is left alone.
+
+    Args:
+        - lines (list): Lines of the message, without leading or trailing blank lines.
+
+    Returns:
+        - int: Index of the first signature line, or len(lines) when there is none.
+    """
+
+    for i in range(max(1, len(lines) - SIGNATURE_MAX_LINES), len(lines)):
+        trailer = lines[i + 1:]
+        if SIGNATURE.match(lines[i].strip()) and all(len(line) <= 60 and not line.rstrip().endswith((".", "?", "!")) for line in trailer):
+            return i
+    return len(lines)
+
+def normalize_email_body(body:str, strip_signature:bool=True) -> str:
+    """
+    Reduces an email body to the text that determines an LLM result, for use in cache keys only.
+
+    Args:
+        - body (str): Plain text email body.
+        - strip_signature (bool): Also drop the signature block.
+
+    Returns:
+        - str: New message text without quoted replies, ">" lines and (optionally) signature,
+          whitespace-collapsed and case-folded.
+    """
+
+    body = (body or "").replace("\r\n", "\n")
+
+    match = QUOTE_HEADER.search(body)
+    if match:
+        body = body[:match.start()]
+    body = "\n".join(line for line in body.split("\n") if not line.lstrip().startswith(">"))
+
+    if strip_signature:
+        lines = body.strip().split("\n")
+        body = "\n".join(lines[:signature_start(lines)])
+
+    return normalize_text(body).casefold()
+
+class ResponseCache:
+    """
+    On-disk LLM result cache bounded by age (TTL) and number of entries.
+    """
+
+    def __init__(self, path:str, ttl:float, max_entries:int) -> None:
+        """
+        Args:
+            - path (str): SQLite file holding the cache.
+            - ttl (float): Seconds after which a cached result is no longer used.
+            - max_entries (int): Maximum number of results kept before LRU eviction.
+        """
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, function TEXT NOT NULL, value TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._db.commit()
+
+    @staticmethod
+    def key(function:str, model:str, temperature:float, prompt:str) -> str:
+        """
+        Args:
+            - function (str): Name of the calling function; results of different tasks never mix.
+            - model (str): Chat completion model name.
+            - temperature (float): Sampling temperature of the call.
+            - prompt (str): Full (normalized) prompt text.
+
+        Returns:
+            - str: Cache key.
+        """
+
+        return hashlib.sha256(f"{function}\0{model}\0{float(temperature)}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key:str, count:bool=True) -> Tuple[bool, Any]:
+        """
+        Args:
+            - key (str): Cache key.
+            - count (bool): Whether the lookup counts towards hit/miss statistics.
+
+        Returns:
+            - Tuple[bool, Any]: (found, value); expired entries count as not found.
+        """
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)).fetchone()
+            if row is None:
+                self.misses += count
+                return False, None
+
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += count
+
+        return True, json.loads(row[0])
+
+    def put(self, key:str, function:str, value:Any) -> None:
+        """
+        Stores a JSON-serializable result, dropping expired entries and evicting the least recently used
+        ones beyond max_entries.
+
+        Args:
+            - key (str): Cache key.
+            - function (str): Name of the calling function (kept for inspection and stats).
+            - value (Any): Result to cache.
+        """
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, function, value, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, function, json.dumps(value), now, now)
+            )
+            self._db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+
+            excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+                )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            - dict: Hit/miss/coalesced counters and current size of the cache.
+        """
+
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": size,
+            "max_entries": self.max_entries
+        }
+
+class _InFlight:
+    """
+    A call being computed by one thread that other threads with the same key wait for.
+    """
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+_cache = None
+_cache_lock = threading.Lock()
+_in_flight = {} # cache key -> _InFlight
+_in_flight_lock = threading.Lock()
+
+def get_response_cache() -> Any:
+    """
+    Returns:
+        - ResponseCache | None: Process-wide cache, or None when caching is disabled in config.yaml.
+    """
+
+    global _cache
+
+    if not config["llm_cache"]["enabled"]:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(config["path"]["llm_cache"]["file"], config["llm_cache"]["ttl_seconds"], config["llm_cache"]["max_entries"])
+        return _cache
+
+def cached_completion(function:str, model:str, temperature:float, prompt:str, compute:Callable[[], Any]) -> Any:
+    """
+    Returns a cached result for the call when there is one, otherwise runs 'compute' and caches what it
+    returns. Only deterministic (temperature 0) calls are cached unless llm_cache.cache_nondeterministic is set.
+    Exceptions from 'compute' are not cached; they propagate to the caller and to coalesced waiters.
+
+    Args:
+        - function (str): Name of the calling function.
+        - model (str): Chat completion model name.
+        - temperature (float): Sampling temperature of the call.
+        - prompt (str): Prompt text to key on; pass normalized email text, not the raw body.
+        - compute (Callable[[], Any]): Performs the LLM call and returns a JSON-serializable result.
+
+    Returns:
+        - Any: Cached or freshly computed result.
+    """
+
+    cache = get_response_cache()
+    if cache is None or (temperature > 0 and not config["llm_cache"]["cache_nondeterministic"]):
+        return compute()
+
+    key = cache.key(function, model, temperature, prompt)
+    found, value = cache.get(key)
+    if found:
+        return value
+
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _InFlight()
+
+    if not leader: # same request already running in another thread; share its result
+        call.done.wait()
+        cache.coalesced += 1
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.value)
+
+    try:
+        found, value = cache.get(key, count=False) # a previous leader may have finished after our first lookup
+        if not found:
+            value = compute()
+            cache.put(key, function, value)
+        call.value = value
+        return copy.deepcopy(value)
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        call.done.set()
@@ -2,53 +2,152 @@
 author: Yagnik Poshiya
 github: @yagnikposhiya
 
-Periodically polls the Gmail inbox using IMAP to check for new unread emails.
+Checks the Gmail inbox using IMAP for new unread emails and replies to them.
+
+Usage:
+    python src/mailmind.py                          # process unread emails once and exit (e.g. from cron)
+    python src/mailmind.py --daemon                 # keep one IMAP session open and react to new mail via IMAP IDLE
+                                                    # (serves Prometheus metrics on metrics.host:metrics.port)
+    python src/mailmind.py --train-pre-classifier   # train the local pre-classifier from the DynamoDB email logs
 """
 
-import os
+import random
+import signal
+import imaplib
+import argparse
+import itertools
+import threading
 
+from typing import Any, Iterable, Iterator, Tuple
 from utils.utils import load_config
-from utils.send_mail import send_email_reply
-from llm.extract_info import extract_email_info
-from llm.categorize_email import categorize_email
-from utils.gmail_utils import fetch_unread_emails
-from rag.embed_documents import build_faiss_index
-from storage.dynamodb_handler import store_email_log
-from llm.generate_response import generate_reply_mail
+from utils.metrics import log_event, start_metrics_server
+from pipeline.email_pipeline import EmailPipeline, default_stages
+from utils.gmail_utils import connect_to_gmail, iter_unread_emails, supports_idle, wait_for_new_mail
 
 config = load_config() # load project configuration
 
-emails = fetch_unread_emails() # call the function to get a list of unread emails (each as a dictionary
+def peek(emails:Iterable[dict]) -> Tuple[Any, Iterator[dict]]:
+    """
+    Looks at the first email without losing it.
+
+    Args:
+        - emails (Iterable[dict]): Emails, possibly a lazy iterator.
+
+    Returns:
+        - Tuple[dict | None, Iterator[dict]]: (first email or None when there are none, iterator over all emails).
+    """
+
+    emails = iter(emails)
+    first = next(emails, None)
+    if first is None:
+        return None, emails
+    return first, itertools.chain([first], emails)
+
+def process_emails(pipeline:EmailPipeline, emails:Iterable[dict]) -> None:
+    """
+    Processes the emails concurrently (per-sender order preserved): categorize, extract, reply, send and log.
+
+    Args:
+        - pipeline (EmailPipeline): Pipeline to run the emails through.
+        - emails (Iterable[dict]): Emails as yielded by iter_unread_emails(); fetched while earlier ones are processed.
+    """
+
+    results = pipeline.run(emails)
+    if not results:
+        return
+
+    failed = [result for result in results if result["status"] == "failed"]
+    print(f"Processed {len(results)} emails: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    log_event("batch_done", emails=len(results), failed=len(failed), failed_traces=[result["trace_id"] for result in failed])
+
+    if "pre_classify" in pipeline.stages: # already imported by the stage
+        from llm.pre_classifier import get_pre_classifier
+        print(f"Pre-classifier: {get_pre_classifier().stats()}")
+
+def run_once() -> None:
+    """
+    Fetches unread emails once and processes them.
+    """
+
+    first, emails = peek(iter_unread_emails()) # stream unread emails (each as a dictionary) batch by batch
+    if first is None: # common case for a cron-driven poller: no LLM, RAG, SMTP or AWS module is loaded
+        return
+
+    process_emails(EmailPipeline(default_stages()), emails)
+
+def run_daemon() -> None:
+    """
+    Runs until SIGINT/SIGTERM: keeps one authenticated IMAP session, processes unread mail, then waits
+    for the server to announce new mail with IDLE (or polls every 'email.polling_interval' seconds when
+    IDLE is not supported). Lost connections are re-established with exponential backoff; any other error in
+    a cycle is logged and the cycle retried after the same backoff.
+    """
+
+    stop_event = threading.Event()
+
+    def request_stop(signum:int, frame:Any) -> None:
+        print(f"Received signal {signum}, shutting down after the current batch...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    pipeline = EmailPipeline(default_stages()) # stages load their modules and clients on first use, once for the whole session
+    if config["metrics"]["enabled"]:
+        server = start_metrics_server()
+        print(f"Serving metrics on http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    backoff = 1.0
+
+    while not stop_event.is_set():
+        imap = None
+        try:
+            imap = connect_to_gmail()
+            print("Connected to IMAP server; waiting for new mail")
+            backoff = 1.0 # healthy connection, reset the reconnect delay
 
-# iterate through each mail and display its details
-if emails:
-    for mail in emails:
-        # print(f"From_name: {mail['from_name']}")
-        # print(f"From_email: {mail['from_email']}")
-        # print(f"To: {mail['to']}")
-        # print(f"Date: {mail['date']}")
-        # print(f"Time: {mail['time']}")
-        # print(f"Subject: {mail['subject']}")
-        # print(f"Body:\n{mail['body']}")
+            while not stop_event.is_set():
+                try:
+                    process_emails(pipeline, iter_unread_emails(imap)) # reuses the open session
+                    backoff = 1.0 # a clean cycle resets the delay
 
-        category = categorize_email(mail['subject'],mail['body'])
-        mail['category'] = category # append category to mail metadata and content dict
-        print("Predicted category:", category)
+                    if supports_idle(imap):
+                        wait_for_new_mail(imap, config["email"]["idle_timeout"], stop_event)
+                    else:
+                        stop_event.wait(config["email"]["polling_interval"])
 
-        if category.lower() != "other": # if email is categorized in "other"; consider it spam email.
+                except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+                    raise # reconnect below
+                except Exception as e: # e.g. a DynamoDB or config error: keep the daemon and its session alive
+                    delay = backoff * (0.5 + random.random())
+                    print(f"Mail cycle failed ({type(e).__name__}: {e}); retrying in {delay:.1f}s")
+                    stop_event.wait(delay)
+                    backoff = min(backoff * 2, config["email"]["reconnect_backoff_max"])
 
-            extracted_info = extract_email_info(mail['subject'], mail['body'])
-            mail['extracted_info'] = extracted_info # append extracted_info column to mail metadata and content dict
-            print(f"Extracted information: {extracted_info}")
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError) as e:
+            delay = backoff * (0.5 + random.random()) # exponential backoff with jitter
+            print(f"IMAP connection lost ({e}); reconnecting in {delay:.1f}s")
+            stop_event.wait(delay)
+            backoff = min(backoff * 2, config["email"]["reconnect_backoff_max"])
 
-            if not os.path.exists(config["path"]["faiss"]["index_file"]): # check for any one file either index file or metadata file
-                build_faiss_index() # create faiss indexes for current knowledge base
+        finally:
+            if imap is not None:
+                try:
+                    imap.logout()
+                except Exception:
+                    pass # the connection may already be gone
 
-            reply_mail = generate_reply_mail(category, extracted_info) # generate a mail reply
-            mail['email_reply'] = reply_mail
-            print(f"Reply mail: {reply_mail}")
+    print("Daemon stopped.")
 
-            send_email_reply(mail['from_email'], mail['subject'], reply_mail, mail['email_msg_id']) # send an email reply
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI-powered email automation for customer support")
+    parser.add_argument("--daemon", action="store_true", help="run continuously using IMAP IDLE instead of a single pass")
+    parser.add_argument("--train-pre-classifier", action="store_true", help="train the local spam/'Other' pre-classifier and exit")
+    args = parser.parse_args()
 
-            store_email_log(mail) # save email metadata with body content
-            print(f"Stored email from: {mail['from_email']}")
\ No newline at end of file
+    if args.train_pre_classifier:
+        from llm.pre_classifier import train_pre_classifier
+        print(f"Pre-classifier trained: {train_pre_classifier()}")
+    elif args.daemon:
+        run_daemon()
+    else:
+        run_once()
@@ -0,0 +1,278 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Processes fetched emails concurrently: categorize, extract, generate a reply, send it and log it.
+
+Emails run on a bounded thread pool; each stage has its own concurrency limit so a slow provider
+(e.g. the LLM) cannot occupy every worker, and the number of admitted-but-unfinished emails is capped
+so the producer blocks instead of piling up work. Emails from the same sender are handled strictly
+in arrival order, and a failure in one email never affects the others.
+
+Every email runs under its own trace id; stage latencies, errors and queue depths are recorded in utils/metrics.py.
+"""
+
+import time
+import importlib
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List
+from utils.utils import load_config
+from utils.metrics import log_event, registry, stage_timer, trace
+
+config = load_config() # load project configuration
+
+STAGES = ("pre_classify", "categorize", "extract", "categorize_extract", "sync_index", "generate", "send", "log")
+
+def lazy_stage(module:str, function:str) -> Callable:
+    """
+    Returns a stage that imports its implementation on first call, so heavy dependencies (faiss, boto3,
+    openai, ...) are only loaded by the stages an email actually reaches.
+
+    Args:
+        - module (str): Module path, e.g. "llm.extract_info".
+        - function (str): Function name within the module.
+
+    Returns:
+        - Callable: Stage callable forwarding to module.function.
+    """
+
+    def stage(*args, **kwargs) -> Any:
+        return getattr(importlib.import_module(module), function)(*args, **kwargs) # import is cached after the first call
+
+    stage.__name__ = function
+    return stage
+
+def default_stages() -> Dict[str, Callable]:
+    """
+    Binds every pipeline stage to the real LLM, RAG, SMTP and DynamoDB implementations.
+    Bound lazily rather than imported at module level so the pipeline can be driven with stub stages
+    and building it costs nothing until the first email reaches a stage.
+    With 'llm.combined_categorize_extract' enabled, categorization and extraction share one LLM call.
+    With 'pre_classifier.enabled', obvious "Other" mail is recognized locally before any LLM call.
+
+    Returns:
+        - Dict[str, Callable]: Stage name -> callable.
+    """
+
+    stages = {
+        "categorize": lazy_stage("llm.categorize_email", "categorize_email"),
+        "extract": lazy_stage("llm.extract_info", "extract_email_info"),
+        "sync_index": lazy_stage("rag.embed_documents", "update_faiss_index"),
+        "generate": lazy_stage("llm.generate_response", "generate_reply_mail"),
+        "send": lazy_stage("utils.send_mail", "send_email_reply"),
+        "log": lazy_stage("storage.dynamodb_handler", "store_email_log")
+    }
+
+    if config["llm"]["combined_categorize_extract"]:
+        stages["categorize_extract"] = lazy_stage("llm.categorize_and_extract", "categorize_and_extract_email")
+
+    if config["pre_classifier"]["enabled"]:
+        stages["pre_classify"] = lazy_stage("llm.pre_classifier", "pre_classify")
+
+    return stages
+
+class EmailPipeline:
+    """
+    Staged, bounded, per-sender ordered email processor.
+    """
+
+    def __init__(self, stages:Dict[str, Callable], max_workers:int=None, max_pending:int=None, stage_concurrency:Dict[str, int]=None) -> None:
+        """
+        Args:
+            - stages (Dict[str, Callable]): Stage name -> callable, see default_stages().
+            - max_workers (int): Emails processed at the same time. Defaults to pipeline.max_workers.
+            - max_pending (int): Emails admitted before run() blocks. Defaults to pipeline.max_pending.
+            - stage_concurrency (Dict[str, int]): Per-stage limits. Defaults to pipeline.stage_concurrency.
+        """
+
+        settings = config["pipeline"]
+        self.stages = stages
+        self.max_workers = max_workers or settings["max_workers"]
+        self.max_pending = max_pending or settings["max_pending"]
+
+        limits = dict(settings["stage_concurrency"])
+        limits.update(stage_concurrency or {})
+        self._limits = {stage: threading.BoundedSemaphore(limits.get(stage, self.max_workers)) for stage in STAGES}
+
+        self._pending = threading.BoundedSemaphore(self.max_pending) # backpressure on the producer
+        self._lock = threading.Lock()
+        self._sender_queues = {} # sender -> deque of emails waiting behind the one in progress
+        self._index_lock = threading.Lock()
+        self._index_synced = False
+        self._results = []
+
+    def _call(self, stage:str, *args) -> Any:
+        """
+        Runs one stage under its concurrency limit.
+        """
+
+        registry.inc("mailmind_stage_waiting", stage=stage)
+        with self._limits[stage]:
+            registry.inc("mailmind_stage_waiting", -1, stage=stage)
+            registry.inc("mailmind_stage_in_flight", stage=stage)
+            try:
+                with stage_timer(stage):
+                    return self.stages[stage](*args)
+            finally:
+                registry.inc("mailmind_stage_in_flight", -1, stage=stage)
+
+    def _sync_index_once(self) -> None:
+        """
+        Synchronizes the knowledge base index with S3 at most once per run(); other emails wait for it.
+        run() starts it in the background when the first email arrives, so it overlaps with categorization.
+        A failed sync (S3 unreachable, ...) is logged and the index already on disk is used as it is.
+        """
+
+        with self._index_lock:
+            if not self._index_synced:
+                try:
+                    self._call("sync_index") # create or incrementally update faiss indexes for current knowledge base
+                except Exception as e:
+                    print(f"Knowledge base sync failed, using the existing index: {e}")
+                self._index_synced = True
+
+    def process_email(self, mail:dict) -> dict:
+        """
+        Runs all stages for a single email. Adds 'category', 'extracted_info' and 'email_reply' to 'mail'.
+
+        Args:
+            - mail (dict): Email dictionary as returned by fetch_unread_emails().
+
+        Returns:
+            - dict: Outcome {"mail", "status" ("replied" | "skipped" | "failed"), "stage", "error", "trace_id"}.
+        """
+
+        start = time.perf_counter()
+        with trace() as trace_id:
+            log_event("email_received", message_id=mail.get("email_msg_id"), sender=mail.get("from_email"))
+            result = self._process_email(mail)
+            result["trace_id"] = trace_id
+
+            seconds = time.perf_counter() - start
+            registry.inc("mailmind_emails_total", status=result["status"])
+            registry.observe("mailmind_email_seconds", seconds)
+            log_event("email_done", status=result["status"], stage=result["stage"], error=result["error"],
+                      category=mail.get("category"), seconds=round(seconds, 6))
+            return result
+
+    def _process_email(self, mail:dict) -> dict:
+        """
+        Stages of process_email(), run inside the email's trace.
+        """
+
+        combined = "categorize_extract" in self.stages
+        stage = "pre_classify"
+        try:
+            verdict = None
+            if "pre_classify" in self.stages: # header rules and a local model; no network call
+                verdict = self._call("pre_classify", mail)
+
+            stage = "categorize_extract" if combined else "categorize"
+            if verdict is not None and not verdict.audit: # confident local decision; the LLM is skipped
+                category = verdict.category
+                mail['classified_by'] = verdict.reason
+            elif combined: # one LLM call returns both the category and the extracted information
+                triage = self._call("categorize_extract", mail['subject'], mail['body'])
+                category, extracted_info = triage["category"], triage["extracted_info"]
+            else:
+                category = self._call("categorize", mail['subject'], mail['body'])
+
+            if verdict is not None and verdict.audit: # sampled local decision: the LLM answer is used and compared
+                verdict.confirm(category)
+
+            mail['category'] = category # append category to mail metadata and content dict
+            print(f"Predicted category for {mail['from_email']}: {category}" + (f" ({verdict.reason})" if 'classified_by' in mail else ""))
+
+            if category.lower() == "other": # if email is categorized in "other"; consider it spam email.
+                if 'classified_by' not in mail and config["pre_classifier"]["log_llm_other"]:
+                    stage = "log"
+                    mail['status'] = "skipped"
+                    self._call("log", mail) # LLM-labelled "Other" mail is training data for the pre-classifier
+                return {"mail": mail, "status": "skipped", "stage": None, "error": None}
+
+            if not combined:
+                stage = "extract"
+                extracted_info = self._call("extract", mail['subject'], mail['body'])
+
+            mail['extracted_info'] = extracted_info # append extracted_info column to mail metadata and content dict
+            print(f"Extracted information: {extracted_info}")
+
+            stage = "sync_index"
+            self._sync_index_once()
+
+            stage = "generate"
+            reply_mail = self._call("generate", category, extracted_info) # generate a mail reply
+            mail['email_reply'] = reply_mail
+            print(f"Reply mail to {mail['from_email']}: {reply_mail}")
+
+            stage = "send"
+            self._call("send", mail['from_email'], mail['subject'], reply_mail, mail['email_msg_id']) # send an email reply
+
+            stage = "log"
+            self._call("log", mail) # save email metadata with body content
+            print(f"Stored email from: {mail['from_email']}")
+
+            return {"mail": mail, "status": "replied", "stage": None, "error": None}
+
+        except Exception as e:
+            print(f"Error processing email from {mail.get('from_email')} at stage '{stage}': {e}")
+            return {"mail": mail, "status": "failed", "stage": stage, "error": repr(e)}
+
+    def _drain_sender(self, sender:str) -> None:
+        """
+        Processes queued emails of one sender in order, then retires the sender's queue.
+        """
+
+        while True:
+            with self._lock:
+                queue = self._sender_queues[sender]
+                if not queue:
+                    del self._sender_queues[sender]
+                    return
+                mail = queue.popleft()
+
+            try:
+                result = self.process_email(mail)
+                with self._lock:
+                    self._results.append(result)
+            finally:
+                registry.inc("mailmind_pipeline_pending", -1)
+                self._pending.release()
+
+    def run(self, emails:Iterable[dict]) -> List[dict]:
+        """
+        Processes all emails and waits for them to finish. 'emails' may be a lazy iterator;
+        it is consumed only as fast as the pipeline admits new work.
+
+        Args:
+            - emails (Iterable[dict]): Emails as returned by fetch_unread_emails().
+
+        Returns:
+            - List[dict]: One outcome per email (see process_email), in completion order.
+        """
+
+        self._results = []
+        self._index_synced = False # re-check the knowledge base on every run (the daemon reuses the pipeline)
+
+        sync_started = "sync_index" not in self.stages
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mailmind") as pool:
+            for mail in emails:
+                if not sync_started: # first email of the run: sync the index while emails are being categorized
+                    pool.submit(self._sync_index_once)
+                    sync_started = True
+                self._pending.acquire() # blocks while max_pending emails are in flight
+                registry.inc("mailmind_pipeline_pending")
+                sender = (mail.get("from_email") or "").lower()
+
+                with self._lock:
+                    if sender in self._sender_queues: # a worker is already draining this sender; queue behind it
+                        self._sender_queues[sender].append(mail)
+                        continue
+                    self._sender_queues[sender] = deque([mail])
+
+                pool.submit(self._drain_sender, sender)
+
+        return self._results
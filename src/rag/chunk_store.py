@@ -0,0 +1,171 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Compact, memory-mapped store for the chunk texts behind the FAISS index.
+
+The file holds the chunks sorted by vector id as fixed-width arrays followed by one UTF-8 blob, so
+opening it only maps the file and a top-k lookup reads just those k records (plus a binary search
+over the id array). Load time and resident memory do not grow with the size of the knowledge base.
+"""
+
+import os
+import mmap
+import numpy as np
+
+from typing import Iterator, List, Tuple
+
+"""
+File layout (little-endian, every section starts on an 8-byte boundary):
+
+    header        magic (8 bytes) + uint64 counts: chunks n, filenames m, text bytes, filename bytes
+    ids           int64[n]     vector ids in ascending order
+    files         int32[n]     index into the filename table for each chunk
+    offsets       uint64[n+1]  chunk i is text[offsets[i]:offsets[i+1]]
+    name_offsets  uint64[m+1]  filename j is names[name_offsets[j]:name_offsets[j+1]]
+    text          UTF-8 chunk texts, concatenated
+    names         UTF-8 filenames (S3 keys), concatenated
+"""
+
+MAGIC = b"MMCHUNK1"
+HEADER = np.dtype([("magic", "S8"), ("chunks", "<u8"), ("files", "<u8"), ("text_bytes", "<u8"), ("name_bytes", "<u8")])
+
+def _padded(size:int) -> int:
+    return (size + 7) & ~7
+
+def write_chunk_store(path:str, entries:dict) -> None:
+    """
+    Writes the chunks to a temporary file and swaps it into place, so readers never see a partial file.
+
+    Args:
+        - path (str): Destination file path.
+        - entries (dict): Vector id -> (chunk text, metadata with "filename").
+    """
+
+    ids = np.array(sorted(entries), dtype="<i8")
+    filenames, file_index = {}, np.empty(len(ids), dtype="<i4")
+    offsets = np.zeros(len(ids) + 1, dtype="<u8")
+    texts = []
+
+    for position, vector_id in enumerate(ids.tolist()):
+        chunk, meta = entries[vector_id]
+        data = chunk.encode("utf-8")
+        texts.append(data)
+        offsets[position + 1] = offsets[position] + len(data)
+        file_index[position] = filenames.setdefault(meta["filename"], len(filenames))
+
+    names = [name.encode("utf-8") for name in filenames] # dicts keep insertion order, i.e. table index order
+    name_offsets = np.zeros(len(names) + 1, dtype="<u8")
+    np.cumsum([len(name) for name in names], out=name_offsets[1:])
+
+    header = np.array([(MAGIC, len(ids), len(names), int(offsets[-1]), int(name_offsets[-1]))], dtype=HEADER)
+
+    with open(path + ".tmp", "wb") as f:
+        for data in (header.tobytes(), ids.tobytes(), file_index.tobytes(), offsets.tobytes(), name_offsets.tobytes()):
+            f.write(data)
+            f.write(b"\0" * (_padded(len(data)) - len(data))) # keep the next array aligned
+        for data in texts:
+            f.write(data)
+        f.write(b"".join(names))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+class ChunkStore:
+    """
+    Read-only view of a chunk store file. Arrays are zero-copy views of the mapping, so only the pages
+    a lookup touches are ever read from disk.
+    """
+
+    def __init__(self, path:str) -> None:
+        """
+        Args:
+            - path (str): Path to a file written by write_chunk_store().
+
+        Raises:
+            - ValueError: If the file is not a chunk store (e.g. the JSON metadata of older versions).
+        """
+
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.itemsize:
+                raise ValueError(f"{path} is not a chunk store")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # stays valid after the file is replaced
+        if hasattr(mmap, "MADV_RANDOM"): # lookups are scattered; do not read ahead around every touched page
+            self._map.madvise(mmap.MADV_RANDOM)
+
+        header = np.frombuffer(self._map, dtype=HEADER, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a chunk store")
+
+        n, m = int(header["chunks"]), int(header["files"])
+        position = _padded(HEADER.itemsize)
+        sections = []
+        for dtype, count in (("<i8", n), ("<i4", n), ("<u8", n + 1), ("<u8", m + 1)):
+            sections.append(np.frombuffer(self._map, dtype=dtype, count=count, offset=position))
+            position += _padded(count * np.dtype(dtype).itemsize)
+        self.ids, self._files, self._offsets, name_offsets = sections
+
+        self._text_start = position
+        names_start = position + int(header["text_bytes"])
+        if names_start + int(header["name_bytes"]) != len(self._map):
+            raise ValueError(f"{path} is truncated or corrupt")
+
+        # one entry per source document, small next to the chunk texts
+        names = self._map[names_start:]
+        self._filenames = [names[int(start):int(end)].decode("utf-8") for start, end in zip(name_offsets[:-1], name_offsets[1:])]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _positions(self, vector_ids:np.ndarray) -> np.ndarray:
+        """
+        Returns:
+            - np.ndarray: Position of each vector id in the store, -1 where the id is not stored.
+        """
+
+        vector_ids = np.asarray(vector_ids, dtype="int64").ravel()
+        if not len(self.ids):
+            return np.full(len(vector_ids), -1)
+
+        positions = np.minimum(np.searchsorted(self.ids, vector_ids), len(self.ids) - 1) # binary search, O(k log n)
+        return np.where(self.ids[positions] == vector_ids, positions, -1)
+
+    def _text(self, position:int) -> str:
+        start = self._text_start + int(self._offsets[position])
+        end = self._text_start + int(self._offsets[position + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def _meta(self, position:int) -> dict:
+        return {"filename": self._filenames[self._files[position]], "chunk_id": int(self.ids[position])}
+
+    def texts(self, vector_ids:np.ndarray) -> List[str]:
+        """
+        Args:
+            - vector_ids (np.ndarray): Vector ids, e.g. one row of FAISS search results; -1 and unknown ids are skipped.
+
+        Returns:
+            - List[str]: Chunk texts in the order of 'vector_ids'.
+        """
+
+        return [self._text(position) for position in self._positions(vector_ids) if position != -1]
+
+    def lookup(self, vector_ids:np.ndarray) -> List[Tuple[str, dict]]:
+        """
+        Args:
+            - vector_ids (np.ndarray): Vector ids; -1 and unknown ids are skipped.
+
+        Returns:
+            - List[Tuple[str, dict]]: (chunk text, {"filename", "chunk_id"}) in the order of 'vector_ids'.
+        """
+
+        return [(self._text(position), self._meta(position)) for position in self._positions(vector_ids) if position != -1]
+
+    def items(self) -> Iterator[Tuple[int, str, dict]]:
+        """
+        Yields:
+            - Tuple[int, str, dict]: (vector id, chunk text, metadata) for every stored chunk, in id order.
+        """
+
+        for position in range(len(self.ids)):
+            yield int(self.ids[position]), self._text(position), {"filename": self._filenames[self._files[position]]}
@@ -0,0 +1,211 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Splits documents into token-budgeted chunks for embedding and semantic search.
+
+Paragraphs (lines) are packed into chunks of at most 'chunking.max_tokens' tokens; a paragraph that is
+too long on its own is split on sentence boundaries (and an overlong sentence on word boundaries).
+Consecutive chunks share up to 'chunking.overlap_tokens' tokens of trailing context. CSV rows are never
+split or overlapped. Every paragraph and sentence is counted once, so chunking runs in linear time.
+"""
+
+import re
+import threading
+
+from typing import Any, List, Tuple
+from utils.utils import load_config
+
+config = load_config() # load project configuration
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+(?=\S)") # whitespace after sentence-ending punctuation
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder() -> Any:
+    """
+    Returns the tiktoken encoding configured in 'chunking.encoding', loaded once.
+
+    Returns:
+        - tiktoken.Encoding | bool: Encoder, or False when tiktoken (or its encoding file) is unavailable,
+          in which case tokens are estimated from the character count.
+    """
+
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                import tiktoken # optional; fast BPE tokenizer matching the OpenAI embedding models
+                _encoder = tiktoken.get_encoding(config["chunking"]["encoding"])
+            except Exception as e: # not installed, or offline without a cached encoding file
+                print(f"tiktoken unavailable ({type(e).__name__}); estimating tokens from text length")
+                _encoder = False
+        return _encoder
+
+def count_tokens(text:str) -> int:
+    """
+    Args:
+        - text (str): Input text.
+
+    Returns:
+        - int: Token count (exact with tiktoken, otherwise 1 token = 4 characters on average).
+    """
+
+    encoder = get_encoder()
+    if encoder:
+        return len(encoder.encode_ordinary(text))
+    return len(text) // 4 + 1
+
+def cut_word(word:str, max_tokens:int) -> List[Tuple[str, int]]:
+    """
+    Cuts a single "word" longer than 'max_tokens' tokens (e.g. a URL or base64 blob) by characters. The word
+    is encoded once and cut every 'max_tokens' tokens (fixed character windows without tiktoken), and each
+    piece is counted once, so long words cost linear time.
+
+    Returns:
+        - List[Tuple[str, int]]: (piece, token count) pairs, in order.
+    """
+
+    encoder = get_encoder()
+    if not encoder:
+        width = max(1, (max_tokens - 1) * 4) # len // 4 + 1 == max_tokens
+        return [(word[start:start + width], count_tokens(word[start:start + width])) for start in range(0, len(word), width)]
+
+    _, offsets = encoder.decode_with_offsets(encoder.encode_ordinary(word)) # character offset of every token
+    offsets.append(len(word))
+    pieces, first = [], 0
+    while first < len(offsets) - 1:
+        last = min(first + max_tokens, len(offsets) - 1)
+        while True:
+            piece = word[offsets[first]:offsets[last]]
+            piece_tokens = count_tokens(piece)
+            if piece_tokens <= max_tokens or last == first + 1:
+                break
+            last -= 1 # a character split over two tokens was cut: end the piece one token earlier
+        if piece:
+            pieces.append((piece, piece_tokens))
+        first = last
+    return pieces
+
+def split_words(text:str, max_tokens:int) -> List[Tuple[str, int]]:
+    """
+    Splits an overlong sentence on whitespace into pieces of at most 'max_tokens' tokens; a single
+    "word" longer than that is cut by characters (see cut_word()).
+
+    Returns:
+        - List[Tuple[str, int]]: (piece, token count) pairs.
+    """
+
+    pieces, words, tokens = [], [], 0
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if word_tokens > max_tokens: # no whitespace to split on
+            if words:
+                pieces.append((" ".join(words), tokens))
+                words, tokens = [], 0
+            *cut, (word, word_tokens) = cut_word(word, max_tokens) # the tail is packed with the following words
+            pieces.extend(cut)
+        if words and tokens + word_tokens > max_tokens:
+            pieces.append((" ".join(words), tokens))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        pieces.append((" ".join(words), tokens))
+    return pieces
+
+def split_units(text:str, max_tokens:int, atomic_lines:bool) -> List[Tuple[str, str, int]]:
+    """
+    Breaks a document into packable units: whole paragraphs, or sentences (and word runs) of paragraphs
+    that exceed the budget.
+
+    Returns:
+        - List[Tuple[str, str, int]]: (separator placed before the unit, unit text, token count).
+    """
+
+    units = []
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph: # blank lines never produce (empty) chunks
+            continue
+
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens or atomic_lines: # CSV rows stay whole even if oversized
+            units.append(("\n", paragraph, tokens))
+            continue
+
+        separator = "\n" # first piece starts a new line, the rest continue the paragraph
+        for sentence in SENTENCE_BOUNDARY.split(paragraph):
+            sentence_tokens = count_tokens(sentence)
+            pieces = [(sentence, sentence_tokens)] if sentence_tokens <= max_tokens else split_words(sentence, max_tokens)
+            for piece, piece_tokens in pieces:
+                units.append((separator, piece, piece_tokens))
+                separator = " "
+    return units
+
+def chunk_text(text:str, max_tokens:int=None, overlap_tokens:int=None, atomic_lines:bool=False) -> list:
+    """
+    Splits text into chunks of at most 'max_tokens' tokens, keeping paragraphs and sentences intact where
+    possible and repeating up to 'overlap_tokens' tokens of the previous chunk at the start of the next.
+
+    Args:
+        - text (str): The full input text to be chunked.
+        - max_tokens (int): Token budget per chunk. Defaults to chunking.max_tokens.
+        - overlap_tokens (int): Trailing tokens carried into the next chunk. Defaults to chunking.overlap_tokens
+          (chunking.csv_overlap_tokens when 'atomic_lines' is set).
+        - atomic_lines (bool): Treat every line as an indivisible record (CSV rows).
+
+    Returns:
+        - list: A list of non-empty text chunks.
+    """
+
+    settings = config["chunking"]
+    max_tokens = max_tokens or settings["max_tokens"]
+    if overlap_tokens is None:
+        overlap_tokens = settings["csv_overlap_tokens"] if atomic_lines else settings["overlap_tokens"]
+    overlap_tokens = min(overlap_tokens, max_tokens // 2) # overlap must leave room for new content
+
+    chunks = []
+    current, tokens = [], 0 # units of the chunk being built
+    fresh = False # whether 'current' holds anything beyond the overlap carried from the previous chunk
+
+    def emit() -> None:
+        chunks.append("".join(separator + unit for separator, unit, _ in current).strip())
+
+    for unit in split_units(text, max_tokens, atomic_lines):
+        if current and tokens + unit[2] > max_tokens:
+            if fresh:
+                emit()
+
+            # carry the trailing units that fit in the overlap budget into the next chunk
+            carried, carried_tokens = [], 0
+            for previous in reversed(current):
+                if carried_tokens + previous[2] > overlap_tokens:
+                    break
+                carried.append(previous)
+                carried_tokens += previous[2]
+            current, tokens = carried[::-1], carried_tokens
+
+            while current and tokens + unit[2] > max_tokens: # overlap plus this unit would not fit
+                tokens -= current.pop(0)[2]
+            fresh = False
+
+        current.append(unit)
+        tokens += unit[2]
+        fresh = True
+
+    if current and fresh:
+        emit()
+
+    return chunks
+
+def chunking_signature() -> str:
+    """
+    Returns:
+        - str: Identifies the chunking settings; a change means indexed documents must be re-chunked.
+    """
+
+    settings = config["chunking"]
+    tokenizer = settings["encoding"] if get_encoder() else "chars/4"
+    return f"tokens:{tokenizer}:{settings['max_tokens']}:{settings['overlap_tokens']}:{settings['csv_overlap_tokens']}"
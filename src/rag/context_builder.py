@@ -0,0 +1,48 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Assembles retrieved chunks into the context section of a reply prompt under a token budget,
+so prompt size (and with it prefill time and cost) stays bounded however much is retrieved.
+"""
+
+import re
+
+from typing import List
+from rag.chunker import count_tokens, split_words
+
+WHITESPACE = re.compile(r"\s+")
+
+def assemble_context(results:List[dict], max_tokens:int) -> List[str]:
+    """
+    Selects chunks in rank order until the token budget is spent. Duplicates are dropped, including chunks
+    whose text is contained in one already selected (neighbouring chunks overlap); a chunk that does not fit
+    is skipped in favour of shorter, lower-ranked ones. If not even the best chunk fits, its beginning is used.
+
+    Args:
+        - results (List[dict]): Retrieval results, best first, as returned by retrieve_relevant_context_batch().
+        - max_tokens (int): Token budget for the whole context (chunks joined by newlines).
+
+    Returns:
+        - List[str]: Selected chunk texts, best first.
+    """
+
+    selected, normalized, used = [], [], 0
+    for result in results:
+        text = result["chunk"].strip()
+        key = WHITESPACE.sub(" ", text).lower()
+        if not key or any(key in previous for previous in normalized): # duplicate or overlapped by a better chunk
+            continue
+
+        tokens = count_tokens(text) + 1 # separating newline
+        if used + tokens > max_tokens:
+            continue
+
+        selected.append(text)
+        normalized.append(key)
+        used += tokens
+
+    if not selected and results and max_tokens > 0: # the best chunk alone exceeds the budget
+        selected.append(split_words(results[0]["chunk"].strip(), max_tokens)[0][0])
+
+    return selected
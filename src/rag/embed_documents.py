@@ -20,58 +20,104 @@ Semantic Search & Retrieval Flow:
 """
 
 import os
-import uuid
 import faiss
-import json
+import hashlib
 import numpy as np
 
-from typing import Any
-from openai import OpenAI
-from dotenv import load_dotenv
+from typing import Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.utils import load_config
-from storage.s3_handler import read_all_documents_from_s3
+from llm.provider import estimate_tokens, get_provider
+from rag.chunker import chunk_text, chunking_signature
+from rag.embedding_cache import embed_with_cache, get_embedding_cache
+from rag.index_factory import build_index, describe_index, index_settings, supports_removal
+from rag.index_store import atomic_write_json, load_index_state, load_manifest, save_index_state, empty_manifest
+from storage.s3_handler import list_documents_in_s3, stream_documents_from_s3
 
-load_dotenv() # load environment variables from .env file
 config = load_config() # load project configuration
 
-# initialize OpenAI cliet with OpenRouter base_url
-client = OpenAI(
-    base_url=config["api_endpoint"]["openai"],
-    api_key=os.getenv("OPENAI_API_KEY") if config["flags"]["credentials_from_env"] else "<api_key>"
-)
+def make_embedding_batches(chunks:list, batch_size:int, max_batch_tokens:int) -> List[Tuple[int, int]]:
+    """
+    Groups consecutive chunks into request-sized batches bounded by input count and token budget.
+
+    Args:
+        - chunks (list): List of text strings.
+        - batch_size (int): Maximum number of chunks per batch.
+        - max_batch_tokens (int): Maximum estimated tokens per batch.
+
+    Returns:
+        - List[Tuple[int, int]]: (start, end) slice bounds into 'chunks', in order.
+    """
+
+    batches, start, tokens = [], 0, 0
+
+    for i, chunk in enumerate(chunks):
+        chunk_tokens = estimate_tokens(chunk)
+        # close the current batch if this chunk would overflow it; a single oversized chunk still gets its own batch
+        if i > start and (i - start >= batch_size or tokens + chunk_tokens > max_batch_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += chunk_tokens
+
+    if start < len(chunks):
+        batches.append((start, len(chunks)))
+
+    return batches
+
+def embed_batch_openai(batch:list) -> List[List[float]]:
+    """
+    Embeds one batch of chunks; rate limiting and retries on transient errors are done by the shared provider.
+
+    Args:
+        - batch (list): List of text strings that fits in a single API request.
+
+    Returns:
+        - List[List[float]]: Embedding vectors in the same order as 'batch'.
+    """
+
+    response = get_provider("openai").embed(config["embedding_model"]["openai"], batch) # e.g. text-embedding-3-small
+
+    # the API tags every vector with the position of its input; don't rely on response order
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
-def chunk_text(text:str, max_length:int=500) -> list:
+def embed_chunks_batched(chunks: list) -> np.ndarray:
     """
-    Splits long text into smaller chunks based on max character length for embedding and semantic search.
+    Embeds a list of text chunks using OpenAI embedding model, bypassing the embedding cache.
+
+    Chunks are split into batches bounded by 'embedding.batch_size' and 'embedding.max_batch_tokens',
+    sent through a pool of 'embedding.max_workers' concurrent requests, and written back in order.
 
     Args:
-        - text (str): The full input text to be chunked.
-        - max_length (int): The maximum number of characters per chunk. Default is 500.
+        - chunks (list): List of text strings.
 
     Returns:
-        - list: A list of text chunks (strings), each not exceeding 'max_length' characters.
+        - np.ndarray: Embedding vectors (numpy array)
     """
 
-    paragraphs = text.split("\n") # split input text into paragraphs using newline as delimeter
-    chunks, current_chunk = [], "" # initialize the list to hold final chunks and a temporary chunk holder
+    batches = make_embedding_batches(chunks, config["embedding"]["batch_size"], config["embedding"]["max_batch_tokens"])
+    embeddings = None # preallocated once the embedding dimension is known from the first response
+
+    with ThreadPoolExecutor(max_workers=config["embedding"]["max_workers"]) as pool:
+        futures = {pool.submit(embed_batch_openai, chunks[start:end]): (start, end) for start, end in batches}
+
+        for future in as_completed(futures):
+            start, end = futures[future]
+            vectors = future.result()
 
-    # iterate over each paragraph to construct chunks
-    for para in paragraphs:
-        if len(current_chunk) + len(para) < max_length: # if adding this paragraph keeps total chunk length under limit, append it
-            current_chunk += para + "\n"
-        else: # otherwise, save the current chunk and start a new one
-            chunks.append(current_chunk.strip())
-            current_chunk = para + "\n"
+            if embeddings is None:
+                embeddings = np.empty((len(chunks), len(vectors[0])), dtype="float32")
 
-    # add any remaining text as the last chunk
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+            embeddings[start:end] = vectors # place each batch at its original position
 
-    return chunks
+    if embeddings is None: # nothing to embed
+        return np.empty((0, 0), dtype="float32")
+
+    return embeddings
 
 def embed_chunks_openai(chunks: list) -> np.ndarray:
     """
     Embeds a list of text chunks using OpenAI embedding model.
+    Chunks embedded before (by any earlier run or query) are served from the on-disk embedding cache.
 
     Args:
         - chunks (list): List of text strings.
@@ -80,61 +126,204 @@ def embed_chunks_openai(chunks: list) -> np.ndarray:
         - np.ndarray: Embedding vectors (numpy array)
     """
 
-    # send all chunks to OpenAI embedding API for vector representation
-    response = client.embeddings.create(
-        model = config["embedding_model"]["openai"], # e.g. text-embedding-3-small
-        input=chunks
-    )
+    embeddings = embed_with_cache(chunks, config["embedding_model"]["openai"], embed_chunks_batched)
 
-    # extract embedding vectors from API response
-    embeddings = [item.embedding for item in response.data]
+    cache = get_embedding_cache(config["embedding_model"]["openai"])
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
 
-    # convert the list of embeddings to a NumPy array with float32 precision
-    return np.array(embeddings).astype("float32")
+    return embeddings
 
-def build_faiss_index() -> Any:
+def embed_texts(texts:list) -> np.ndarray:
     """
-    Loads all documents from S3, chunks them, generates embeddings using OpenAI,
-    and stores the vectors into FAISS index with corresponding metadata.
+    Embeds texts through the embedding cache without printing cache statistics (used for streamed batches).
+
+    Args:
+        - texts (list): List of text strings.
+
+    Returns:
+        - np.ndarray: float32 embedding matrix in input order.
+    """
+
+    return embed_with_cache(texts, config["embedding_model"]["openai"], embed_chunks_batched)
+
+def hash_chunk(chunk:str) -> str:
+    """
+    Args:
+        - chunk (str): Chunk text.
+
+    Returns:
+        - str: SHA-256 hex digest identifying the chunk content.
     """
 
-    print("Loading documents from S3")
-    docs = read_all_documents_from_s3() # load .docx and .csv documents from the S3 bucket
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
 
-    texts, metadata = [], [] # lists to hold chunks and their metadata
+def plan_update(manifest:dict, listing:list, prefix:str="") -> Tuple[list, list, bool]:
+    """
+    Compares an S3 listing with the manifest of the current index.
+
+    Args:
+        - manifest (dict): Manifest of the current index.
+        - listing (list): Entries from list_documents_in_s3(prefix).
+        - prefix (str): Synchronized prefix; documents outside it are left alone.
+
+    Returns:
+        - Tuple[list, list, bool]: (keys of deleted documents, listing entries of new or modified documents,
+          whether every document must be re-chunked because the chunking settings changed).
+    """
+
+    documents = manifest["documents"]
+    listed = {doc["key"] for doc in listing}
+    deleted = [key for key in documents if key.startswith(prefix) and key not in listed]
+
+    rechunk = manifest.get("chunking") != chunking_signature()
+    stale = [doc for doc in listing if rechunk or not (
+        documents.get(doc["key"]) and documents[doc["key"]]["etag"] == doc["etag"] and documents[doc["key"]]["last_modified"] == doc["last_modified"]
+    )] # everything else is unchanged since last run
+
+    return deleted, stale, rechunk
+
+def update_faiss_index(prefix:str="", full_rebuild:bool=False) -> None:
+    """
+    Brings the FAISS index in line with the documents currently in S3.
+
+    Only documents whose ETag or LastModified changed since the last run are downloaded and chunked,
+    and only chunks whose content hash is new are embedded. Vectors of removed chunks and deleted
+    documents are dropped from the index; everything else is left untouched. Changed documents are
+    downloaded concurrently, and their new chunks are embedded while later downloads are still in flight.
+    The listing is first compared with the manifest alone; the index and chunk store are only loaded when
+    something changed.
+
+    Args:
+        - prefix (str): Optional prefix (folder path) in the bucket to synchronize.
+        - full_rebuild (bool): Ignore the existing index and re-embed every document.
+    """
+
+    print("Listing documents in S3")
+    listing = list_documents_in_s3(prefix) # ETag/LastModified of every .docx and .csv object
+
+    manifest = None if full_rebuild else load_manifest()
+    if manifest is not None and manifest.get("index_type") == index_settings()["type"] and plan_update(manifest, listing, prefix) == ([], [], False):
+        print("FAISS index is up to date.") # decided from the manifest alone, without loading the index
+        return
+
+    index, entries, manifest = (None, {}, empty_manifest()) if full_rebuild else load_index_state()
+    documents = manifest["documents"]
+    deleted, stale, rechunk = plan_update(manifest, listing, prefix)
+
+    new_texts, new_ids, new_meta = [], [], [] # chunks that need an embedding
+    removed_ids = [] # vector ids to drop from the index
+    changed = bool(deleted or rechunk)
+
+    # documents deleted from S3 (only those under the synchronized prefix)
+    listed = {doc["key"]: doc for doc in listing}
+    for key in deleted:
+        removed_ids.extend(chunk["id"] for chunk in documents.pop(key)["chunks"])
 
-    # loop/walk through each document and break it into chunks
-    for filename, content in docs.items():
-        chunks = chunk_text(content) # chunk the document text
-        for chunk in chunks:
-            texts.append(chunk) # add chunk to the text list
-            metadata.append({
-                "filename": filename, # file where chunk came from
-                "chunk_id": str(uuid.uuid4()) # unique ID for the chunk
-            })
+    # chunking settings changed: every document is re-chunked (chunks whose text is unchanged keep their vectors)
+    if rechunk:
+        manifest["chunking"] = chunking_signature()
 
-    print(f"Total chunks: {len(texts)}")
+    # new chunks are embedded in request-sized batches while the remaining documents are still downloading
+    embedder = ThreadPoolExecutor(max_workers=config["embedding"]["max_workers"], thread_name_prefix="embed")
+    embedding_batches = [] # (start, end, future) into new_texts
+    embedded = 0
 
-    # generate embeddings for all text chunks using OpenAI
-    print("Embedding chunks with OpenAI...")
-    embeddings = embed_chunks_openai(texts)
+    # a document that fails to download is not yielded and keeps its previous version indexed
+    for key, content in stream_documents_from_s3(stale):
+        doc = listed[key]
+        previous = documents.get(key)
+        changed = True
 
-    # build a FAISS index from embeddings
-    print("Building and saving FAISS index...")
-    dim = embeddings.shape[1] # dimentionsality of embedding vectors
-    index = faiss.IndexFlatL2(dim) # L2-based flat index
-    index.add(embeddings) # add all embedding vectors to the index
+        # reuse vector ids of chunks whose text did not change; identical chunks may repeat within a document
+        reusable = {}
+        for chunk in (previous or {}).get("chunks", []):
+            reusable.setdefault(chunk["hash"], []).append(chunk["id"])
 
-    if os.path.isdir(os.path.dirname(config["path"]["faiss"]["index_file"])): # check if directory exists in "./data/rag/index.faiss"
-        print(f"Directory exists: {config["path"]["faiss"]["index_file"]}")
-    else:
-        os.makedirs(os.path.dirname(config["path"]["faiss"]["index_file"])) # if not then create it
-        print(f"Directory created: {config["path"]["faiss"]["index_file"]}")
+        doc_chunks = []
+        for chunk in chunk_text(content, atomic_lines=key.endswith(".csv")): # CSV rows are never split
+            chunk_hash = hash_chunk(chunk)
+            if reusable.get(chunk_hash):
+                vector_id = reusable[chunk_hash].pop()
+            else:
+                vector_id = manifest["next_id"]
+                manifest["next_id"] += 1
+                new_texts.append(chunk)
+                new_ids.append(vector_id)
+                new_meta.append({"filename": key}) # file where chunk came from; the vector id identifies the chunk
+            doc_chunks.append({"hash": chunk_hash, "id": vector_id})
 
-    faiss.write_index(index, config["path"]["faiss"]["index_file"]) # save the index to disk
+        for ids in reusable.values(): # chunks that disappeared from the document
+            removed_ids.extend(ids)
 
-    # save the chunks and their metadata for later use (semantic search)
-    with open(config["path"]["faiss"]["metadata_file"],"w") as f:
-        json.dump({"chunks": texts, "meta": metadata}, f, indent=2)
+        documents[key] = {"etag": doc["etag"], "last_modified": doc["last_modified"], "chunks": doc_chunks}
+
+        while len(new_texts) - embedded >= config["embedding"]["batch_size"]:
+            end = embedded + config["embedding"]["batch_size"]
+            embedding_batches.append((embedded, end, embedder.submit(embed_texts, new_texts[embedded:end])))
+            embedded = end
+
+    if embedded < len(new_texts):
+        embedding_batches.append((embedded, len(new_texts), embedder.submit(embed_texts, new_texts[embedded:])))
+    embedder.shutdown(wait=True)
+
+    new_embeddings = np.vstack([future.result() for _, _, future in embedding_batches]) if embedding_batches else None
+    embedding_cache = get_embedding_cache(config["embedding_model"]["openai"])
+    if embedding_cache is not None and embedding_batches:
+        print(f"Embedding cache: {embedding_cache.stats()}")
+
+    index_type = index_settings()["type"]
+    retype = index is not None and describe_index(index) != index_type # configured index type changed
+
+    relex = index is not None and not os.path.exists(config["path"]["faiss"]["lexical_file"]) # built by an older version
+
+    if not changed and not retype and not relex:
+        if index is not None and manifest.get("index_type") != index_type: # written by an older version; lets the next run skip loading
+            manifest["index_type"] = index_type
+            atomic_write_json(manifest, config["path"]["faiss"]["manifest_file"], indent=2)
+        print("FAISS index is up to date.")
+        return
+
+    print(f"Chunks to embed: {len(new_texts)}, chunks to remove: {len(removed_ids)}")
+
+    # graph indexes cannot drop vectors, and a new index type needs a fresh index: rebuild from all
+    # surviving chunks (their embeddings come from the embedding cache, so this costs no API calls)
+    rebuild = index is None or retype or (removed_ids and not supports_removal(index))
+
+    if removed_ids and not rebuild:
+        index.remove_ids(np.array(removed_ids, dtype="int64"))
+    for vector_id in removed_ids:
+        entries.pop(vector_id, None)
+    for vector_id, chunk, meta in zip(new_ids, new_texts, new_meta):
+        entries[vector_id] = (chunk, meta)
+
+    if rebuild:
+        if not entries: # the knowledge base is empty and nothing was ever indexed
+            print("No documents to index.")
+            return
+
+        ids = sorted(entries)
+        print(f"Building {index_type} FAISS index...")
+        vectors = dict(zip(new_ids, new_embeddings)) if new_ids else {}
+        kept_ids = [vector_id for vector_id in ids if vector_id not in vectors]
+        if kept_ids: # surviving chunks, served from the embedding cache
+            vectors.update(zip(kept_ids, embed_chunks_openai([entries[vector_id][0] for vector_id in kept_ids])))
+        embeddings = np.vstack([vectors[vector_id] for vector_id in ids])
+        index = build_index(embeddings, np.array(ids, dtype="int64"))
+
+    elif new_texts:
+        index.add_with_ids(new_embeddings, np.array(new_ids, dtype="int64")) # add new embedding vectors to the index
+
+    print(f"Saving FAISS index with {index.ntotal} chunks...")
+    manifest["index_type"] = describe_index(index)
+    save_index_state(index, entries, manifest)
+
+    print("Embedding pipeline completed.")
+
+def build_faiss_index() -> Any:
+    """
+    Loads all documents from S3, chunks them, generates embeddings using OpenAI,
+    and stores the vectors into FAISS index with corresponding metadata.
+    """
 
-    print("Embedding pipeline completed.")
\ No newline at end of file
+    update_faiss_index(full_rebuild=True)
@@ -0,0 +1,255 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Persistent, content-addressed cache of embedding vectors shared by document indexing and query embedding.
+
+Vectors are stored in a memory-mapped float32 file (one fixed-size row per entry) and addressed through
+a small SQLite table keyed by sha256(model name + normalized text). When the cache is full, the least
+recently used rows are overwritten.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from typing import Any, Callable, List
+from utils.utils import load_config, normalize_text
+
+config = load_config() # load project configuration
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache for a single embedding model, bounded by number of entries.
+    """
+
+    def __init__(self, directory:str, model:str, max_entries:int) -> None:
+        """
+        Args:
+            - directory (str): Folder holding the cache files.
+            - model (str): Embedding model name; part of every key.
+            - max_entries (int): Maximum number of vectors kept before LRU eviction.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+
+        self.model = model
+        self.max_entries = max_entries
+        self.vectors_file = os.path.join(directory, f"{name}.f32")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None # np.memmap of shape (capacity, dim), opened lazily
+
+        self._db = sqlite3.connect(os.path.join(directory, f"{name}.sqlite"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+
+        row = self._db.execute("SELECT value FROM settings WHERE name = 'dim'").fetchone()
+        self.dim = row[0] if row else None
+
+    def key(self, text:str) -> str:
+        """
+        Args:
+            - text (str): Text to be embedded.
+
+        Returns:
+            - str: Cache key derived from model name and normalized text.
+        """
+
+        return hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _open_vectors(self, rows:int) -> np.ndarray:
+        """
+        Maps the vector file, growing it (by doubling, up to max_entries) so that it holds at least 'rows' rows.
+        """
+
+        row_bytes = self.dim * 4
+        capacity = os.path.getsize(self.vectors_file) // row_bytes if os.path.exists(self.vectors_file) else 0
+
+        if self._vectors is not None and len(self._vectors) >= rows:
+            return self._vectors
+
+        if capacity < rows:
+            capacity = min(max(rows, capacity * 2, 1024), self.max_entries)
+            with open(self.vectors_file, "ab") as f:
+                f.truncate(capacity * row_bytes) # sparse growth; existing rows are kept
+
+        self._vectors = np.memmap(self.vectors_file, dtype="float32", mode="r+", shape=(capacity, self.dim))
+        return self._vectors
+
+    def get_many(self, texts:List[str]) -> List[Any]:
+        """
+        Looks up cached vectors.
+
+        Args:
+            - texts (List[str]): Texts to look up.
+
+        Returns:
+            - List[np.ndarray | None]: Cached vector per text, or None on a miss.
+        """
+
+        keys = [self.key(text) for text in texts]
+
+        with self._lock:
+            found = {}
+            for start in range(0, len(keys), 500): # stay below SQLite's host parameter limit
+                batch = keys[start:start + 500]
+                query = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+                found.update(self._db.execute(query, batch).fetchall())
+
+            results = [None] * len(texts)
+            if found:
+                vectors = self._open_vectors(max(found.values()) + 1)
+                for i, key in enumerate(keys):
+                    if key in found:
+                        results[i] = np.array(vectors[found[key]]) # copy out of the memory map
+
+                now = time.time()
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self._db.commit()
+
+            hits = sum(result is not None for result in results)
+            self.hits += hits
+            self.misses += len(texts) - hits
+
+        return results
+
+    def put_many(self, texts:List[str], vectors:np.ndarray) -> None:
+        """
+        Stores vectors, evicting the least recently used entries when the cache is full.
+
+        Args:
+            - texts (List[str]): Texts that were embedded.
+            - vectors (np.ndarray): Matching float32 vectors of shape (len(texts), dim).
+        """
+
+        entries = dict(zip((self.key(text) for text in texts), vectors)) # drops duplicate texts
+        if not entries:
+            return
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._db.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('dim', ?)", (self.dim,))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding cache for {self.model} holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+
+            existing = {}
+            keys = list(entries)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                query = f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+                existing.update(self._db.execute(query, batch).fetchall())
+
+            new_keys = [key for key in keys if key not in existing][:self.max_entries]
+            used = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            free = self.max_entries - used
+
+            # fresh slots while there is room, then recycle the least recently used ones
+            slots = list(range(used, used + min(free, len(new_keys))))
+            evict = len(new_keys) - len(slots)
+            if evict > 0:
+                candidates = self._db.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict + len(existing),)
+                ).fetchall()
+                victims = [(key, slot) for key, slot in candidates if key not in existing][:evict] # never evict rows being refreshed
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                slots.extend(slot for _, slot in victims)
+
+            assignments = dict(zip(new_keys, slots))
+            assignments.update(existing)
+
+            vectors_map = self._open_vectors(max(assignments.values()) + 1)
+            for key, slot in assignments.items():
+                vectors_map[slot] = entries[key]
+            vectors_map.flush() # vectors hit the disk before the keys that point at them
+
+            now = time.time()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in assignments.items()]
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            - dict: Hit/miss counters and current size of the cache.
+        """
+
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": size,
+            "max_entries": self.max_entries
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_embedding_cache(model:str) -> Any:
+    """
+    Returns the process-wide cache for an embedding model.
+
+    Args:
+        - model (str): Embedding model name.
+
+    Returns:
+        - EmbeddingCache | None: Shared cache, or None when caching is disabled in config.yaml.
+    """
+
+    if not config["embedding_cache"]["enabled"]:
+        return None
+
+    with _caches_lock:
+        if model not in _caches:
+            _caches[model] = EmbeddingCache(config["path"]["embedding_cache"]["dir"], model, config["embedding_cache"]["max_entries"])
+        return _caches[model]
+
+def embed_with_cache(texts:List[str], model:str, embed_fn:Callable[[List[str]], np.ndarray]) -> np.ndarray:
+    """
+    Embeds texts, answering from the cache where possible and calling 'embed_fn' only for misses.
+
+    Args:
+        - texts (List[str]): Texts to embed.
+        - model (str): Embedding model name used by 'embed_fn'.
+        - embed_fn (Callable): Function that embeds a list of texts into a float32 matrix.
+
+    Returns:
+        - np.ndarray: float32 matrix of shape (len(texts), dim) in input order.
+    """
+
+    cache = get_embedding_cache(model)
+    if cache is None or not texts:
+        return embed_fn(texts)
+
+    cached = cache.get_many(texts)
+    missing = [i for i, vector in enumerate(cached) if vector is None]
+
+    if not missing:
+        return np.vstack(cached).astype("float32", copy=False)
+
+    # embed each distinct missing text once
+    unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+    fresh = embed_fn(unique_texts)
+    cache.put_many(unique_texts, fresh)
+
+    fresh_by_text = dict(zip(unique_texts, fresh))
+    embeddings = np.empty((len(texts), fresh.shape[1]), dtype="float32")
+    for i, vector in enumerate(cached):
+        embeddings[i] = vector if vector is not None else fresh_by_text[texts[i]]
+
+    return embeddings
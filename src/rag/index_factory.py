@@ -0,0 +1,155 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Creates the FAISS index type selected in config.yaml ("faiss_index" section) and applies its
+query-time tuning. Every index produced here is addressed by vector id (add_with_ids).
+
+Index types:
+- flat:    exact brute-force search, full float32 vectors in RAM (best recall, linear cost)
+- ivfflat: inverted file over 'nlist' k-means clusters, scans 'nprobe' clusters per query
+- ivfpq:   IVF with product-quantized vectors ('pq_m' bytes per vector at 8 bits), far less RAM
+- hnsw:    graph-based search, fast and accurate but vectors cannot be removed in place
+"""
+
+import faiss
+import numpy as np
+
+from typing import Any
+from utils.utils import load_config
+
+config = load_config() # load project configuration
+
+INDEX_TYPES = ("flat", "ivfflat", "ivfpq", "hnsw")
+
+def index_settings(settings:dict=None) -> dict:
+    """
+    Args:
+        - settings (dict): Optional overrides for the "faiss_index" section of config.yaml.
+
+    Returns:
+        - dict: Effective index settings.
+    """
+
+    merged = dict(config["faiss_index"])
+    merged.update(settings or {})
+
+    if merged["type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown faiss_index.type '{merged['type']}', expected one of {INDEX_TYPES}")
+
+    return merged
+
+def create_index(dim:int, training_vectors:np.ndarray, settings:dict=None) -> Any:
+    """
+    Creates an empty, trained index ready for add_with_ids().
+
+    Args:
+        - dim (int): Dimensionality of embedding vectors.
+        - training_vectors (np.ndarray): float32 vectors to train on (IVF types); a random sample of
+          at most 'train_sample_size' rows is used.
+        - settings (dict): Optional overrides for the "faiss_index" section of config.yaml.
+
+    Returns:
+        - faiss.Index: Empty index addressed by vector id.
+    """
+
+    settings = index_settings(settings)
+    index_type = settings["type"]
+
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim)) # L2-based flat index addressed by vector id
+
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, settings["hnsw_m"])
+        hnsw.hnsw.efConstruction = settings["ef_construction"]
+        return faiss.IndexIDMap2(hnsw) # HNSW cannot assign ids itself
+
+    # IVF indexes store ids natively and support remove_ids()
+    sample = training_vectors
+    if len(sample) > settings["train_sample_size"]:
+        rows = np.random.default_rng(0).choice(len(sample), settings["train_sample_size"], replace=False)
+        sample = sample[rows]
+
+    # k-means wants ~39 points per centroid; shrink nlist for small knowledge bases instead of failing
+    nlist = max(1, min(settings["nlist"], len(sample) // 39))
+    quantizer = faiss.IndexFlatL2(dim)
+
+    if index_type == "ivfflat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        if dim % settings["pq_m"] != 0:
+            raise ValueError(f"faiss_index.pq_m={settings['pq_m']} must divide the embedding dimension {dim}")
+        # each PQ codebook has 2^nbits centroids and wants ~39 points per centroid; cap the bits for small samples
+        nbits = min(settings["pq_nbits"], max(1, int(np.log2(max(len(sample) // 39, 2)))))
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, settings["pq_m"], nbits)
+
+    index.train(sample)
+    index.set_direct_map_type(faiss.DirectMap.Hashtable) # allows reconstruct() and remove_ids() by arbitrary id
+    return index
+
+def build_index(embeddings:np.ndarray, ids:np.ndarray, settings:dict=None) -> Any:
+    """
+    Creates, trains and fills an index in one go.
+
+    Args:
+        - embeddings (np.ndarray): float32 matrix of shape (n, dim).
+        - ids (np.ndarray): int64 vector ids, one per row.
+        - settings (dict): Optional overrides for the "faiss_index" section of config.yaml.
+
+    Returns:
+        - faiss.Index: Filled index with search parameters applied.
+    """
+
+    index = create_index(embeddings.shape[1], embeddings, settings)
+    index.add_with_ids(embeddings, ids)
+    set_search_params(index, settings)
+    return index
+
+def supports_removal(index:Any) -> bool:
+    """
+    Args:
+        - index (faiss.Index): Index created by this module.
+
+    Returns:
+        - bool: False for graph indexes (HNSW), which have to be rebuilt to drop vectors.
+    """
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    return not isinstance(inner, faiss.IndexHNSW)
+
+def set_search_params(index:Any, settings:dict=None) -> None:
+    """
+    Applies query-time tuning (nprobe for IVF, efSearch for HNSW). These values are not
+    all persisted by faiss.write_index, so the retriever calls this after every load.
+
+    Args:
+        - index (faiss.Index): Index created by this module.
+        - settings (dict): Optional overrides for the "faiss_index" section of config.yaml.
+    """
+
+    settings = index_settings(settings)
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(settings["nprobe"], inner.nlist)
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = settings["ef_search"]
+
+def describe_index(index:Any) -> str:
+    """
+    Args:
+        - index (faiss.Index): Index created by this module.
+
+    Returns:
+        - str: Index type name as used in config.yaml.
+    """
+
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else faiss.downcast_index(index)
+
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexIVFFlat):
+        return "ivfflat"
+    return "flat"
@@ -0,0 +1,142 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Reads and writes the on-disk state of the knowledge base index:
+the FAISS index, the chunk store (chunk texts and their source files), the BM25 lexical index, and the S3 manifest
+used for incremental updates.
+"""
+
+import os
+import json
+import faiss
+
+from typing import Any, Tuple
+from utils.utils import load_config
+from rag.chunk_store import ChunkStore, write_chunk_store
+from rag.lexical_index import write_lexical_index
+
+config = load_config() # load project configuration
+
+"""
+Manifest layout (JSON):
+{
+    "next_id": 42, # next unused vector id; ids are never reused
+    "chunking": "tokens:cl100k_base:256:32:0", # chunker settings the documents were chunked with
+    "index_type": "flat", # FAISS index type the vectors are stored in
+    "documents": {
+        "<s3 key>": {
+            "etag": "...",
+            "last_modified": "...",
+            "chunks": [{"hash": "<sha256 of chunk text>", "id": 7}, ...]
+        }
+    }
+}
+
+Chunk texts live in a binary chunk store (see rag/chunk_store.py), keyed by the same vector ids as the
+FAISS index (an IndexIDMap2); ids are not positions.
+"""
+
+def empty_manifest() -> dict:
+    """
+    Returns:
+        - dict: Manifest describing an empty knowledge base.
+    """
+
+    return {"next_id": 0, "chunking": None, "documents": {}}
+
+def atomic_write_json(data:Any, path:str, **kwargs) -> None:
+    """
+    Writes JSON to a temporary file and swaps it into place, so readers never see a partial file.
+
+    Args:
+        - data (Any): JSON-serializable object.
+        - path (str): Destination file path.
+    """
+
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(path + ".tmp", path)
+
+def load_manifest() -> Any:
+    """
+    Reads only the manifest, to decide whether the index needs an update before loading it.
+
+    Returns:
+        - dict | None: Manifest, or None when the index files are not all on disk.
+    """
+
+    paths = config["path"]["faiss"]
+    if not all(os.path.exists(paths[name]) for name in ("index_file", "chunk_file", "lexical_file", "manifest_file")):
+        return None
+
+    with open(paths["manifest_file"], "r") as f:
+        return json.load(f)
+
+def load_index_state() -> Tuple[Any, dict, dict]:
+    """
+    Loads the FAISS index, chunk entries and manifest from disk.
+
+    Returns:
+        - Tuple: (index, entries, manifest) where entries maps vector id -> (chunk text, metadata).
+          Returns (None, {}, empty manifest) when nothing usable exists on disk, which makes the
+          next update a full rebuild.
+    """
+
+    index_file = config["path"]["faiss"]["index_file"]
+    chunk_file = config["path"]["faiss"]["chunk_file"]
+    manifest_file = config["path"]["faiss"]["manifest_file"]
+
+    if not all(os.path.exists(path) for path in (index_file, chunk_file, manifest_file)):
+        return None, {}, empty_manifest()
+
+    index = faiss.read_index(index_file)
+
+    try:
+        store = ChunkStore(chunk_file)
+    except ValueError as e: # e.g. JSON metadata from an older version
+        print(f"{e}, rebuilding from scratch")
+        return None, {}, empty_manifest()
+    with open(manifest_file, "r") as f:
+        manifest = json.load(f)
+
+    entries = {vector_id: (chunk, meta) for vector_id, chunk, meta in store.items()}
+    manifest_ids = {chunk["id"] for doc in manifest["documents"].values() for chunk in doc["chunks"]}
+
+    # an interrupted write can leave the three files out of step; never patch on top of that
+    if index.ntotal != len(entries) or manifest_ids != set(entries):
+        print("Index, chunk store and manifest disagree, rebuilding from scratch")
+        return None, {}, empty_manifest()
+
+    return index, entries, manifest
+
+def save_index_state(index:Any, entries:dict, manifest:dict) -> None:
+    """
+    Persists the FAISS index, chunk entries, lexical index and manifest. Every file is replaced atomically;
+    the chunk store and lexical index go first and the FAISS index after them, so a running retriever only
+    accepts the set once all are in place (it checks that their sizes agree), and the manifest goes last.
+
+    Args:
+        - index (faiss.Index): Index holding one vector per entry, addressed by vector id.
+        - entries (dict): Vector id -> (chunk text, metadata with "filename").
+        - manifest (dict): Manifest describing which S3 objects produced which vector ids.
+    """
+
+    index_file = config["path"]["faiss"]["index_file"]
+    chunk_file = config["path"]["faiss"]["chunk_file"]
+    lexical_file = config["path"]["faiss"]["lexical_file"]
+    manifest_file = config["path"]["faiss"]["manifest_file"]
+
+    if os.path.isdir(os.path.dirname(index_file)): # check if directory exists in "./data/rag/index.faiss"
+        print(f"Directory exists: {index_file}")
+    else:
+        os.makedirs(os.path.dirname(index_file)) # if not then create it
+        print(f"Directory created: {index_file}")
+
+    write_chunk_store(chunk_file, entries) # save the chunks and their source files for later use (semantic search)
+    write_lexical_index(lexical_file, entries) # BM25 postings for exact-term matching (hybrid search)
+
+    faiss.write_index(index, index_file + ".tmp") # save the index to disk
+    os.replace(index_file + ".tmp", index_file)
+
+    atomic_write_json(manifest, manifest_file, indent=2)
@@ -0,0 +1,264 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Local BM25 inverted index over the knowledge base chunks, built alongside the FAISS index.
+
+Dense embeddings match exact identifiers (order ids, SKU codes, product names) poorly; BM25 matches them
+exactly and answers without any remote call. The index is memory-mapped like the chunk store: looking up
+a query reads only the postings of its terms.
+"""
+
+import os
+import re
+import mmap
+import math
+import numpy as np
+
+from typing import Dict, List, Tuple
+from utils.utils import load_config
+
+config = load_config() # load project configuration
+
+TOKEN = re.compile(r"[^\W_]+(?:[-_./#][^\W_]+)*") # letters/digits in any script; keeps identifiers such as "tj-0001234" whole
+SEPARATOR = re.compile(r"[-_./#]")
+
+"""
+File layout (little-endian, every section starts on an 8-byte boundary):
+
+    header            magic (8 bytes) + uint64 counts: documents n, terms m, postings p, term bytes, total length
+    ids               int64[n]     vector id of each document (chunk)
+    lengths           int32[n]     tokens per document
+    term_offsets      uint64[m+1]  term j is terms[term_offsets[j]:term_offsets[j+1]], terms sorted by their UTF-8 bytes
+    posting_offsets   uint64[m+1]  postings of term j are postings[posting_offsets[j]:posting_offsets[j+1]]
+    posting_docs      int32[p]     document (position in ids) of each posting
+    posting_counts    int32[p]     term frequency of each posting
+    terms             UTF-8 terms, concatenated
+"""
+
+MAGIC = b"MMBM25_1"
+HEADER = np.dtype([("magic", "S8"), ("documents", "<u8"), ("terms", "<u8"), ("postings", "<u8"), ("term_bytes", "<u8"), ("total_length", "<u8")])
+
+def _padded(size:int) -> int:
+    return (size + 7) & ~7
+
+def tokenize(text:str) -> List[str]:
+    """
+    Lowercases and splits text into terms. Compound tokens (identifiers joined by "-", "_", ".", "/" or "#")
+    are kept whole and also contribute their parts, so "TJ-0001234" matches both "tj-0001234" and "0001234".
+
+    Args:
+        - text (str): Input text.
+
+    Returns:
+        - List[str]: Terms, with repetitions.
+    """
+
+    terms = []
+    for token in TOKEN.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(SEPARATOR.split(token))
+    return terms
+
+def is_identifier(term:str) -> bool:
+    """
+    Args:
+        - term (str): Query term.
+
+    Returns:
+        - bool: Whether the term looks like an exact identifier (order id, SKU, model number): it mixes letters
+          and digits, with at least three digits or a separator ("tj-0001234", "sku123", "tj-12"). Plain
+          numbers ("2024", "100") and sizes or purities ("18k", "22kt") are not identifiers.
+    """
+
+    digits = sum(c.isdigit() for c in term)
+    return digits > 0 and any(c.isalpha() for c in term) and (digits >= 3 or not term.isalnum())
+
+def identifier_terms(query:str) -> set:
+    """
+    Args:
+        - query (str): Query text.
+
+    Returns:
+        - set: Identifiers in the query (see is_identifier()) and their parts that hold digits, which is how a
+          chunk indexes an identifier glued to the next word ("sku: TJ-0001234.product name: ...").
+    """
+
+    terms = set()
+    for token in TOKEN.findall(query.lower()):
+        if is_identifier(token):
+            terms.add(token)
+            terms.update(part for part in SEPARATOR.split(token) if any(c.isdigit() for c in part))
+    return terms
+
+def write_lexical_index(path:str, entries:dict) -> None:
+    """
+    Builds the BM25 postings for all chunks and writes them atomically.
+
+    Args:
+        - path (str): Destination file path.
+        - entries (dict): Vector id -> (chunk text, metadata).
+    """
+
+    ids = np.array(sorted(entries), dtype="<i8")
+    lengths = np.empty(len(ids), dtype="<i4")
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    for position, vector_id in enumerate(ids.tolist()):
+        terms = tokenize(entries[vector_id][0])
+        lengths[position] = len(terms)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings.setdefault(term, []).append((position, count))
+
+    terms = sorted(postings, key=lambda term: term.encode("utf-8")) # binary search compares raw bytes
+    encoded = [term.encode("utf-8") for term in terms]
+    term_offsets = np.zeros(len(terms) + 1, dtype="<u8")
+    np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+    posting_offsets = np.zeros(len(terms) + 1, dtype="<u8")
+    np.cumsum([len(postings[term]) for term in terms], out=posting_offsets[1:])
+
+    flat = np.array([posting for term in terms for posting in postings[term]], dtype="<i4").reshape(-1, 2)
+    posting_docs, posting_counts = np.ascontiguousarray(flat[:, 0]), np.ascontiguousarray(flat[:, 1])
+
+    header = np.array([(MAGIC, len(ids), len(terms), len(flat), int(term_offsets[-1]), int(lengths.sum()))], dtype=HEADER)
+
+    with open(path + ".tmp", "wb") as f:
+        for array in (header, ids, lengths, term_offsets, posting_offsets, posting_docs, posting_counts):
+            data = array.tobytes()
+            f.write(data)
+            f.write(b"\0" * (_padded(len(data)) - len(data))) # keep the next array aligned
+        f.write(b"".join(encoded))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+class LexicalIndex:
+    """
+    Read-only, memory-mapped BM25 index.
+    """
+
+    def __init__(self, path:str) -> None:
+        """
+        Args:
+            - path (str): Path to a file written by write_lexical_index().
+
+        Raises:
+            - ValueError: If the file is not a lexical index.
+        """
+
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.itemsize:
+                raise ValueError(f"{path} is not a lexical index")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # stays valid after the file is replaced
+
+        header = np.frombuffer(self._map, dtype=HEADER, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a lexical index")
+
+        n, m, p = int(header["documents"]), int(header["terms"]), int(header["postings"])
+        position = _padded(HEADER.itemsize)
+        sections = []
+        for dtype, count in (("<i8", n), ("<i4", n), ("<u8", m + 1), ("<u8", m + 1), ("<i4", p), ("<i4", p)):
+            sections.append(np.frombuffer(self._map, dtype=dtype, count=count, offset=position))
+            position += _padded(count * np.dtype(dtype).itemsize)
+        self.ids, self._lengths, self._term_offsets, self._posting_offsets, self._docs, self._counts = sections
+
+        self._terms_start = position
+        if position + int(header["term_bytes"]) != len(self._map):
+            raise ValueError(f"{path} is truncated or corrupt")
+
+        self._average_length = int(header["total_length"]) / n if n else 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _term(self, j:int) -> bytes:
+        return self._map[self._terms_start + int(self._term_offsets[j]):self._terms_start + int(self._term_offsets[j + 1])]
+
+    def postings(self, term:str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            - term (str): A term as produced by tokenize().
+
+        Returns:
+            - Tuple[np.ndarray, np.ndarray]: (document positions, term frequencies); empty when the term is unknown.
+        """
+
+        key = term.encode("utf-8")
+        low, high = 0, len(self._term_offsets) - 1
+        while low < high: # binary search over the sorted terms
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(self._term_offsets) - 1 and self._term(low) == key:
+            start, end = int(self._posting_offsets[low]), int(self._posting_offsets[low + 1])
+            return self._docs[start:end], self._counts[start:end]
+        return self._docs[:0], self._counts[:0]
+
+    def search(self, query:str, top_k:int) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Scores documents with Okapi BM25 (semantic_search.bm25_k1 / bm25_b).
+
+        Args:
+            - query (str): Query text.
+            - top_k (int): Number of results.
+
+        Returns:
+            - Tuple: (scores, vector ids, exact) with results best first. 'exact' is True when the query holds
+              identifiers found in the knowledge base (each in at most 'semantic_search.fast_path_max_df'
+              chunks) and the best result contains all of them, i.e. lexical results can be trusted alone.
+        """
+
+        settings = config["semantic_search"]
+        k1, b = settings["bm25_k1"], settings["bm25_b"]
+        n = len(self.ids)
+        scores = np.zeros(n, dtype="float32")
+        identifiers = []
+        exact_terms = identifier_terms(query)
+
+        for term in set(tokenize(query)):
+            docs, counts = self.postings(term)
+            if not len(docs):
+                continue
+
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            counts = counts.astype("float32")
+            norm = k1 * (1 - b + b * self._lengths[docs] / self._average_length)
+            scores[docs] += idf * counts * (k1 + 1) / (counts + norm) # a term occurs once per document in the postings
+
+            if term in exact_terms and len(docs) <= settings["fast_path_max_df"]:
+                identifiers.append(docs)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k > 0:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+
+        exact = bool(identifiers) and len(matched) > 0 and all(np.isin(matched[0], docs) for docs in identifiers)
+        return scores[matched], self.ids[matched], exact
+
+def reciprocal_rank_fusion(rankings:List[np.ndarray], k:int) -> List[Tuple[int, float]]:
+    """
+    Merges ranked result lists with reciprocal rank fusion: score(id) = sum over lists of 1 / (k + rank).
+
+    Args:
+        - rankings (List[np.ndarray]): Vector ids, best first; -1 entries (FAISS padding) are ignored.
+        - k (int): Damping constant; larger values flatten the influence of the top ranks.
+
+    Returns:
+        - List[Tuple[int, float]]: (vector id, fused score) pairs, best first.
+    """
+
+    fused = {}
+    for ranking in rankings:
+        for rank, vector_id in enumerate(int(i) for i in ranking if i != -1):
+            fused[vector_id] = fused.get(vector_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
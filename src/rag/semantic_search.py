@@ -2,28 +2,187 @@
 author: Yagnik Poshiya
 github: @yagnikposhiya
 
-Performs semantic search using a FAISS index and retrieves relevant context
-based on an input query for retrieval-augmented generation (RAG).
+Performs semantic search using a FAISS index, optionally fused with a local BM25 index,
+and retrieves relevant context based on an input query for retrieval-augmented generation (RAG).
 """
 
 import os
-import json
 import faiss
+import threading
 import numpy as np
 
-from typing import List
-from openai import OpenAI
-from dotenv import load_dotenv
+from typing import List, Tuple
 from utils.utils import load_config
+from utils.metrics import timed
+from llm.provider import get_provider
+from rag.chunk_store import ChunkStore
+from rag.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from rag.index_factory import set_search_params
+from rag.embedding_cache import embed_with_cache
 
-load_dotenv() # load environment variables from .env file
 config = load_config() # load project configuration
 
-# load OpenAI API key for embedding
-client = OpenAI(
-    base_url=config["api_endpoint"]["openai"],
-    api_key=os.getenv("OPENAI_API_KEY") if config["flags"]["credentials_from_env"] else "<api_key>"
-)
+class FaissRetriever:
+    """
+    Keeps the FAISS index, its memory-mapped chunk store and the BM25 lexical index open for the life of the process.
+
+    The files on disk are checked with a cheap os.stat() before every search; when any
+    of them has been replaced or modified, all are reopened and swapped in together so
+    concurrent searches never see an index paired with the wrong chunk store.
+    """
+
+    def __init__(self, index_file:str, chunk_file:str, lexical_file:str=None) -> None:
+        """
+        Args:
+            - index_file (str): Path to the FAISS index file.
+            - chunk_file (str): Path to the chunk store holding chunk texts and their source files.
+            - lexical_file (str): Optional path to the BM25 index; lexical search is unavailable while it is missing.
+        """
+
+        self.index_file = index_file
+        self.chunk_file = chunk_file
+        self.lexical_file = lexical_file
+        self._lock = threading.Lock() # serializes reloads; searches read the current snapshot without locking
+        self._snapshot = None # tuple of (signature, index, store, lexical)
+
+    def _signature(self) -> Tuple:
+        """
+        Returns a fingerprint of the files on disk (inode, size, mtime). Writers replace the files
+        with os.replace(), which changes the inode, so an in-place edit and an atomic swap are both detected.
+        """
+
+        signature = []
+        for path in (self.index_file, self.chunk_file):
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        if self.lexical_file and os.path.exists(self.lexical_file): # optional; indexes built before it existed lack it
+            stat = os.stat(self.lexical_file)
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _load(self) -> Tuple:
+        """
+        Reads the index and maps the chunk store and lexical index, and returns a new snapshot.
+        Retries when the files change while being read, e.g. a rebuild finishing mid-load.
+        """
+
+        for _ in range(5):
+            signature = self._signature()
+
+            index = faiss.read_index(self.index_file) # loads FAISS index from disk
+            set_search_params(index) # nprobe / efSearch from config.yaml
+
+            # chunk texts are only mapped; lookups read the records they need
+            try:
+                store = ChunkStore(self.chunk_file)
+                lexical = LexicalIndex(self.lexical_file) if len(signature) == 3 else None
+            except (ValueError, FileNotFoundError):
+                continue
+
+            # accept the snapshot only if nothing moved underneath us and all files belong together
+            if signature == self._signature() and index.ntotal == len(store) and (lexical is None or len(lexical) == len(store)):
+                return (signature, index, store, lexical)
+
+        raise RuntimeError(f"FAISS index {self.index_file} and chunk store {self.chunk_file} are out of sync")
+
+    def snapshot(self) -> Tuple:
+        """
+        Returns the current (signature, index, store, lexical) snapshot, reloading it first if the files changed.
+        """
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == self._signature():
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot[0] != self._signature(): # another thread may have reloaded already
+                try:
+                    snapshot = self._load()
+                except RuntimeError:
+                    if snapshot is None: # nothing to fall back to
+                        raise
+                    print("Keeping previously loaded FAISS index; files on disk are being rewritten")
+                    return snapshot
+                self._snapshot = snapshot # single reference assignment swaps index and chunk store atomically
+            return snapshot
+
+    def search(self, query_vector:np.ndarray, top_k:int) -> Tuple[np.ndarray, np.ndarray, ChunkStore]:
+        """
+        Performs similarity search against the cached index.
+
+        Args:
+            - query_vector (np.ndarray): Query embedding(s) of shape (n, dim) in float32.
+            - top_k (int): Number of nearest chunks to return per query.
+
+        Returns:
+            - Tuple: (distances, ids, store) where ids are vector ids (-1 where fewer than top_k results exist)
+              to be looked up in 'store', the chunk store of the searched snapshot.
+        """
+
+        _, index, store, _ = self.snapshot()
+        distances, ids = index.search(query_vector, top_k)
+        return distances, ids, store
+
+    def search_lexical(self, query:str, top_k:int) -> Tuple:
+        """
+        Performs BM25 search against the cached lexical index; needs no embedding.
+
+        Args:
+            - query (str): Query text.
+            - top_k (int): Number of results.
+
+        Returns:
+            - Tuple | None: (scores, ids, exact, store) as described in LexicalIndex.search(), or None when
+              no lexical index has been built yet.
+        """
+
+        _, _, store, lexical = self.snapshot()
+        if lexical is None:
+            return None
+        scores, ids, exact = lexical.search(query, top_k)
+        return scores, ids, exact, store
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_retriever() -> FaissRetriever:
+    """
+    Returns the process-wide FaissRetriever, creating it on first use.
+
+    Returns:
+        - FaissRetriever: Shared retriever bound to the configured index, chunk store and lexical index files.
+    """
+
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                paths = config["path"]["faiss"]
+                _retriever = FaissRetriever(paths["index_file"], paths["chunk_file"], paths["lexical_file"])
+    return _retriever
+
+def embed_queries(queries:List[str]) -> np.ndarray:
+    """
+    Embeds queries using OpenAI embeddings, in as few requests as possible (one per 'embedding.batch_size' queries).
+
+    Args:
+        - queries (List[str]): Natural language inputs from users/emails.
+
+    Returns:
+        - np.ndarray: float32 matrix of shape (len(queries), dim) in input order.
+    """
+
+    def embed(texts:List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), config["embedding"]["batch_size"]):
+            # query latency sits on the reply path, so a slow request may be hedged
+            response = get_provider("openai").embed(config["embedding_model"]["openai"], texts[start:start + config["embedding"]["batch_size"]], hedge=True)
+            vectors.extend(item.embedding for item in response.data)
+        return np.array(vectors).astype("float32")
+
+    # repeated queries (e.g. the same extracted_info) are answered from the on-disk embedding cache
+    return embed_with_cache(queries, config["embedding_model"]["openai"], embed)
 
 def embed_query(query:str) -> np.ndarray:
     """
@@ -33,46 +192,86 @@ def embed_query(query:str) -> np.ndarray:
         - query (str): Natural language input from user/email.
 
     Returns:
-        - np.ndarray: Embedding vector in float32 format.
+        - np.ndarray: Embedding vector in float32 format, shape (1, dim).
     """
 
-    response = client.embeddings.create(
-        model = config["embedding_model"]["openai"],
-        input = [query]
-    )
+    return embed_queries([query]).reshape(1,-1)
 
-    embedding = response.data[0].embedding
-    return np.array(embedding).astype("float32").reshape(1,-1)
-
-def retrieve_relevant_context(query:str, top_k:int=5) -> List[str]:
+def retrieve_relevant_context_batch(queries:List[str], top_k:int=5, mode:str=None) -> List[List[dict]]:
     """
-    Loads FAISS index and metadata, performs similarity search, and
-    retrieves top-k relevant chunks for a given query.
+    Retrieves top-k relevant chunks for many queries at once: identical queries are answered once, the
+    queries that need an embedding are embedded together, and FAISS searches all of them in one multi-row
+    call (parallelized internally). Search modes and the lexical fast path work as in retrieve_relevant_context().
 
     Args:
-        - query (str): Customer's question or issue in text form
-        - top_k (int): Number of top relevant chunks to return
+        - queries (List[str]): Customer questions or issues in text form.
+        - top_k (int): Number of top relevant chunks to return per query.
+        - mode (str): "vector", "lexical" or "hybrid". Defaults to semantic_search.mode.
 
     Returns:
-        - List[str]: List of top-k most relevant knowledge base chunks.
+        - List[List[dict]]: For every query (in input order) its results, best first, as
+          {"chunk", "score", "filename", "chunk_id"}. The score is the L2 distance for vector search
+          (lower is better), the BM25 score for lexical search and the fused RRF score for hybrid search
+          (higher is better for both).
     """
 
-    # loads FAISS index from disk
-    index = faiss.read_index(config["path"]["faiss"]["index_file"])
+    settings = config["semantic_search"]
+    mode = mode or settings["mode"]
+    retriever = get_retriever()
+    candidates = max(top_k, settings["candidates"])
+
+    def results(ranked:List[Tuple[int, float]], store:ChunkStore) -> List[dict]:
+        scores = dict(ranked)
+        return [{"chunk": chunk, "score": scores[meta["chunk_id"]], **meta} for chunk, meta in store.lookup([vector_id for vector_id, _ in ranked])]
 
-    # load associated chunk texts and metadata
-    with open(config["path"]["faiss"]["metadata_file"],"r") as f:
-        data = json.load(f)
-        chunks = data["chunks"]
-        meta = data["meta"]
-    
-    # embed the query
-    query_vector = embed_query(query)
+    answered, lexical = {}, {}
+    unique = list(dict.fromkeys(queries)) # de-duplicate, keeping the first occurrence's order
 
-    # perform similarity search
-    distances, indices = index.search(query_vector, top_k)
+    if mode != "vector":
+        for query in unique:
+            with timed("bm25_search"):
+                found = retriever.search_lexical(query, candidates)
+            if found is None: # no lexical index built yet
+                break
+            scores, ids, exact, store = found
+            if mode == "lexical" or (exact and settings["lexical_fast_path"]):
+                answered[query] = results(list(zip(ids[:top_k].tolist(), scores[:top_k].tolist())), store)
+            else:
+                lexical[query] = ids
 
-    # extract matching chunks
-    results = [chunks[i] for i in indices[0]]
+    pending = [query for query in unique if query not in answered]
+    if pending:
+        with timed("query_embedding"):
+            query_vectors = embed_queries(pending) # one embeddings request for all remaining queries
+
+        # one multi-row similarity search on the cached index (reloaded automatically if the files changed)
+        with timed("faiss_search"):
+            distances, ids, store = retriever.search(query_vectors, candidates if lexical else top_k)
+
+        for query, row_distances, row_ids in zip(pending, distances, ids):
+            if query in lexical:
+                ranked = reciprocal_rank_fusion([row_ids, lexical[query]], settings["rrf_k"])[:top_k]
+            else: # FAISS pads with -1 when the index holds fewer than top_k vectors
+                ranked = [(vector_id, distance) for vector_id, distance in zip(row_ids.tolist()[:top_k], row_distances.tolist()) if vector_id != -1]
+            answered[query] = results(ranked, store)
+
+    return [answered[query] for query in queries]
+
+def retrieve_relevant_context(query:str, top_k:int=5, mode:str=None) -> List[str]:
+    """
+    Retrieves top-k relevant chunks for a given query with similarity search against the in-memory
+    FAISS index, BM25 search against the local lexical index, or both merged with reciprocal rank fusion.
+
+    Queries whose identifiers (order ids, SKU codes) match a chunk exactly are answered from BM25 alone,
+    without the embedding round trip, when 'semantic_search.lexical_fast_path' is enabled.
+
+    Args:
+        - query (str): Customer's question or issue in text form
+        - top_k (int): Number of top relevant chunks to return
+        - mode (str): "vector", "lexical" or "hybrid". Defaults to semantic_search.mode.
+
+    Returns:
+        - List[str]: List of top-k most relevant knowledge base chunks.
+    """
 
-    return results
\ No newline at end of file
+    return [result["chunk"] for result in retrieve_relevant_context_batch([query], top_k, mode)[0]]
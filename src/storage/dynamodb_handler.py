@@ -3,12 +3,26 @@ author: Yagnik Poshiya
 github: @yagnikposhiya
 
 Performs read and write operations on DynamoDB for email metadata and logs.
+
+Email logs are written behind: store_email_log() only appends to an in-memory buffer, and a
+background thread flushes it with BatchWriteItem (25 records per call) whenever a batch is full
+or 'flush_interval' seconds have passed. Unprocessed items and throttling are retried with
+backoff; records that still cannot be written are appended to a local journal file and
+replayed the next time the process starts.
 """
 
 import os
+import json
+import time
 import uuid
 import boto3
+import atexit
+import random
+import threading
 
+from decimal import Decimal
+from typing import Any, Iterator, List
+from botocore.exceptions import BotoCoreError, ClientError
 from utils.utils import load_config
 
 config = load_config() # load project configuration
@@ -17,13 +31,238 @@ config = load_config() # load project configuration
 TABLE_NAME = config["aws"]["dynamodb"]["table_name"]
 REGION = config ["aws"]["dynamodb"]["db_region"]
 
-# create dynamodb client
-dynamodb = boto3.resource("dynamodb", region_name=REGION)
-table = dynamodb.Table(TABLE_NAME)
+# error codes worth retrying right away
+RETRYABLE_ERRORS = {"ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded",
+                    "InternalServerError", "ServiceUnavailable"}
+
+# records rejected for their content will never be accepted; anything else (missing table,
+# expired credentials, ...) is journaled so it can be replayed once the problem is fixed
+REJECTED_ERRORS = {"ValidationException", "ItemCollectionSizeLimitExceededException"}
+
+class EmailLogWriter:
+    """
+    Buffered, batched DynamoDB writer with a local append-only journal as fallback.
+    """
+
+    def __init__(self, resource:Any, table_name:str, journal_file:str, batch_size:int=None, flush_interval:float=None,
+                 max_retries:int=None, backoff_base:float=None) -> None:
+        """
+        Args:
+            - resource (boto3.resource): DynamoDB service resource.
+            - table_name (str): Table receiving the records.
+            - journal_file (str): Append-only JSON-lines file for records that could not be written.
+            - batch_size (int): Records per BatchWriteItem call (max 25).
+            - flush_interval (float): Max seconds a record waits in the buffer.
+            - max_retries (int): Retries per batch before records go to the journal.
+            - backoff_base (float): Initial retry delay in seconds.
+        """
+
+        settings = config["aws"]["dynamodb"]
+        self.resource = resource
+        self.table_name = table_name
+        self.journal_file = journal_file
+        self.batch_size = min(batch_size or settings["write_batch_size"], 25)
+        self.flush_interval = settings["flush_interval"] if flush_interval is None else flush_interval
+        self.max_retries = settings["max_retries"] if max_retries is None else max_retries
+        self.backoff_base = settings["backoff_base"] if backoff_base is None else backoff_base
+
+        self.written = 0
+        self.journaled = 0
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock() # one flush at a time
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="dynamodb-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, item:dict) -> None:
+        """
+        Queues a record for writing; returns immediately.
+
+        Args:
+            - item (dict): DynamoDB item.
+        """
+
+        with self._condition:
+            self._buffer.append(item)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify() # size threshold reached, wake the writer now
+
+    def _run(self) -> None:
+        """
+        Background loop: replay the journal of a previous run, then flush whenever a batch is full
+        or 'flush_interval' seconds have passed.
+        """
+
+        try:
+            self.replay_journal()
+        except Exception as e: # the journal stays on disk for the next start
+            print(f"Email log journal replay failed: {e}")
+
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._buffer) < self.batch_size:
+                    self._condition.wait(timeout=self.flush_interval)
+                stopped = self._stopped
+            try:
+                self.flush()
+            except Exception as e: # e.g. the journal cannot be written; keep serving later records
+                print(f"Email log flush failed: {e}")
+            if stopped:
+                return
+
+    def flush(self) -> None:
+        """
+        Writes everything buffered so far.
+        """
+
+        with self._flush_lock:
+            with self._condition:
+                items, self._buffer = self._buffer, []
+
+            for start in range(0, len(items), self.batch_size):
+                self._write_batch(items[start:start + self.batch_size])
+
+    def _write_batch(self, items:list) -> None:
+        """
+        Writes up to 25 records, retrying unprocessed items and transient errors with backoff.
+        Records left over after 'max_retries' are appended to the journal.
+        """
+
+        pending = [{"PutRequest": {"Item": item}} for item in items]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.resource.batch_write_item(RequestItems={self.table_name: pending})
+                written = len(pending)
+                pending = response.get("UnprocessedItems", {}).get(self.table_name, [])
+                self.written += written - len(pending)
+                if not pending:
+                    return
+                reason = f"{len(pending)} unprocessed items"
+
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code", "")
+                if code in REJECTED_ERRORS:
+                    print(f"Dropping {len(pending)} email logs rejected by DynamoDB: {e}")
+                    return
+                reason = code
+                if code not in RETRYABLE_ERRORS: # retrying will not help, keep the records for the next start
+                    break
+
+            except BotoCoreError as e: # endpoint unreachable, connection reset, timeouts
+                reason = type(e).__name__
+
+            except Exception as e: # e.g. TypeError for a value boto3 cannot serialize; retrying will not help
+                reason = f"{type(e).__name__}: {e}"
+                break
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff_base * (2 ** attempt) * (0.5 + random.random())) # exponential backoff with jitter
+
+        print(f"DynamoDB write failed ({reason}); journaling {len(pending)} email logs to {self.journal_file}")
+        self._journal([request["PutRequest"]["Item"] for request in pending])
+
+    def _journal(self, items:list) -> None:
+        """
+        Appends records to the local journal and syncs it to disk.
+        """
+
+        os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        with open(self.journal_file, "a") as f:
+            for item in items:
+                f.write(json.dumps(item, default=lambda value: float(value) if isinstance(value, Decimal) else str(value)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.journaled += len(items)
+
+    def replay_journal(self) -> None:
+        """
+        Writes records journaled by a previous run. The journal is renamed first, so records that fail
+        again are journaled afresh; replaying twice after a crash is harmless because each record
+        keeps its email_id (the table key).
+        """
+
+        replay_file = self.journal_file + ".replay"
+        if os.path.exists(self.journal_file) and not os.path.exists(replay_file):
+            os.replace(self.journal_file, replay_file)
+        if not os.path.exists(replay_file): # nothing left from an earlier run
+            return
+
+        items = []
+        with open(replay_file, "r") as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line, parse_float=Decimal)) # DynamoDB numbers must not be floats
+                except json.JSONDecodeError: # torn last line from a crash
+                    continue
+
+        print(f"Replaying {len(items)} journaled email logs")
+        with self._flush_lock:
+            for start in range(0, len(items), self.batch_size):
+                self._write_batch(items[start:start + self.batch_size])
+        os.remove(replay_file)
+
+    def close(self) -> None:
+        """
+        Flushes the buffer and stops the background thread.
+        """
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def create_resource() -> Any:
+    """
+    Returns:
+        - boto3.resource: DynamoDB service resource for the configured region (and endpoint override).
+    """
+
+    return boto3.resource("dynamodb", region_name=REGION, endpoint_url=config["aws"]["dynamodb"]["endpoint_url"]) # create dynamodb client
+
+def get_log_writer() -> EmailLogWriter:
+    """
+    Returns the process-wide write-behind writer for the email log table, creating it on first use
+    (its background thread first replays any journal left by a previous run).
+
+    Returns:
+        - EmailLogWriter: Shared writer.
+    """
+
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EmailLogWriter(create_resource(), TABLE_NAME, config["path"]["dynamodb"]["journal_file"])
+            atexit.register(_writer.close) # flush what is still buffered on exit
+        return _writer
+
+def to_dynamodb(value:Any) -> Any:
+    """
+    Converts floats, which boto3 refuses, to Decimal, recursing into dicts and lists.
+
+    Args:
+        - value (Any): Attribute value, e.g. the extracted information of an email.
+
+    Returns:
+        - Any: The same value with every float replaced by a Decimal.
+    """
+
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {key: to_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamodb(item) for item in value]
+    return value
 
 def store_email_log(email_data:dict) -> None:
     """
-    Stores a sigle email entry in DynamoDB.
+    Stores a sigle email entry in DynamoDB (queued; written in batches in the background).
 
     Args:
         - email_data (dict): Dictionary containing email metadata
@@ -39,9 +278,32 @@ def store_email_log(email_data:dict) -> None:
         "body": email_data.get("body", ""),
         "date": email_data.get("date", ""),
         "time": email_data.get("time", ""),
-        "status": "received",
+        "status": email_data.get("status", "received"),
         "category": email_data.get("category",""),
-        "extracted_info": email_data.get("extracted_info",""),
+        "classified_by": email_data.get("classified_by", "llm"), # "llm", or the local pre-classifier rule/model that decided
+        "extracted_info": to_dynamodb(email_data.get("extracted_info","")), # the LLM may return floats (amounts, ratings)
         "email_reply": email_data.get("email_reply","")
     }
-    table.put_item(Item=email_item)
\ No newline at end of file
+    get_log_writer().put(email_item)
+
+def scan_email_logs(attributes:List[str]) -> Iterator[dict]:
+    """
+    Reads all email logs (paginated Scan), e.g. as training data for the local pre-classifier.
+
+    Args:
+        - attributes (List[str]): Attributes to return for every item.
+
+    Yields:
+        - dict: One email log item with (a subset of) the requested attributes.
+    """
+
+    table = create_resource().Table(TABLE_NAME)
+    names = {f"#a{i}": attribute for i, attribute in enumerate(attributes)} # placeholders avoid reserved words (e.g. "status")
+    request = {"ProjectionExpression": ", ".join(names), "ExpressionAttributeNames": names}
+
+    while True:
+        response = table.scan(**request)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
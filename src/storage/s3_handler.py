@@ -9,69 +9,175 @@ Used for dynamically preparing text corpus for semantic search (RAG).
 import os
 import csv
 import boto3
+import threading
 
-from docx import Document # for parsing word documents
+from botocore.config import Config
+from typing import Any, Iterable, Iterator, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from io import BytesIO, StringIO
+from io import BytesIO, StringIO, TextIOWrapper
 from utils.utils import load_config
 from utils.utils import convert_csv_to_chunks
 
 load_dotenv() # load environment variables from .env file
 config = load_config() # load project configuration
 
-# initialize s3 client using credentials from environment
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID") if config["flags"]["credentials_from_env"] else "<access_key>",
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY") if config["flags"]["credentials_from_env"] else "<secret_access_key>",
-    region_name=config["aws"]["s3"]["bucket_region"]
-)
-
 BUCKET_NAME = config["aws"]["s3"]["bucket_name"]
 
-def read_all_documents_from_s3(prefix:str="") -> dict:
+SUPPORTED_EXTENSIONS = (".docx", ".csv")
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+def get_s3_client() -> Any:
     """
-    Reads all .docx and .csv files from an S3 bucket or a specified folder prefix.
+    Returns the process-wide S3 client, created on first use so that importing this module stays cheap.
+
+    Returns:
+        - botocore.client.S3: Shared (thread-safe) S3 client.
+    """
+
+    global _s3
+    with _s3_lock:
+        if _s3 is None:
+            # initialize s3 client using credentials from environment
+            _s3 = boto3.client(
+                "s3",
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID") if config["flags"]["credentials_from_env"] else "<access_key>",
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY") if config["flags"]["credentials_from_env"] else "<secret_access_key>",
+                region_name=config["aws"]["s3"]["bucket_region"],
+                config=Config(max_pool_connections=max(10, config["aws"]["s3"]["download_workers"])) # one connection per download thread
+            )
+        return _s3
+
+def list_documents_in_s3(prefix:str="") -> list:
+    """
+    Lists all .docx and .csv objects in the S3 bucket (or under a folder prefix) with their version markers.
 
     Args:
         - prefix (str): Optional prefix (folder path) in the bucket.
 
     Returns:
-        - dict: A dictionary of {filename (S3 key): plain text content}
+        - list: A list of dictionaries {"key", "etag", "last_modified", "size"}, one per supported object.
+    """
+
+    documents = []
+    paginator = get_s3_client().get_paginator("list_objects_v2") # list_objects_v2 returns at most 1000 keys per call
+
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        for item in page.get("Contents",[]):
+            if not item["Key"].endswith(SUPPORTED_EXTENSIONS): # skip unsupported file types
+                continue
+            documents.append({
+                "key": item["Key"],
+                "etag": item["ETag"].strip('"'),
+                "last_modified": item["LastModified"].isoformat(),
+                "size": item["Size"]
+            })
+
+    return documents
+
+def read_document_from_s3(key:str) -> Any:
+    """
+    Downloads a single .docx or .csv object and converts it into plain text.
+
+    Args:
+        - key (str): S3 key of the document.
+
+    Returns:
+        - str | None: Plain text content, or None if the object could not be read.
     """
 
-    result = {}
+    try:
+        # get file content from S3
+        obj = get_s3_client().get_object(Bucket=BUCKET_NAME, Key=key)
+
+        limit = config["aws"]["s3"]["max_document_bytes"]
+        if limit and obj["ContentLength"] > limit: # do not pull oversized objects into memory
+            obj["Body"].close()
+            print(f"Skipping {key}: {obj['ContentLength']} bytes exceeds max_document_bytes ({limit})")
+            return None
+
+        # process .docx files
+        if key.endswith(".docx"):
+            from docx import Document # for parsing word documents; imported on first use
+            doc = Document(BytesIO(obj['Body'].read())) # zip archive: needs random access
+            return "\n".join([p.text for p in doc.paragraphs])
 
-    response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=prefix) # list all files in the bucket or in the prefix path
+        # process .csv files, parsed block by block straight from the response stream
+        with TextIOWrapper(obj["Body"], encoding="utf-8", newline="") as text:
+            chunks = convert_csv_to_chunks(text)
+        return "\n".join(chunks)
 
-    # walk/loop through each object in the bucket
-    for item in response.get("Contents",[]):
-        key = item['Key']
+    except Exception as e:
+        print(f"Error reading {key}: {e}")
+        return None
 
-        # skip unsupported file types
-        if not key.endswith((".docx", ".csv")):
-            continue
+def stream_documents_from_s3(documents:Iterable[Any], max_workers:int=None, max_in_flight:int=None) -> Iterator[Tuple[str, str]]:
+    """
+    Downloads and parses documents on a bounded thread pool and yields them as they complete, so callers can
+    process (chunk, embed) early documents while later ones are still downloading.
+
+    At most 'max_in_flight' documents are downloaded or waiting to be consumed at any time, which bounds
+    memory regardless of corpus size. Objects larger than 'aws.s3.max_document_bytes' are skipped.
+
+    Args:
+        - documents (Iterable[dict | str]): Entries from list_documents_in_s3() (their "size" is checked
+          before downloading) or plain S3 keys; may be a lazy iterator.
+        - max_workers (int): Concurrent downloads. Defaults to aws.s3.download_workers.
+        - max_in_flight (int): Documents admitted before waiting for results. Defaults to aws.s3.max_in_flight.
 
-        try:
-            # get file content from S3
-            obj = s3.get_object(Bucket=BUCKET_NAME, Key=key)
-            file_stream = BytesIO(obj['Body'].read())
+    Yields:
+        - Tuple[str, str]: (S3 key, plain text content) in completion order; unreadable documents are skipped.
+    """
 
-            # process .docx files
-            if key.endswith(".docx"):
-                doc = Document(file_stream)
-                text = "\n".join([p.text for p in doc.paragraphs])
+    settings = config["aws"]["s3"]
+    max_workers = max_workers or settings["download_workers"]
+    max_in_flight = max(max_in_flight or settings["max_in_flight"], max_workers)
+    limit = settings["max_document_bytes"]
+
+    def read(key:str) -> Tuple[str, Any]:
+        return key, read_document_from_s3(key)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-download")
+    in_flight = set()
+    try:
+        for doc in documents:
+            key, size = (doc, None) if isinstance(doc, str) else (doc["key"], doc.get("size"))
+            if limit and size is not None and size > limit:
+                print(f"Skipping {key}: {size} bytes exceeds max_document_bytes ({limit})")
+                continue
+
+            in_flight.add(pool.submit(read, key))
+            if len(in_flight) < max_in_flight:
+                continue
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, text = future.result()
+                if text is not None:
+                    yield key, text
+
+        while in_flight: # listing exhausted; drain the remaining downloads
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, text = future.result()
+                if text is not None:
+                    yield key, text
+
+    finally: # also runs when the consumer stops early: queued downloads are dropped
+        pool.shutdown(wait=False, cancel_futures=True)
 
-            # process .csv files
-            elif key.endswith(".csv"):
-                decoded = file_stream.read().decode("utf-8")
-                chunks = convert_csv_to_chunks(decoded)
-                text = "\n".join(chunks)
+def read_all_documents_from_s3(prefix:str="") -> dict:
+    """
+    Reads all .docx and .csv files from an S3 bucket or a specified folder prefix.
+    Prefer stream_documents_from_s3() for large corpora; this keeps every document in memory.
 
-            # add processed content to result
-            result[key] = text
+    Args:
+        - prefix (str): Optional prefix (folder path) in the bucket.
 
-        except Exception as e:
-            print(f"Error reading {key}: {e}")
+    Returns:
+        - dict: A dictionary of {filename (S3 key): plain text content}
+    """
 
-    return result
\ No newline at end of file
+    return dict(stream_documents_from_s3(list_documents_in_s3(prefix))) # paginated listing, concurrent downloads
@@ -6,12 +6,19 @@ Authenticates and interfaces with Gmail's IMAP server for email access.
 """
 
 import os
+import re
+import time
+import queue
 import email
+import base64
+import quopri
 import imaplib
+import threading
 
 from dotenv import load_dotenv
-from typing import Any, List, Dict
+from typing import Any, Dict, Iterator, List
 from utils.utils import load_config
+from utils.metrics import registry, timed
 from email.header import decode_header
 from email.utils import parseaddr, parsedate_to_datetime
 
@@ -22,16 +29,23 @@ config = load_config() # load project configuration
 GMAIL_USER = os.getenv("GMAIL_ADDRESS") if config["flags"]["credentials_from_env"] else "<gmail_addr>"
 GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD") if config["flags"]["credentials_from_env"] else "<gmail_app_passwd>"
 
+# headers kept with every fetched email; they identify newsletters, mailing lists and automated mail
+CLASSIFIER_HEADERS = ("List-Unsubscribe", "List-Id", "Auto-Submitted", "Precedence", "X-Auto-Response-Suppress")
+
 def connect_to_gmail() -> Any:
     """
     Establishes a secure connection to the Gmail IMAP server and logs in
     using credentials from the environment.
 
     Returns:
-        - imaplib.IMAP4_SSL: Autheticated IMAP connection object.
+        - imaplib.IMAP4_SSL: Autheticated IMAP connection object (imaplib.IMAP4 when 'gmail.imap_ssl' is off).
     """
 
-    imap = imaplib.IMAP4_SSL(config["gmail"]["imap_host"])
+    settings = config["gmail"]
+    if settings["imap_ssl"]:
+        imap = imaplib.IMAP4_SSL(settings["imap_host"], settings["imap_port"])
+    else: # plain connection, e.g. to a local test server
+        imap = imaplib.IMAP4(settings["imap_host"], settings["imap_port"])
     imap.login(GMAIL_USER,GMAIL_APP_PASSWORD)
     return imap
 
@@ -56,92 +70,429 @@ def decode_MIME_words(header_value:str) -> str:
         for part, enc in decoded_parts
     )
 
-def fetch_unread_emails() -> Any:
+def supports_idle(imap:Any) -> bool:
     """
-    Fetches unread emails from Gmail inbox, extracts:
-    fron_name, from_email, to, subject, date, time, body
+    Args:
+        - imap (imaplib.IMAP4_SSL): Authenticated IMAP connection.
 
     Returns:
-        - List[Dict[str, str]]: A list of dictionaries, each containing one email's details.
+        - bool: True if the server advertises the IDLE extension (RFC 2177).
     """
 
-    imap=connect_to_gmail()
-    imap.select("inbox") # select the inbox folder
+    return "IDLE" in imap.capabilities
 
-    # search for all unread/unseen messages
-    status, messages = imap.search(None,'(UNSEEN)')
-    email_list = []
+def drain_new_mail_notices(imap:Any) -> bool:
+    """
+    Clears the EXISTS/RECENT responses imaplib has buffered from earlier commands.
 
-    if status != "OK"  or not messages[0]:
-        print("No new emails found.")
-        return []
-    
-    # loop through each unread email
-    for num in messages[0].split():
-        # fetch the full RFC822 message by its ID
-        status, data = imap.fetch(num, "(RFC822)")
-        if status != "OK":
-            print("Failed to fetch email.")
-            continue
-        
-        # parse raw bytes into an email message object
-        msg = email.message_from_bytes(data[0][1])
-
-        # decode the subject line
-        subject = decode_MIME_words(msg["Subject"])
-
-        # parse sender (From:)
-        from_raw = msg.get("From")
-        from_name, from_email = parseaddr(from_raw)
-
-        # parse recipient (To:)
-        to_raw = msg.get("To")
-        to_name, to_email = parseaddr(to_raw) if to_raw else ("","")
-
-        # Parse the date header and format into date/time strings
-        date_header = msg.get("Date")
-        if date_header:
-            dt = parsedate_to_datetime(date_header)
-            date_str = dt.strftime("%Y-%m-%d")
-            time_str = dt.strftime("%H:%M:%S")
+    Args:
+        - imap (imaplib.IMAP4_SSL): Authenticated IMAP connection with a mailbox selected.
+
+    Returns:
+        - bool: True if one of them reported mail (a "0 RECENT" does not count).
+    """
+
+    exists = imap.response("EXISTS")[1]
+    recent = imap.response("RECENT")[1]
+    return exists != [None] or any(count not in (None, b"0") for count in recent)
+
+def idle_tag(imap:Any) -> bytes:
+    """
+    Returns:
+        - bytes: Tag for a hand-written IDLE command.
+    """
+
+    # imaplib has no IDLE command (before Python 3.14); the tag must still come from the connection's own
+    # counter so it never collides with a regular command, and that counter is only exposed privately
+    return imap._new_tag()
+
+def wait_for_new_mail(imap:Any, timeout:float, stop_event:threading.Event=None) -> bool:
+    """
+    Puts the selected mailbox into IMAP IDLE and blocks until the server reports new mail,
+    'timeout' seconds pass, or 'stop_event' is set.
+
+    While idling, a helper thread is the only reader of the connection; this thread only writes
+    (the final DONE), so buffered reads never race with the wait. Mail reported by the commands since
+    the last SELECT (the server may announce it with any response) ends the wait before IDLE is sent.
+
+    Args:
+        - imap (imaplib.IMAP4_SSL): Authenticated IMAP connection with a mailbox selected.
+        - timeout (float): Maximum seconds to idle; servers drop idle clients after ~30 minutes.
+        - stop_event (threading.Event): Optional event that ends the wait early (shutdown).
+
+    Returns:
+        - bool: True if new mail arrived (EXISTS/RECENT), False on timeout or stop.
+    """
+
+    if drain_new_mail_notices(imap): # arrived between the last SEARCH/FETCH and now
+        return True
+
+    tag = idle_tag(imap)
+    imap.send(tag + b" IDLE\r\n")
+
+    response = imap.readline()
+    if not response.startswith(b"+"): # server refused to idle
+        raise imaplib.IMAP4.error(f"IDLE rejected: {response!r}")
+
+    lines = queue.Queue()
+
+    def reader() -> None:
+        while True:
+            line = imap.readline()
+            lines.put(line)
+            if not line or line.startswith(tag): # connection closed, or tagged completion after DONE
+                return
+
+    thread = threading.Thread(target=reader, name="imap-idle", daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + timeout
+    new_mail = False
+
+    try:
+        while time.monotonic() < deadline and not (stop_event and stop_event.is_set()):
+            try:
+                line = lines.get(timeout=min(1.0, max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                continue
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while idling")
+            if line.rstrip().endswith((b"EXISTS", b"RECENT")): # e.g. "* 12 EXISTS"
+                new_mail = True
+                break
+    finally:
+        imap.send(b"DONE\r\n") # leave IDLE; the server answers with the tagged completion
+
+    while True: # the reader thread ends with the tagged completion of IDLE
+        try:
+            line = lines.get(timeout=30)
+        except queue.Empty:
+            raise imaplib.IMAP4.abort("no response to IDLE DONE")
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed while leaving IDLE")
+        if line.startswith(tag):
+            if not line.startswith(tag + b" OK"):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+            break
+        if line.rstrip().endswith((b"EXISTS", b"RECENT")):
+            new_mail = True
+
+    return new_mail
+
+def compress_uids(uids:List[int]) -> str:
+    """
+    Renders UIDs as a compact IMAP sequence set, e.g. [1, 2, 3, 7, 9, 10] -> "1:3,7,9:10".
+
+    Args:
+        - uids (List[int]): UIDs to include.
+
+    Returns:
+        - str: IMAP sequence set.
+    """
+
+    ranges = []
+    for uid in sorted(set(uids)):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
         else:
-            date_str, time_str = "", ""
-
-        # initialize email body
-        body = ""
-
-        # if the mail has multiple parts (e.g. plain text and HTML)
-        if msg.is_multipart():
-            # walk through the email parts and find plain text
-            for part in msg.walk():
-                # look for the plain text version
-                if part.get_content_type() == "text/plain" and not part.get("Content-Disposition"):
-                    charset = part.get_content_charset() or "utf-8"
-                    body = part.get_payload(decode=True).decode(charset,errors="ignore")
-                    break
+            ranges.append([uid, uid])
+
+    return ",".join(str(low) if low == high else f"{low}:{high}" for low, high in ranges)
+
+IMAP_TOKEN = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|\x00\d+\x00|[^\s()"\x00]+')
+
+def parse_fetch_response(data:list) -> List[dict]:
+    """
+    Parses the data returned by imaplib for a FETCH command into one dictionary per message.
+
+    imaplib hands back a list mixing (prefix, literal) tuples and plain bytes; the literals are swapped
+    for placeholders, the remaining text is tokenized as IMAP s-expressions, and placeholders are
+    replaced by the literal bytes again.
+
+    Args:
+        - data (list): Second element of imap.uid("FETCH", ...).
+
+    Returns:
+        - List[dict]: {item name (e.g. "UID", "BODYSTRUCTURE", "BODY[HEADER]"): value}; lists for
+          parenthesized values, bytes for strings and literals, str for atoms, None for NIL.
+    """
+
+    text, literals = bytearray(), []
+    for item in data:
+        if isinstance(item, tuple):
+            prefix, literal = item
+            text += re.sub(rb"\{\d+\}$", b"", prefix) + b"\x00" + str(len(literals)).encode() + b"\x00"
+            literals.append(literal)
+        elif item:
+            text += item
+        text += b" "
+
+    def convert(token:bytes) -> Any:
+        if token.startswith(b"\x00"):
+            return literals[int(token.strip(b"\x00"))]
+        if token.startswith(b'"'):
+            return re.sub(rb"\\(.)", rb"\1", token[1:-1])
+        if token.upper() == b"NIL":
+            return None
+        return token.decode("utf-8", errors="replace")
+
+    # build nested lists from the token stream
+    stack = [[]]
+    for token in IMAP_TOKEN.findall(bytes(text)):
+        if token == b"(":
+            stack.append([])
+        elif token == b")":
+            if len(stack) > 1:
+                closed = stack.pop()
+                stack[-1].append(closed)
         else:
-            # if email has only one single part plain text
-            body = msg.get_payload(decode=True).decode("utf-8", errors="ignore")
-
-        # get message id
-        email_msg_id = msg.get("Message-ID")
-
-        # append the extracted details to the list
-        email_list.append({
-            "email_msg_id": email_msg_id,
-            "from_name": from_name,
-            "from_email": from_email,
-            "to": to_email,
-            "date": date_str,
-            "time": time_str,
-            "subject": subject,
-            "body": body.strip()
-        })
-
-        # mark the email as read (seen)
-        imap.store(num, "+FLAGS","\\Seen")
-
-    # close the connection
-    imap.logout()
-    
-    return email_list
+            stack[-1].append(convert(token))
+
+    # top level is: <seq> (<name> <value> <name> <value> ...) <seq> (...) ...
+    messages = []
+    for element in stack[0]:
+        if isinstance(element, list):
+            messages.append({str(element[i]).upper(): element[i + 1] for i in range(0, len(element) - 1, 2)})
+
+    return messages
+
+def describe_part(structure:list) -> dict:
+    """
+    Reads the fields MailMind needs from a single-part BODYSTRUCTURE entry.
+
+    Args:
+        - structure (list): Parsed BODYSTRUCTURE of one non-multipart part.
+
+    Returns:
+        - dict: {"type", "charset", "encoding", "disposition"}; type is e.g. "text/plain".
+    """
+
+    def text(value:Any) -> str:
+        return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else (value or "")
+
+    params = structure[2] or []
+    charset = next((text(params[i + 1]) for i in range(0, len(params) - 1, 2) if text(params[i]).lower() == "charset"), None)
+    maintype = text(structure[0]).lower()
+
+    return {
+        "type": f"{maintype}/{text(structure[1]).lower()}",
+        "charset": charset,
+        "encoding": text(structure[5]).lower(),
+        "disposition": structure[9] if maintype == "text" and len(structure) > 9 else None # extension data, if the server sent it
+    }
+
+def find_text_part(structure:list, section:str="") -> Any:
+    """
+    Finds the first inline text/plain part in a multipart BODYSTRUCTURE, in the same order as Message.walk().
+
+    Args:
+        - structure (list): Parsed BODYSTRUCTURE.
+        - section (str): IMAP section number of 'structure' ("" for the message itself).
+
+    Returns:
+        - Tuple[str, str, str] | None: (section, charset, transfer encoding), or None if there is none.
+    """
+
+    if structure and isinstance(structure[0], list): # multipart: child parts first, then the subtype
+        for i, child in enumerate(part for part in structure if isinstance(part, list)):
+            found = find_text_part(child, f"{section}.{i + 1}" if section else str(i + 1))
+            if found:
+                return found
+        return None
+
+    part = describe_part(structure)
+    if part["type"] == "text/plain" and not part["disposition"]: # attachments carry a disposition
+        return (section or "1", part["charset"], part["encoding"])
+    return None
+
+def decode_part(payload:bytes, encoding:str, charset:str) -> str:
+    """
+    Decodes a fetched body part according to its Content-Transfer-Encoding and charset.
+
+    Args:
+        - payload (bytes): Raw part content as stored on the server.
+        - encoding (str): Transfer encoding ("base64", "quoted-printable", "7bit", ...).
+        - charset (str): Character set of the decoded bytes; utf-8 when unknown.
+
+    Returns:
+        - str: Decoded text.
+    """
+
+    if encoding == "base64":
+        payload = base64.b64decode(payload + b"===", validate=False) # tolerate missing padding
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(payload)
+
+    try:
+        return payload.decode(charset or "utf-8", errors="ignore")
+    except LookupError: # unknown charset name
+        return payload.decode("utf-8", errors="ignore")
+
+def parse_headers(msg:Any) -> dict:
+    """
+    Extracts sender, recipient, subject, date/time and Message-ID from parsed email headers, plus the
+    headers that mark automated or bulk mail (used by the local pre-classifier).
+
+    Args:
+        - msg (email.message.Message): Parsed message (headers only is enough).
+
+    Returns:
+        - Dict[str, str]: Email fields without the body.
+    """
+
+    # decode the subject line
+    subject = decode_MIME_words(msg["Subject"])
+
+    # parse sender (From:)
+    from_raw = msg.get("From")
+    from_name, from_email = parseaddr(from_raw)
+
+    # parse recipient (To:)
+    to_raw = msg.get("To")
+    to_name, to_email = parseaddr(to_raw) if to_raw else ("","")
+
+    # Parse the date header and format into date/time strings
+    date_str, time_str = "", ""
+    date_header = msg.get("Date")
+    if date_header:
+        try:
+            dt = parsedate_to_datetime(str(date_header))
+            date_str = dt.strftime("%Y-%m-%d")
+            time_str = dt.strftime("%H:%M:%S")
+        except (TypeError, ValueError, IndexError, OverflowError): # malformed Date header; the email is still processed
+            print(f"Unparseable Date header {str(date_header)!r}")
+
+    return {
+        "email_msg_id": msg.get("Message-ID"), # get message id
+        "from_name": from_name,
+        "from_email": from_email,
+        "to": to_email,
+        "date": date_str,
+        "time": time_str,
+        "subject": subject,
+        "headers": {name: str(msg[name]) for name in CLASSIFIER_HEADERS if msg[name] is not None}
+    }
+
+def iter_unread_emails(imap:Any=None, batch_size:int=None) -> Iterator[Dict[str, str]]:
+    """
+    Streams unread emails from the Gmail inbox, batch by batch.
+
+    For every batch of UIDs, one FETCH retrieves headers and BODYSTRUCTURE without marking anything as
+    read, one FETCH per distinct part number retrieves only the text/plain part (attachments are never
+    downloaded), and one STORE marks the emails of the batch that were handed to the caller as seen. Emails are
+    yielded as soon as their batch is parsed, so memory stays flat and round trips grow with the number of
+    batches, not of messages. Emails that could not be parsed, or that the caller never took (it stopped
+    early), stay unread.
+
+    Args:
+        - imap (imaplib.IMAP4_SSL): Optional existing connection to reuse (left open); otherwise a new
+          connection is opened and closed when the generator finishes.
+        - batch_size (int): UIDs per batch. Defaults to 'email.fetch_batch_size'.
+
+    Yields:
+        - Dict[str, str]: One email's details (same fields as fetch_unread_emails()).
+    """
+
+    batch_size = batch_size or config["email"]["fetch_batch_size"]
+    owns_connection = imap is None
+    if owns_connection:
+        imap = connect_to_gmail()
+
+    try:
+        imap.select("inbox") # select the inbox folder
+        drain_new_mail_notices(imap) # the counts reported by SELECT itself are not new mail
+
+        # search for all unread/unseen messages
+        with timed("imap_search"):
+            status, messages = imap.uid("SEARCH", None, "(UNSEEN)")
+        if status != "OK" or not messages[0]:
+            print("No new emails found.")
+            return
+
+        uids = [int(uid) for uid in messages[0].split()]
+
+        for start in range(0, len(uids), batch_size):
+            uid_set = compress_uids(uids[start:start + batch_size])
+            fetch_start = time.perf_counter()
+
+            # 1st round trip: headers and MIME structure; PEEK leaves the \Seen flag alone
+            status, data = imap.uid("FETCH", uid_set, "(UID BODY.PEEK[HEADER] BODYSTRUCTURE)")
+            if status != "OK":
+                print("Failed to fetch emails.")
+                continue
+
+            headers, text_parts = {}, {} # uid -> parsed headers, uid -> (section, charset, encoding)
+            for item in parse_fetch_response(data):
+                if "UID" not in item or "BODY[HEADER]" not in item:
+                    continue
+                uid = int(item["UID"])
+                headers[uid] = email.message_from_bytes(item["BODY[HEADER]"])
+                structure = item.get("BODYSTRUCTURE") or []
+                if structure and isinstance(structure[0], list):
+                    text_parts[uid] = find_text_part(structure)
+                elif structure: # single-part message: its body is section 1, whatever its type
+                    part = describe_part(structure)
+                    text_parts[uid] = ("1", part["charset"], part["encoding"])
+
+            # 2nd round trip(s): only the text parts, grouped by part number (usually just "1" and "1.1")
+            bodies, by_section = {}, {}
+            for uid, part in text_parts.items():
+                if part:
+                    by_section.setdefault(part[0], []).append(uid)
+
+            for section, section_uids in by_section.items():
+                status, data = imap.uid("FETCH", compress_uids(section_uids), f"(UID BODY.PEEK[{section}])")
+                if status != "OK":
+                    continue
+                for item in parse_fetch_response(data):
+                    uid = int(item.get("UID", 0))
+                    payload = item.get(f"BODY[{section}]")
+                    if uid in text_parts and isinstance(payload, bytes):
+                        _, charset, encoding = text_parts[uid]
+                        bodies[uid] = decode_part(payload, encoding, charset)
+
+            registry.observe("mailmind_operation_seconds", time.perf_counter() - fetch_start, operation="imap_fetch") # both fetch round trips
+
+            mails = []
+            for uid, msg in headers.items():
+                try:
+                    mail = parse_headers(msg)
+                except Exception as e: # one broken message must not stop the batch; it stays unread
+                    print(f"Skipping email with UID {uid}: {e}")
+                    continue
+                mail["body"] = bodies.get(uid, "").strip()
+                mails.append((uid, mail))
+
+            handed_over = []
+            try:
+                for uid, mail in mails:
+                    handed_over.append(uid)
+                    yield mail
+            finally:
+                # 3rd round trip: flag the emails the caller received, once per batch
+                if config["email"]["mark_as_read"] and handed_over:
+                    try:
+                        imap.uid("STORE", compress_uids(handed_over), "+FLAGS.SILENT", "(\\Seen)")
+                    except (imaplib.IMAP4.error, OSError) as e: # connection lost; the caller sees the error on its next command
+                        print(f"Failed to mark {len(handed_over)} emails as read: {e}")
+
+    finally:
+        if owns_connection: # close the connection
+            imap.logout()
+
+def fetch_unread_emails(imap:Any=None) -> Any:
+    """
+    Fetches unread emails from Gmail inbox, extracts:
+    fron_name, from_email, to, subject, date, time, body
+
+    Prefer iter_unread_emails() for large inboxes; this collects its output into a list.
+
+    Args:
+        - imap (imaplib.IMAP4_SSL): Optional existing connection to reuse (e.g. the daemon's session);
+          it is left open. If omitted, a new connection is opened and closed.
+
+    Returns:
+        - List[Dict[str, str]]: A list of dictionaries, each containing one email's details.
+    """
+
+    return list(iter_unread_emails(imap))
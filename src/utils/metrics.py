@@ -0,0 +1,365 @@
+"""
+author: Yagnik Poshiya
+github: @yagnikposhiya
+
+Lightweight instrumentation for the whole pipeline, without third-party dependencies.
+
+- Counters, gauges and latency histograms kept in-process and exported in the Prometheus text format on a
+  local HTTP endpoint (GET /metrics), started by the daemon when 'metrics.enabled' is set.
+- Structured JSON log events (one object per line in 'path.metrics.log_file', rotated by size), each carrying
+  the trace id of the email being processed, so every stage and LLM call of one email can be followed.
+- Provider (token, cost, latency), cache and pre-classifier figures are read from the modules that own them
+  at scrape time; modules that have not been loaded are skipped rather than imported.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Iterator, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.utils import load_config
+
+config = load_config() # load project configuration
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # seconds
+
+# metric name -> (type, help); every exported family is declared here
+DEFINITIONS = {
+    "mailmind_emails_total": ("counter", "Emails processed, by outcome."),
+    "mailmind_email_seconds": ("histogram", "End-to-end processing time of one email."),
+    "mailmind_stage_seconds": ("histogram", "Time spent in a pipeline stage (excluding waits for a free slot)."),
+    "mailmind_stage_errors_total": ("counter", "Exceptions raised by a pipeline stage, by error type."),
+    "mailmind_stage_waiting": ("gauge", "Calls waiting for a free slot of a stage (queue depth)."),
+    "mailmind_stage_in_flight": ("gauge", "Calls currently running in a stage."),
+    "mailmind_pipeline_pending": ("gauge", "Emails admitted into the pipeline and not finished yet."),
+    "mailmind_operation_seconds": ("histogram", "Time spent in an instrumented operation (IMAP fetch, query embedding, FAISS/BM25 search, ...)."),
+    "mailmind_operation_errors_total": ("counter", "Exceptions raised by an instrumented operation, by error type."),
+    "mailmind_llm_requests_total": ("counter", "LLM API requests, by provider, kind and model."),
+    "mailmind_llm_errors_total": ("counter", "LLM API requests that failed after retries."),
+    "mailmind_llm_retries_total": ("counter", "LLM API request retries."),
+    "mailmind_llm_hedges_total": ("counter", "Duplicate (hedged) LLM API requests sent for slow requests."),
+    "mailmind_llm_tokens_total": ("counter", "LLM tokens used, by type (prompt or completion)."),
+    "mailmind_llm_cost_usd_total": ("counter", "Estimated LLM spend in USD, from metrics.llm_prices."),
+    "mailmind_llm_request_seconds": ("gauge", "LLM API request latency percentile over the recent window of requests."),
+    "mailmind_cache_hits_total": ("counter", "Cache lookups answered from the cache."),
+    "mailmind_cache_misses_total": ("counter", "Cache lookups not answered from the cache."),
+    "mailmind_cache_hit_ratio": ("gauge", "Share of cache lookups answered from the cache since start."),
+    "mailmind_cache_entries": ("gauge", "Entries currently held by a cache."),
+    "mailmind_pre_classifier_total": ("counter", "Pre-classifier decisions, by outcome."),
+}
+
+class Registry:
+    """
+    Thread-safe store of metric samples keyed by (name, sorted labels).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values = {} # (name, labels) -> float, for counters and gauges
+        self._histograms = {} # (name, labels) -> [bucket counts..., sum, count]
+        self._collectors = [] # callables yielding (name, labels, value) at render time
+
+    def inc(self, name:str, value:float=1.0, **labels) -> None:
+        """
+        Adds to a counter, or to a gauge (value may be negative).
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name:str, value:float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = float(value)
+
+    def observe(self, name:str, seconds:float, **labels) -> None:
+        """
+        Records one observation in a latency histogram (buckets: LATENCY_BUCKETS).
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            position = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+            if position < len(LATENCY_BUCKETS):
+                histogram[position] += 1 # cumulated when rendered
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def add_collector(self, collector:Callable[[], Iterator[Tuple[str, dict, float]]]) -> None:
+        """
+        Args:
+            - collector (Callable): Called on every render; yields (metric name, labels, value) samples.
+        """
+
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Returns:
+            - str: All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+
+        with self._lock:
+            samples = {}
+            for (name, labels), value in self._values.items():
+                samples.setdefault(name, []).append((name, dict(labels), value))
+            for (name, labels), histogram in self._histograms.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    cumulative += count
+                    samples.setdefault(name, []).append((name + "_bucket", {**dict(labels), "le": repr(bound)}, cumulative))
+                samples[name].append((name + "_bucket", {**dict(labels), "le": "+Inf"}, histogram[-1]))
+                samples[name].append((name + "_sum", dict(labels), histogram[-2]))
+                samples[name].append((name + "_count", dict(labels), histogram[-1]))
+            collectors = list(self._collectors)
+
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    samples.setdefault(name, []).append((name, labels, value))
+            except Exception as e: # a broken collector must not take the endpoint down
+                print(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+        lines = []
+        for name in sorted(samples):
+            kind, description = DEFINITIONS.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples[name]:
+                rendered = ",".join(f'{key}="{escape(text)}"' for key, text in sorted(labels.items()))
+                lines.append(f"{sample}{{{rendered}}} {float(value)!r}" if rendered else f"{sample} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+def escape(value:Any) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+registry = Registry() # process-wide registry
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_logger = None
+_logger_lock = threading.Lock()
+
+def current_trace_id() -> Any:
+    """
+    Returns:
+        - str | None: Trace id of the email processed by the current thread, if any.
+    """
+
+    return _trace_id.get()
+
+@contextmanager
+def trace(trace_id:str=None) -> Iterator[str]:
+    """
+    Binds a trace id to everything logged by the current thread inside the block.
+
+    Args:
+        - trace_id (str): Id to use; a new random one by default.
+
+    Yields:
+        - str: The trace id.
+    """
+
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    try:
+        yield _trace_id.get()
+    finally:
+        _trace_id.reset(token)
+
+def event_logger() -> Any:
+    """
+    Returns:
+        - logging.Logger | None: Logger writing one JSON object per line, or None when JSON logs are disabled.
+    """
+
+    global _logger
+
+    if not config["metrics"]["json_logs"]:
+        return None
+
+    with _logger_lock:
+        if _logger is None:
+            path = config["path"]["metrics"]["log_file"]
+            if path:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                handler = RotatingFileHandler(path, maxBytes=config["metrics"]["log_max_bytes"], backupCount=config["metrics"]["log_backups"], encoding="utf-8")
+            else:
+                handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger = logging.getLogger("mailmind.events")
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            _logger.addHandler(handler)
+        return _logger
+
+def log_event(event:str, **fields) -> None:
+    """
+    Writes a structured log event with a timestamp and the current trace id.
+
+    Args:
+        - event (str): Event name, e.g. "stage" or "llm_call".
+        - **fields: JSON-serializable details.
+    """
+
+    logger = event_logger()
+    if logger is not None:
+        record = {"ts": round(time.time(), 3), "event": event, "trace_id": current_trace_id(), **fields}
+        logger.info(json.dumps(record, default=str, ensure_ascii=False))
+
+@contextmanager
+def _timed(metric:str, errors:str, label:str, name:str) -> Iterator[None]:
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = type(e).__name__
+        registry.inc(errors, **{label: name, "error": status})
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe(metric, seconds, **{label: name})
+        log_event(label, **{label: name, "seconds": round(seconds, 6), "status": status})
+
+def stage_timer(stage:str) -> Any:
+    """
+    Times one pipeline stage call and counts its errors by type.
+
+    Args:
+        - stage (str): Stage name (see pipeline.email_pipeline.STAGES).
+    """
+
+    return _timed("mailmind_stage_seconds", "mailmind_stage_errors_total", "stage", stage)
+
+def timed(operation:str) -> Any:
+    """
+    Times an operation inside a stage (IMAP fetch, query embedding, FAISS search, ...) and counts its errors.
+
+    Args:
+        - operation (str): Operation name.
+    """
+
+    return _timed("mailmind_operation_seconds", "mailmind_operation_errors_total", "operation", operation)
+
+def llm_cost(model:str, prompt_tokens:int, completion_tokens:int) -> float:
+    """
+    Args:
+        - model (str): Model name as sent to the API.
+        - prompt_tokens (int): Prompt (input) tokens.
+        - completion_tokens (int): Completion (output) tokens.
+
+    Returns:
+        - float: Estimated cost in USD from 'metrics.llm_prices' (USD per million tokens); 0 for unlisted models.
+    """
+
+    prices = config["metrics"]["llm_prices"].get(model)
+    if not prices:
+        return 0.0
+    return (prompt_tokens * prices.get("prompt", 0.0) + completion_tokens * prices.get("completion", 0.0)) / 1e6
+
+def collect_components() -> Iterator[Tuple[str, dict, float]]:
+    """
+    Yields provider, cache and pre-classifier samples from the modules that are already loaded.
+    """
+
+    provider = sys.modules.get("llm.provider")
+    if provider is not None:
+        for name, models in provider.provider_metrics().items():
+            for key, snapshot in models.items():
+                kind, model = key.split(":", 1)
+                labels = {"provider": name, "kind": kind, "model": model}
+                yield "mailmind_llm_requests_total", labels, snapshot["calls"]
+                yield "mailmind_llm_errors_total", labels, snapshot["errors"]
+                yield "mailmind_llm_retries_total", labels, snapshot["retries"]
+                yield "mailmind_llm_hedges_total", labels, snapshot["hedges"]
+                yield "mailmind_llm_tokens_total", {**labels, "type": "prompt"}, snapshot["prompt_tokens"]
+                yield "mailmind_llm_tokens_total", {**labels, "type": "completion"}, snapshot["completion_tokens"]
+                yield "mailmind_llm_cost_usd_total", labels, llm_cost(model, snapshot["prompt_tokens"], snapshot["completion_tokens"])
+                for quantile in (50, 95, 99):
+                    yield "mailmind_llm_request_seconds", {**labels, "quantile": str(quantile / 100)}, snapshot[f"latency_p{quantile}"]
+
+    caches = []
+    module = sys.modules.get("llm.response_cache")
+    if module is not None and module._cache is not None:
+        caches.append(({"cache": "llm_response"}, module._cache))
+    module = sys.modules.get("llm.reply_cache")
+    if module is not None and module._cache is not None:
+        caches.append(({"cache": "reply"}, module._cache))
+    module = sys.modules.get("rag.embedding_cache")
+    if module is not None:
+        caches.extend(({"cache": "embedding", "model": cache.model}, cache) for cache in list(module._caches.values()))
+
+    for labels, cache in caches:
+        stats = cache.stats()
+        yield "mailmind_cache_hits_total", labels, stats["hits"]
+        yield "mailmind_cache_misses_total", labels, stats["misses"]
+        yield "mailmind_cache_hit_ratio", labels, stats["hit_rate"]
+        yield "mailmind_cache_entries", labels, stats["entries"]
+
+    module = sys.modules.get("llm.pre_classifier")
+    if module is not None and module._classifier is not None:
+        stats = module._classifier.stats()
+        for outcome in ("rule_skips", "model_skips", "escalated", "audited", "agreed"):
+            yield "mailmind_pre_classifier_total", {"outcome": outcome}, stats[outcome]
+
+registry.add_collector(collect_components)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /metrics (Prometheus text) and GET /healthz.
+    """
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/healthz":
+            body, content_type = b"ok\n", "text/plain"
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format:str, *args) -> None:
+        pass # scrapes every few seconds would flood the console
+
+def start_metrics_server(host:str=None, port:int=None) -> ThreadingHTTPServer:
+    """
+    Starts the metrics endpoint on a background thread.
+
+    Args:
+        - host (str): Interface to listen on. Defaults to metrics.host.
+        - port (int): Port to listen on (0 picks a free one). Defaults to metrics.port.
+
+    Returns:
+        - ThreadingHTTPServer: Running server; call shutdown() to stop it.
+    """
+
+    host = host or config["metrics"]["host"]
+    port = config["metrics"]["port"] if port is None else port
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mailmind-metrics", daemon=True).start()
+    return server
@@ -4,25 +4,271 @@ github: @yagnikposhiya
 
 Sends a reply email to a customer using Gmail's SMTP server.
 Ensures the email appears in the same thread as the original message by setting proper headers.
+
+Replies go through a small pool of authenticated SMTP sessions that are reused across messages,
+so the TLS handshake and login are paid once per connection instead of once per reply.
 """
 
 import os
+import time
+import queue
+import atexit
 import smtplib
+import threading
 
+from typing import Any, List
 from utils.utils import load_config
 from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
 
 config = load_config() # load project configuration
 
-def send_email_reply(to_address, subject, body, original_msg_id) -> None:
+def is_stale_session(error:Exception) -> bool:
     """
-    Sends a reply email using Gmail SMTP, referencing original message for threading.
+    Tells a dropped or expiring session apart from a rejected message.
+
+    Args:
+        - error (Exception): Exception raised while sending.
+
+    Returns:
+        - bool: True if the session is unusable and the message may be sent again on a new one
+          (disconnect, 421 "service not available", socket error); False for rejections such as
+          SMTPRecipientsRefused, SMTPDataError or any 5xx, which a new session would only repeat.
+    """
+
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException) # SMTPException subclasses OSError
+
+class SMTPSender:
+    """
+    Pool of reusable, authenticated SMTP connections.
+    """
+
+    def __init__(self, host:str, port:int, use_ssl:bool, username:str, password:str, pool_size:int=None,
+                 noop_after:float=None, max_idle:float=None, max_messages_per_connection:int=None) -> None:
+        """
+        Args:
+            - host (str): SMTP server host.
+            - port (int): SMTP server port.
+            - use_ssl (bool): Use implicit TLS (SMTP_SSL) instead of plain SMTP.
+            - username (str): Login user; no login when empty.
+            - password (str): Login password (Gmail app password).
+            - pool_size (int): Maximum number of open connections. Defaults to smtp_pool.size.
+            - noop_after (float): Idle seconds after which a connection is verified with NOOP before reuse.
+            - max_idle (float): Idle seconds after which a connection is closed instead of reused.
+            - max_messages_per_connection (int): Messages sent on one session before it is recycled.
+        """
+
+        settings = config["smtp_pool"]
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.pool_size = pool_size or settings["size"]
+        self.noop_after = settings["noop_after"] if noop_after is None else noop_after
+        self.max_idle = settings["max_idle"] if max_idle is None else max_idle
+        self.max_messages = max_messages_per_connection or settings["max_messages_per_connection"]
+
+        self._idle = queue.LifoQueue() # (connection, last used, messages sent); most recently used first
+        self._slots = threading.BoundedSemaphore(self.pool_size) # caps open connections
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        """
+        Opens and authenticates a new SMTP session.
+        """
+
+        smtp = smtplib.SMTP_SSL(self.host, self.port) if self.use_ssl else smtplib.SMTP(self.host, self.port)
+        if self.username:
+            smtp.login(self.username, self.password) # authenticate with app password
+        self.connections_opened += 1
+        return smtp
+
+    @staticmethod
+    def _close(smtp:smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close() # server already gone
+
+    def _acquire(self) -> List:
+        """
+        Takes a healthy connection from the pool, or opens one. Blocks while all slots are in use.
+
+        Returns:
+            - List: [connection, last used (monotonic seconds), messages sent on it]
+        """
+
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    entry = self._idle.get_nowait()
+                except queue.Empty:
+                    return [self._connect(), time.monotonic(), 0]
+
+                smtp, last_used, sent = entry
+                idle_for = time.monotonic() - last_used
+                if idle_for > self.max_idle:
+                    self._close(smtp)
+                    continue
+                if idle_for > self.noop_after: # detect sessions the server dropped silently
+                    try:
+                        if smtp.noop()[0] != 250:
+                            raise smtplib.SMTPServerDisconnected("NOOP failed")
+                    except (smtplib.SMTPException, OSError):
+                        self._close(smtp)
+                        continue
+                return list(entry)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, entry:List, healthy:bool=True) -> None:
+        """
+        Returns a connection to the pool (or closes it if broken or used up) and frees its slot.
+        """
+
+        smtp, _, sent = entry
+        if healthy and sent < self.max_messages:
+            self._idle.put((smtp, time.monotonic(), sent))
+        else:
+            self._close(smtp)
+        self._slots.release()
+
+    def _send_on(self, entry:List, msg:EmailMessage) -> None:
+        """
+        Sends one message on a pooled connection; a stale session is replaced and the send retried once.
+        """
+
+        try:
+            entry[0].send_message(msg)
+        except OSError as e:
+            if not is_stale_session(e): # a real rejection: the session is fine, the message is not
+                raise
+            self._close(entry[0])
+            entry[0], entry[2] = self._connect(), 0
+            entry[0].send_message(msg)
+        entry[2] += 1
+
+    def send(self, msg:EmailMessage) -> None:
+        """
+        Sends a single message over a pooled connection.
+
+        Args:
+            - msg (EmailMessage): Fully composed message.
+        """
+
+        entry = self._acquire()
+        healthy = False
+        try:
+            self._send_on(entry, msg)
+            healthy = True
+        except OSError as e:
+            healthy = not is_stale_session(e) # smtplib resets a session after a rejection, so it can be reused
+            raise
+        finally:
+            self._release(entry, healthy)
+
+    def send_many(self, messages:List[EmailMessage]) -> List[Any]:
+        """
+        Sends many messages, spreading them over up to 'pool_size' sessions that each send a run of
+        messages back to back. One failing message does not stop the others.
+
+        Args:
+            - messages (List[EmailMessage]): Fully composed messages.
+
+        Returns:
+            - List[Exception | None]: Per message, None if sent or the exception that prevented it.
+        """
+
+        results = [None] * len(messages)
+        lanes = min(self.pool_size, len(messages))
+
+        def send_lane(lane:int) -> None:
+            positions = range(lane, len(messages), lanes)
+            try:
+                entry = self._acquire()
+            except (smtplib.SMTPException, OSError) as e: # no session for this lane: none of its messages is sent
+                for i in positions:
+                    results[i] = e
+                return
+
+            healthy = True
+            try:
+                for n, i in enumerate(positions):
+                    if not healthy or entry[2] >= self.max_messages: # stale or used-up session: get a fresh one
+                        healthy = False # the closed session must not go back to the pool if reconnecting fails
+                        self._close(entry[0])
+                        try:
+                            entry[0], entry[2] = self._connect(), 0
+                        except (smtplib.SMTPException, OSError) as e: # report it for the rest of the lane and stop
+                            for j in positions[n:]:
+                                results[j] = e
+                            return
+                        healthy = True
+                    try:
+                        self._send_on(entry, messages[i])
+                    except (smtplib.SMTPException, OSError) as e:
+                        results[i] = e
+                        healthy = not is_stale_session(e)
+            finally:
+                self._release(entry, healthy)
+
+        if lanes:
+            with ThreadPoolExecutor(max_workers=lanes) as pool:
+                list(pool.map(send_lane, range(lanes)))
+
+        return results
+
+    def close(self) -> None:
+        """
+        Closes all idle pooled connections.
+        """
+
+        while True:
+            try:
+                smtp, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(smtp)
+
+_sender = None
+_sender_lock = threading.Lock()
+
+def get_sender() -> SMTPSender:
+    """
+    Returns the process-wide SMTP sender configured for Gmail, creating it on first use.
+
+    Returns:
+        - SMTPSender: Shared connection pool.
+    """
+
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            from_address = os.getenv("GMAIL_ADDRESS") if config["flags"]["credentials_from_env"] else "<gmail_address>"
+            password = os.getenv("GMAIL_APP_PASSWORD") if config["flags"]["credentials_from_env"] else "<gmail_passwd>"
+            _sender = SMTPSender(config["gmail"]["smtp_host"], config["gmail"]["smtp_port"], config["gmail"]["smtp_ssl"], from_address, password)
+            atexit.register(_sender.close) # say QUIT politely on exit
+        return _sender
+
+def build_reply(to_address, subject, body, original_msg_id) -> EmailMessage:
+    """
+    Composes a reply email that threads under the original message.
 
     Args:
         - to_address (str): Customer's email address
         - subject (str): Subject for the reply (same as original or prefixed with "Re:")
         - body (str): Generated email content
         - orignal_msg_id (str): Message-ID of the original customer email (for threading)
+
+    Returns:
+        - EmailMessage: Message ready to send.
     """
 
     # get sender address
@@ -47,7 +293,31 @@ def send_email_reply(to_address, subject, body, original_msg_id) -> None:
     # set the plain-text content of the email
     msg.set_content(body)
 
-    # connect securely to Gmail SMTP server and send the message
-    with smtplib.SMTP_SSL(config["gmail"]["smtp_host"], 465) as smtp:
-        smtp.login(from_address, os.getenv("GMAIL_APP_PASSWORD") if config["flags"]["credentials_from_env"] else "<gmail_passwd>") # authenticate with app password
-        smtp.send_message(msg) # send the composed email
+    return msg
+
+def send_email_reply(to_address, subject, body, original_msg_id) -> None:
+    """
+    Sends a reply email using Gmail SMTP, referencing original message for threading.
+
+    Args:
+        - to_address (str): Customer's email address
+        - subject (str): Subject for the reply (same as original or prefixed with "Re:")
+        - body (str): Generated email content
+        - orignal_msg_id (str): Message-ID of the original customer email (for threading)
+    """
+
+    # send over a pooled, already authenticated Gmail SMTP session
+    get_sender().send(build_reply(to_address, subject, body, original_msg_id))
+
+def send_many_replies(replies:List[tuple]) -> List[Any]:
+    """
+    Sends several replies over the pooled SMTP sessions.
+
+    Args:
+        - replies (List[tuple]): (to_address, subject, body, original_msg_id) per reply.
+
+    Returns:
+        - List[Exception | None]: Per reply, None if sent or the exception that prevented it.
+    """
+
+    return get_sender().send_many([build_reply(*reply) for reply in replies])
@@ -5,15 +5,24 @@ github: @yagnikposhiya
 General-purpose utility functions for the MailMind project.
 """
 
+import os
+import re
+import ast
+import json
 import yaml
-import pandas as pd
+import unicodedata
 
-from typing import Any
+from typing import Any, Iterator
 from io import StringIO
 
+_configs = {} # absolute path -> parsed configuration, shared by every module
+
+CSV_SPOOL_BYTES = 64 * 2**20 # a CSV stream that cannot seek is buffered in memory up to this size, then on disk
+
 def load_config(path: str = "./src/config/config.yaml") -> dict[str, Any]:
     """
-    Loads a YAML configuration file.
+    Loads a YAML configuration file. The file is parsed once per process; every module
+    calling this gets the same shared dictionary.
 
     Args:
         - path (str): Path to the YAML config file.
@@ -22,32 +31,186 @@ def load_config(path: str = "./src/config/config.yaml") -> dict[str, Any]:
         - dict: Parsed configuration dictionary
     """
 
-    with open(path,"r") as file: # open configuration file in read mode
-        return yaml.safe_load(file)
+    key = os.path.abspath(path)
+    if key not in _configs:
+        with open(path,"r") as file: # open configuration file in read mode
+            _configs[key] = yaml.safe_load(file)
+    return _configs[key]
+
+def normalize_text(text:str) -> str:
+    """
+    Normalizes text before hashing so that whitespace-only differences share one cache entry.
+
+    Args:
+        - text (str): Raw input text.
+
+    Returns:
+        - str: NFC-normalized text with runs of whitespace collapsed to single spaces.
+    """
+
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
     
-def convert_csv_to_chunks(decoded_csv:str) -> list:
+def parse_llm_json(content:str) -> Any:
+    """
+    Parses JSON produced by an LLM, repairing the usual deviations: markdown code fences, prose
+    around the object, trailing commas, and Python-style literals (single quotes, True/None).
+
+    Args:
+        - content (str): Raw model output.
+
+    Returns:
+        - Any: Parsed JSON value.
+
+    Raises:
+        - ValueError: If no JSON object or array can be recovered.
+    """
+
+    text = content.strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text) # strip markdown code fences
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    # keep only the outermost object/array, dropping any explanation around it
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if start == -1 or end <= start:
+        raise ValueError(f"No JSON found in model output: {content[:200]!r}")
+    text = text[start:end + 1]
+
+    text = re.sub(r",\s*([}\]])", r"\1", text) # trailing commas
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        return ast.literal_eval(text) # {'key': 'value', 'flag': True}
+    except (ValueError, SyntaxError):
+        raise ValueError(f"Unparseable JSON in model output: {content[:200]!r}")
+
+def rows_to_sentences(df:Any) -> list:
+    """
+    Turns every DataFrame row into "column: value" pairs joined by "." (missing values left out), column by
+    column with vectorized string operations instead of iterating over rows.
+
+    Values are taken from df.to_numpy(), i.e. upcast to the common dtype of all columns exactly as
+    df.iterrows() does (an int column next to a float column prints as "5.0"), so the text is the same as
+    building it row by row.
+
+    Args:
+        - df (pd.DataFrame): Parsed CSV rows.
+
+    Returns:
+        - list: One sentence per row.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    values = df.to_numpy() # the row values iterrows() would produce
+    sentences = np.full(len(df), "", dtype=object)
+
+    for position, col in enumerate(df.columns):
+        column = values[:, position]
+        present = pd.notna(column)
+        if not present.any():
+            continue
+
+        text = pd.Series(column[present]).astype(str).to_numpy(dtype=object) # str(value) per cell
+        if df.dtypes.iloc[position].kind == "O": # only text columns can carry surrounding whitespace
+            text = np.array(list(map(str.strip, text)), dtype=object)
+        cells = f"{col.strip()}: " + text
+        current = sentences[present]
+        sentences[present] = np.where(current == "", cells, current + "." + cells) # "." only between present cells
+
+    return sentences.tolist()
+
+def merge_csv_dtypes(first:Any, second:Any) -> Any:
+    """
+    Dtype pandas would infer for a column whose two parts were inferred as 'first' and 'second'.
+    """
+
+    import numpy as np
+
+    if first == second:
+        return first
+    if {first.kind, second.kind} <= {"i", "f"}: # integers next to floats (or missing values) become floats
+        return np.dtype("float64")
+    return np.dtype(object)
+
+def iter_csv_chunks(source:Any, block_rows:int=100000) -> Iterator[list]:
+    """
+    Streams a CSV in blocks of rows and yields the sentences of each block, so very large files are never
+    held in memory as one DataFrame. The sentences are exactly those of a whole-file read: how a value prints
+    depends on the dtypes of all rows (an int column with one missing value prints "5.0" everywhere), so a
+    file larger than one block is read twice, first to infer the dtypes of the whole file and then to convert
+    each block with them. A stream that cannot seek (e.g. an S3 object body) is copied to a temporary file,
+    kept in memory up to CSV_SPOOL_BYTES, on the way.
+
+    Args:
+        - source (str | file-like): CSV path, or a text/binary stream.
+        - block_rows (int): Rows parsed per block.
+
+    Yields:
+        - list: Sentences of one block of rows, in file order.
+    """
+
+    import shutil
+    import tempfile
+    import pandas as pd
+
+    if not isinstance(source, (str, os.PathLike)) and not source.seekable():
+        head = source.read(1 << 20)
+        with tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_BYTES, mode="w+" if isinstance(head, str) else "w+b") as spool:
+            spool.write(head)
+            shutil.copyfileobj(source, spool)
+            spool.seek(0)
+            yield from iter_csv_chunks(spool, block_rows)
+        return
+
+    start = None if isinstance(source, (str, os.PathLike)) else source.tell()
+    first, dtypes = None, None
+    with pd.read_csv(source, chunksize=block_rows) as reader:
+        for block in reader: # first pass: dtypes pandas would infer over the whole file
+            if dtypes is None:
+                first, dtypes = block, block.dtypes.to_dict()
+            else:
+                first = None
+                for col in block.columns:
+                    dtypes[col] = merge_csv_dtypes(dtypes[col], block[col].dtype)
+
+    if dtypes is None: # header only
+        return
+    if first is not None: # the whole file was one block
+        yield rows_to_sentences(first)
+        return
+
+    if start is not None:
+        source.seek(start)
+    with pd.read_csv(source, chunksize=block_rows, dtype=dtypes) as reader: # object columns keep the raw text, as in a whole-file read
+        for block in reader:
+            yield rows_to_sentences(block)
+
+def convert_csv_to_chunks(decoded_csv:Any, block_rows:int=100000) -> list:
     """
     Converts CSV content into semantically meaningful sentences for embedding.
 
     Args:
-        - decoded_csv (str): CSV file content decoded as a UTF-8 string.
+        - decoded_csv (str | file-like): CSV file content decoded as a UTF-8 string, or a text stream of it.
+        - block_rows (int): Rows parsed at a time; large catalogs are processed block by block.
 
     Returns:
         - list: List of semantically meaningful text chunks, one per row
     """
 
-    # read the CSV content into a DataFrame
-    df = pd.read_csv(StringIO(decoded_csv))
-
     chunks = []
 
-    # convert each row into a structured sentence
-    for _, row in df.iterrows():
-        # combine column names with their respective values
-        sentence = ".".join(f"{col.strip()}: {str(row[col]).strip()}"
-                            for col in df.columns if pd.notna(row[col])
-                            )
-        
-        chunks.append(sentence)
+    # convert each row into a structured sentence: "column: value" pairs joined by "."
+    source = StringIO(decoded_csv) if isinstance(decoded_csv, str) else decoded_csv
+    for block in iter_csv_chunks(source, block_rows):
+        chunks.extend(block)
 
-    return chunks
\ No newline at end of file
+    return chunks